@@ -1,17 +1,24 @@
 import openpyxl
 from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
 from django.template.defaultfilters import default
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render, redirect
 from django import forms
 from django.http import HttpResponse
-import pandas as pd
-from datetime import datetime  # Import datetime here
+from django.utils import timezone
 
-from .models import CustomUser , Shipment, Manifest, CustomerMaster, Branch, Fleet
+from .models import CustomUser , Shipment, Manifest, CustomerMaster, Branch, Fleet, Job, MatchReview, ShipmentStatusChange
 from .forms import ManifestForm
+from . import caching, lifecycle, search
+from .importers import (
+    ShipmentImportError, UnsupportedFileFormat, error_workbook, import_shipment_file,
+)
 
 admin.site.site_header = "SVET - ADMIN"
 admin.site.site_title = "SVET - TMS"
@@ -63,6 +70,43 @@ class CustomUserAdmin(UserAdmin):
     )
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('username',)
+    list_select_related = ('company_name',)
+
+
+# -------------------- LIST FILTERS --------------------
+class CachedValuesFilter(admin.SimpleListFilter):
+    """Filter on a free-text column offering only its most common values.
+
+    The default filter lists every distinct value, scanning the whole table on each
+    changelist load; this one keeps the top ``limit`` values in the cache for a while.
+    """
+    field_name = None
+    limit = getattr(settings, 'ADMIN_FILTER_CHOICES', 50)
+    timeout = getattr(settings, 'ADMIN_FILTER_CACHE_TIMEOUT', 10 * 60)
+
+    def lookups(self, request, model_admin):
+        model = model_admin.model
+        key = f"admin-filter:{model._meta.label_lower}:{self.field_name}"
+        values = cache.get(key)
+        if values is None:
+            rows = (model.objects.exclude(**{f'{self.field_name}__isnull': True})
+                    .values(self.field_name).annotate(n=Count('pk')).order_by('-n')[:self.limit])
+            values = sorted(row[self.field_name] for row in rows)
+            cache.set(key, values, self.timeout)
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_name: self.value()})
+        return queryset
+
+
+def cached_values_filter(field_name, title=None):
+    return type(f'{field_name.title().replace("_", "")}Filter', (CachedValuesFilter,), {
+        'field_name': field_name,
+        'parameter_name': field_name,
+        'title': title or field_name.replace('_', ' '),
+    })
 
 
 # -------------------- SHIPMENT --------------------
@@ -77,7 +121,9 @@ class ShipmentAdmin(admin.ModelAdmin):
         'vehicle_no', 'payment_mode', 'status', 'estimated_delivery_date',
         'delivery_date', 'pod_preview','pod_link_display'
     )
-    list_filter = ('status', 'payment_mode', 'origin', 'destination')
+    list_filter = ('status', 'payment_mode', cached_values_filter('origin'), cached_values_filter('destination'))
+    list_select_related = ('billto_customer',)
+    show_full_result_count = False
     search_fields = (
         'consignment_no', 'vehicle_no', 'driver_details',
         'consignor_name', 'consignee_name', 'invoice_ref_number'
@@ -85,6 +131,13 @@ class ShipmentAdmin(admin.ModelAdmin):
     date_hierarchy = 'date'
     readonly_fields = ('pod_preview',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # answered from the full-text index (main.search) instead of LIKE '%term%' over each column
+        ids = search.matching_ids(search_term)
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=ids), False
+
     fieldsets = (
         ('Billed To', {
             'fields': ('billto_customer',)
@@ -125,12 +178,34 @@ class ShipmentAdmin(admin.ModelAdmin):
         return "-"
     pod_link_display.short_description = "POD Link"
 
+    actions = ('dispatch_shipments', 'mark_out_for_delivery', 'mark_delivered')
+
+    def _transition(self, request, queryset, operation):
+        moved, skipped = lifecycle.transition(queryset, operation, user=request.user)
+        to_status = lifecycle.OPERATIONS[operation].to_status
+        self.message_user(request, f"{moved} shipment(s) moved to {to_status}.", level=messages.SUCCESS)
+        if skipped:
+            self.message_user(request, f"{skipped} shipment(s) skipped because of their current status.",
+                              level=messages.WARNING)
+
+    @admin.action(description="Dispatch selected shipments (Booked → In Transit)")
+    def dispatch_shipments(self, request, queryset):
+        self._transition(request, queryset, 'dispatch')
+
+    @admin.action(description="Mark selected shipments Out For Delivery")
+    def mark_out_for_delivery(self, request, queryset):
+        self._transition(request, queryset, 'out_for_delivery')
+
+    @admin.action(description="Mark selected shipments Delivered")
+    def mark_delivered(self, request, queryset):
+        self._transition(request, queryset, 'deliver')
+
     change_list_template = "admin/shipment_upload.html"
 
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
-            path('upload-shipments/', self.upload_shipments, name='upload-shipments'),
+            path('upload-shipments/', self.admin_site.admin_view(self.upload_shipments), name='upload-shipments'),
             path('download-template/', self.admin_site.admin_view(self.download_template),
                  name='shipment_download_template'),
         ]
@@ -142,85 +217,28 @@ class ShipmentAdmin(admin.ModelAdmin):
             if form.is_valid():
                 file = form.cleaned_data['file']
                 try:
-                    if file.name.endswith('.csv'):
-                        df = pd.read_csv(file)
-                    else:
-                        df = pd.read_excel(file)
-
-                    created_count = 0
-                    for _, row in df.iterrows():
-                        # Initialize date variables
-                        date = None
-                        estimated_delivery_date = None
-                        delivery_date = None
-                        appointment_date = None
-
-                        # Debugging: Print the row being processed
-                        print(f"Processing row: {row.to_dict()}")  # Log the entire row
-
-                        # Convert date strings to datetime objects
-                        try:
-                            if isinstance(row['date'], str) and row['date']:
-                                date = datetime.fromisoformat(row['date'])
-                            if isinstance(row['estimated_delivery_date'], str) and row['estimated_delivery_date']:
-                                estimated_delivery_date = datetime.fromisoformat(row['estimated_delivery_date'])
-                            if isinstance(row['delivery_date'], str) and row['delivery_date']:
-                                delivery_date = datetime.fromisoformat(row['delivery_date'])
-                            if isinstance(row['appointment_date'], str) and row['appointment_date']:
-                                appointment_date = datetime.fromisoformat(row['appointment_date'])
-                        except ValueError as e:
-                            self.message_user(request,
-                                              f"❌ Error in date format for row {row.get('consignment_no', 'Unknown')}: {e}",
-                                              level=messages.ERROR)
-                            continue  # Skip this row if there's a date format error
-                        except Exception as e:
-                            self.message_user(request,
-                                              f"❌ Unexpected error for row {row.get('consignment_no', 'Unknown')}: {e}",
-                                              level=messages.ERROR)
-                            continue  # Skip this row if there's an unexpected error
-
-                        Shipment.objects.create(
-                            consignment_no=row.get('consignment_no', None),
-                            date=date,
-                            freight=row['freight'],
-                            shipment_type=row['shipment_type'],
-                            payment_mode=row['payment_mode'],
-                            origin=row['origin'],
-                            origin_pin=row['origin_pin'],
-                            destination=row['destination'],
-                            destination_pin=row['destination_pin'],
-                            vehicle_no=row['vehicle_no'],
-                            driver_details=row['driver_details'],
-                            consignor_name=row['consignor_name'],
-                            consignor_address=row['consignor_address'],
-                            consignor_gst=row.get('consignor_gst', None),
-                            consignor_contact=row['consignor_contact'],
-                            consignee_name=row['consignee_name'],
-                            consignee_address=row['consignee_address'],
-                            consignee_gst=row.get('consignee_gst', None),
-                            consignee_contact=row['consignee_contact'],
-                            invoice_ref_number=row['invoice_ref_number'],
-                            ewaybill_number=row.get('ewaybill_number', None),
-                            value=row['value'],
-                            no_article=row['no_article'],
-                            actual_weight=row['actual_weight'],
-                            charged_weight=row['charged_weight'],
-                            pack_type=row['pack_type'],
-                            status=row.get('status', 'Booked'),
-                            estimated_delivery_date=estimated_delivery_date,
-                            delivery_date=delivery_date,
-                            appointment_delivery=row.get('appointment_delivery', False),
-                            appointment_date=appointment_date,
-                            remark=row.get('remark', None),
-                            pod_link=row.get('pod_link', None),   # ✅ FIXED HERE
-                        )
-                        created_count += 1
-
-                    self.message_user(request, f"✅ Successfully uploaded {created_count} shipments.",
-                                      level=messages.SUCCESS)
-                    return redirect("..")
+                    # streamed in chunks inside one transaction: all rows or none
+                    created = import_shipment_file(file, keep_consignment_no=True)
+                except UnsupportedFileFormat:
+                    self.message_user(request, "❌ Unsupported file format. Upload a CSV or Excel file.",
+                                      level=messages.ERROR)
+                except ShipmentImportError as e:
+                    self.message_user(request,
+                                      f"❌ {len(e.errors)} row(s) failed, nothing was imported. "
+                                      f"See the downloaded error report.",
+                                      level=messages.ERROR)
+                    response = HttpResponse(
+                        error_workbook(e.rows, e.errors),
+                        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    )
+                    response["Content-Disposition"] = 'attachment; filename="shipment_upload_errors.xlsx"'
+                    return response
                 except Exception as e:
                     self.message_user(request, f"❌ Error: {e}", level=messages.ERROR)
+                else:
+                    self.message_user(request, f"✅ Successfully uploaded {created} shipments.",
+                                      level=messages.SUCCESS)
+                    return redirect("..")
         else:
             form = ShipmentUploadForm()
 
@@ -278,8 +296,67 @@ class ManifestAdmin(admin.ModelAdmin):
         'manifest_id', 'vehicle_no', 'driver_name',
         'origin_branch', 'destination_branch'
     )
-    list_filter = ('origin_branch', 'destination_branch', 'created_at')
-    filter_horizontal = ('shipments',)
+    list_filter = (cached_values_filter('origin_branch'), cached_values_filter('destination_branch'), 'created_at')
+    raw_id_fields = ('shipments',)  # a select box would list every Booked shipment
+    readonly_fields = ('total_articles', 'total_freight')
+
+
+# -------------------- JOBS --------------------
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'created_by', 'created_at', 'finished_at', 'worker')
+    list_filter = ('kind', 'status')
+    list_select_related = ('created_by',)
+    readonly_fields = ('token', 'started_at', 'finished_at', 'worker')
+    ordering = ('-created_at',)
+
+
+# -------------------- STATUS CHANGES --------------------
+@admin.register(ShipmentStatusChange)
+class ShipmentStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ('shipment', 'operation', 'from_status', 'to_status', 'manifest', 'changed_by', 'changed_at')
+    list_filter = ('operation', 'to_status')
+    list_select_related = ('shipment', 'manifest', 'changed_by')
+    raw_id_fields = ('shipment', 'manifest')
+    show_full_result_count = False
+    ordering = ('-changed_at',)
+
+    def has_add_permission(self, request):
+        return False  # written by main.lifecycle only
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# -------------------- MATCH REVIEWS --------------------
+@admin.register(MatchReview)
+class MatchReviewAdmin(admin.ModelAdmin):
+    list_display = ('raw_value', 'suggestion', 'score', 'kind', 'status', 'created_at', 'reviewed_by')
+    list_filter = ('status', 'kind')
+    list_select_related = ('reviewed_by',)
+    search_fields = ('raw_value', 'suggestion')
+    readonly_fields = ('kind', 'raw_value', 'score', 'created_at', 'reviewed_by', 'reviewed_at')
+    ordering = ('-score',)
+    actions = ('accept_matches', 'reject_matches')
+
+    def _decide(self, request, queryset, status):
+        count = queryset.update(status=status, reviewed_by=request.user, reviewed_at=timezone.now())
+        # accepted matches are aliases in main.matching's indexes
+        transaction.on_commit(lambda: caching.bump(MatchReview))
+        self.message_user(request, f"{count} match(es) marked {status}.", level=messages.SUCCESS)
+
+    def save_model(self, request, obj, form, change):
+        if 'status' in form.changed_data:
+            obj.reviewed_by, obj.reviewed_at = request.user, timezone.now()
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description="Accept: map these values to the suggestion in future imports")
+    def accept_matches(self, request, queryset):
+        self._decide(request, queryset, 'Accepted')
+
+    @admin.action(description="Reject selected matches")
+    def reject_matches(self, request, queryset):
+        self._decide(request, queryset, 'Rejected')
 
 
 # -------------------- CUSTOMER --------------------
@@ -342,9 +419,12 @@ class BranchAdmin(admin.ModelAdmin):
 # -------------------- FLEET --------------------
 @admin.register(Fleet)
 class FleetMasterAdmin(admin.ModelAdmin):
-    list_display = ('vehicle_number', 'vehicle_type', 'insurance_expiry', 'fitness_certificate_expiry')
+    list_display = (
+        'vehicle_number', 'vehicle_type', 'status',
+        'insurance_validity', 'fitness_validity', 'permit_validity', 'pollution_validity',
+    )
+    list_filter = ('status', 'vehicle_type')
     search_fields = ('vehicle_number', 'vehicle_type')
-    readonly_fields = ('insurance_expiry', 'fitness_certificate_expiry')
     ordering = ('vehicle_number',)
 
     fieldsets = (
@@ -355,7 +435,7 @@ class FleetMasterAdmin(admin.ModelAdmin):
             'fields': ('owner_name', 'owner_contact', 'branch')
         }),
         ('Documents', {
-            'fields': ('insurance_expiry', 'fitness_certificate_expiry')
+            'fields': ('insurance_validity', 'fitness_validity', 'permit_validity', 'pollution_validity')
         }),
     )
 from django.contrib import admin
@@ -404,6 +484,8 @@ class TripOutToVendorAdmin(admin.ModelAdmin):
         "destination",
     )
     list_filter = ("status", "vendor", "created_at")
+    list_select_related = ("vendor",)
+    show_full_result_count = False
     ordering = ("-created_at",)
 
     def save_model(self, request, obj, form, change):
@@ -0,0 +1,332 @@
+"""Synthetic data and timed scenarios for ``manage.py benchmark``.
+
+Everything here writes to whatever database is active, so the command only
+ever runs it against a freshly created test database.
+"""
+import io
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+import pandas as pd
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import matching, search, stats, tripcosts
+from .models import (
+    Branch, CustomerMaster, CustomUser, Fleet, Manifest, Sequence, Shipment, TripOutToVendor, VendorMaster,
+)
+from .signals import recompute_manifest_totals
+
+
+CITIES = [
+    ('Bengaluru', '560001'), ('Chennai', '600001'), ('Mumbai', '400001'), ('Delhi', '110001'),
+    ('Hyderabad', '500001'), ('Pune', '411001'), ('Kolkata', '700001'), ('Ahmedabad', '380001'),
+    ('Coimbatore', '641001'), ('Kochi', '682001'), ('Jaipur', '302001'), ('Nagpur', '440001'),
+]
+# a few hub cities carry most of the traffic
+CITY_WEIGHTS = [30, 22, 18, 14, 10, 8, 5, 4, 3, 3, 2, 2]
+
+
+# ---------------------------
+# Fixture generator
+# ---------------------------
+
+def generate(customers=20, vendors=10, branches=8, fleets=30, shipments=5000, manifests=200, trips=300,
+             days=180, seed=42):
+    """Create a reproducible data set. Returns a dict of the created row counts."""
+    rng = random.Random(seed)
+    today = timezone.now().date()
+
+    branch_rows = Branch.objects.bulk_create([
+        Branch(branch_code=f"BR{i:03d}", name=f"{city} Hub", address=f"{i} Ring Road", city=city,
+               state="State", pincode=pin)
+        for i, (city, pin) in enumerate(CITIES[:branches], start=1)
+    ])
+    Fleet.objects.bulk_create([
+        Fleet(
+            vehicle_number=f"KA{rng.randint(1, 99):02d}AB{i:04d}",
+            vehicle_type=rng.choice(Fleet.VEHICLE_TYPE_CHOICES)[0],
+            capacity_mt=Decimal(rng.choice([1, 3, 7, 9, 16, 25])),
+            branch=rng.choice(branch_rows) if branch_rows else None,
+            insurance_validity=today + timedelta(days=rng.randint(-30, 365)),
+            fitness_validity=today + timedelta(days=rng.randint(-30, 365)),
+            permit_validity=today + timedelta(days=rng.randint(-30, 365)),
+            pollution_validity=today + timedelta(days=rng.randint(-30, 180)),
+        )
+        for i in range(fleets)
+    ])
+    vehicles = list(Fleet.objects.values_list('vehicle_number', flat=True)) or ['KA01AB0001']
+
+    customer_rows = CustomerMaster.objects.bulk_create([
+        CustomerMaster(
+            customer_id=f"CUST-{uuid.UUID(int=rng.getrandbits(128)).hex[:6].upper()}",
+            company_name=f"Customer {i} Pvt Ltd", billing_address=f"{i} Industrial Area", city=city,
+            pin_code=pin, state="State", contact_person=f"Contact {i}", contact_number=f"98{i:08d}",
+            email_id=f"customer{i}@example.com",
+            contract_date_from=today - timedelta(days=365), contract_date_to=today + timedelta(days=365),
+        )
+        for i, (city, pin) in enumerate(rng.choices(CITIES, k=customers), start=1)
+    ])
+    # customer volume follows a long tail: a handful of accounts book most shipments
+    customer_weights = [rng.paretovariate(1.2) for _ in customer_rows]
+
+    vendor_codes = Sequence.reserve('VND', vendors)
+    vendor_rows = VendorMaster.objects.bulk_create([
+        VendorMaster(vendor_code=f"VND-{number:03d}", vendor_name=f"Vendor {number} Logistics",
+                     billing_address="Transport Nagar", city=city, state="State")
+        for number, (city, _) in zip(vendor_codes, rng.choices(CITIES, k=vendors))
+    ])
+
+    shipment_rows = build_shipments(rng, shipments, customer_rows, customer_weights, vehicles, today, days)
+    numbers = Shipment.reserve_consignment_numbers(len(shipment_rows))
+    for shipment, number in zip(shipment_rows, numbers):
+        shipment.consignment_no = number
+    Shipment.objects.bulk_create(shipment_rows, batch_size=500)
+
+    year = timezone.now().year
+    manifest_ids = Sequence.reserve('MF', manifests, year=year)
+    manifest_rows = Manifest.objects.bulk_create([
+        Manifest(manifest_id=f"MF-{str(year)[2:]}{number:03d}", origin_branch=rng.choice(CITIES)[0],
+                 destination_branch=rng.choice(CITIES)[0], vehicle_no=rng.choice(vehicles),
+                 driver_name="Driver", driver_contact="9000000000")
+        for number in manifest_ids
+    ])
+    shipment_ids = list(Shipment.objects.values_list('pk', flat=True))
+    through = Manifest.shipments.through
+    links = []
+    for manifest in manifest_rows:
+        for shipment_id in rng.sample(shipment_ids, min(len(shipment_ids), rng.randint(5, 40))):
+            links.append(through(manifest_id=manifest.pk, shipment_id=shipment_id))
+    through.objects.bulk_create(links, batch_size=500, ignore_conflicts=True)
+    recompute_manifest_totals(Manifest.objects.all())
+
+    trip_ids = Sequence.reserve('TRP', trips, year=year) if vendor_rows else []
+    TripOutToVendor.objects.bulk_create([
+        build_trip(rng, f"TRP-{str(year)[2:]}{number:03d}", rng.choice(vendor_rows))
+        for number in trip_ids
+    ], batch_size=500)
+
+    stats.rebuild()
+    search.rebuild()
+    matching.rebuild_party_names()
+    tripcosts.rebuild()
+    return {
+        'branches': len(branch_rows), 'fleets': len(vehicles), 'customers': len(customer_rows),
+        'vendors': len(vendor_rows), 'shipments': len(shipment_rows), 'manifests': len(manifest_rows),
+        'manifest_links': len(links), 'trips': len(trip_ids),
+    }
+
+
+def build_shipments(rng, count, customers, customer_weights, vehicles, today, days):
+    rows = []
+    for _ in range(count):
+        (origin, origin_pin), (destination, destination_pin) = rng.choices(CITIES, weights=CITY_WEIGHTS, k=2)
+        age = min(days - 1, int(rng.expovariate(1 / (days / 4))))  # recent days are busier
+        booked = today - timedelta(days=age)
+        estimated = booked + timedelta(days=rng.randint(2, 6))
+        status, delivered = _status_for_age(rng, age, booked)
+        articles = max(1, int(rng.lognormvariate(1.5, 0.9)))
+        weight = Decimal(str(round(articles * rng.uniform(5, 40), 2)))
+        customer = rng.choices(customers, weights=customer_weights)[0] if customers and rng.random() < 0.9 else None
+        rows.append(Shipment(
+            date=booked, freight=Decimal(str(round(float(weight) * rng.uniform(8, 20), 2))),
+            shipment_type='FTL' if articles > 40 else 'LTL', payment_mode=rng.choice(Shipment.PAYMENT_MODES)[0],
+            origin=origin, origin_pin=origin_pin, destination=destination, destination_pin=destination_pin,
+            vehicle_no=rng.choice(vehicles), driver_details="Driver 9000000000", billto_customer=customer,
+            consignor_name=f"Consignor {rng.randint(1, 500)}", consignor_address=f"Plot {rng.randint(1, 999)}, {origin}",
+            consignor_contact="9800000000",
+            consignee_name=f"Consignee {rng.randint(1, 2000)}",
+            consignee_address=f"Shop {rng.randint(1, 999)}, {destination}", consignee_contact="9700000000",
+            invoice_ref_number=f"INV-{rng.randint(1, 10**6):06d}", boe_num='',
+            value=Decimal(str(round(float(weight) * rng.uniform(100, 900), 2))), no_article=articles,
+            actual_weight=weight, charged_weight=(weight * Decimal('1.1')).quantize(Decimal('0.01')),
+            pack_type='Box', status=status,
+            estimated_delivery_date=estimated, delivery_date=delivered,
+        ))
+    return rows
+
+
+def _status_for_age(rng, age, booked):
+    if rng.random() < 0.02:
+        return 'Cancelled', None
+    if age > 7 or (age > 2 and rng.random() < 0.6):
+        return 'Delivered', booked + timedelta(days=rng.choice([1, 2, 3, 3, 4, 4, 5, 6, 8]))
+    return rng.choice(['Booked', 'In Transit', 'In Transit', 'Out For Delivery']), None
+
+
+def build_trip(rng, trip_id, vendor):
+    (origin, _), (destination, _) = rng.choices(CITIES, weights=CITY_WEIGHTS, k=2)
+    kilometer = Decimal(rng.randint(50, 2200))
+    charge = (kilometer * Decimal(str(round(rng.uniform(25, 60), 2)))).quantize(Decimal('0.01'))
+    extra = Decimal(rng.choice([0, 0, 0, 500, 1200]))
+    return TripOutToVendor(
+        trip_id=trip_id, vendor=vendor, vehicle_type=rng.choice(Fleet.VEHICLE_TYPE_CHOICES)[0],
+        vehicle_capacity=Decimal(rng.choice([1, 3, 7, 9, 16, 25])), from_location=origin, destination=destination,
+        kilometer=kilometer, trip_charge=charge, additional_charge=extra, total_bill_amount=charge + extra,
+        status=rng.choice(['In-Progress', 'Closed', 'Closed', 'Closed', 'Hold', 'Cancelled']),
+    )
+
+
+def upload_csv(rng, rows, customer_id):
+    """A shipment_bulk_upload file of ``rows`` rows, as bytes."""
+    today = timezone.now().date().isoformat()
+    df = pd.DataFrame([{
+        'date': today, 'freight': rng.randint(500, 9000), 'payment_mode': 'TBB', 'shipment_type': 'LTL',
+        'billto_customer': customer_id, 'origin': 'Bengaluru', 'origin_pin': '560001', 'destination': 'Chennai',
+        'destination_pin': '600001', 'vehicle_no': 'KA01AB0001', 'driver_details': 'Driver',
+        'consignor_name': 'Consignor', 'consignor_address': 'Address', 'consignor_contact': '9800000000',
+        'consignee_name': 'Consignee', 'consignee_address': 'Address', 'consignee_contact': '9700000000',
+        'invoice_ref_number': f"INV-{i}", 'value': rng.randint(1000, 90000), 'no_article': rng.randint(1, 20),
+    } for i in range(rows)])
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def booking_form(rng):
+    """POST data for one shipment_create booking."""
+    (origin, origin_pin), (destination, destination_pin) = rng.choices(CITIES, weights=CITY_WEIGHTS, k=2)
+    articles = rng.randint(1, 40)
+    return {
+        'date': timezone.now().date().isoformat(), 'freight': rng.randint(500, 9000),
+        'shipment_type': 'LTL', 'payment_mode': 'TBB',
+        'origin': origin, 'origin_pin': origin_pin, 'destination': destination, 'destination_pin': destination_pin,
+        'vehicle_no': 'KA01AB0001', 'driver_details': 'Driver 9000000000',
+        'consignor_name': 'Consignor', 'consignor_address': f"Plot 1, {origin}", 'consignor_contact': '9800000000',
+        'consignee_name': 'Consignee', 'consignee_address': f"Shop 1, {destination}", 'consignee_contact': '9700000000',
+        'invoice_ref_number': f"INV-{rng.randint(1, 10**6):06d}", 'boe_num': '-', 'value': rng.randint(1000, 90000),
+        'no_article': articles, 'actual_weight': articles * 10, 'charged_weight': articles * 11,
+        'pack_type': 'Box', 'status': 'Booked',
+    }
+
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+
+class Context:
+    """What the scenarios share: a logged-in client and samples from the generated data."""
+
+    def __init__(self, seed=42, upload_rows=1000, batch=20):
+        self.rng = random.Random(seed)
+        self.upload_rows = upload_rows
+        user = CustomUser.objects.create_superuser(
+            username='benchmark', email='benchmark@example.com', password=uuid.uuid4().hex,
+            usertype='Internal', gender='O', phone_number='0', role='Admin',
+        )
+        self.client = Client()
+        self.client.force_login(user)
+        numbers = list(Shipment.objects.order_by('?').values_list('consignment_no', flat=True)[:batch])
+        self.consignments = ', '.join(numbers)
+        self.customer = CustomerMaster.objects.values_list('customer_id', flat=True).first()
+        self.manifest = Manifest.objects.order_by('-total_articles').first()
+        # a cursor ten pages deep, to show keyset paging costs the same as the first page
+        deep = Shipment.objects.order_by('-date', '-pk')[500:501].first()
+        self.deep_cursor = f"{deep.date.isoformat()}_{deep.pk}" if deep else ''
+
+
+def _drain(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _get(name, **params):
+    def scenario(ctx):
+        return ctx.client.get(reverse(name), params)
+    return scenario
+
+
+def _cold(scenario):
+    def cold(ctx):
+        cache.clear()
+        return scenario(ctx)
+    return cold
+
+
+def bulk_upload(ctx):
+    file = io.BytesIO(upload_csv(ctx.rng, ctx.upload_rows, ctx.customer))
+    file.name = 'benchmark.csv'
+    return ctx.client.post(reverse('shipment_bulk_upload'), {'file': file})
+
+
+def labels(ctx):
+    return ctx.client.post(reverse('download_labels'), {'consignments': ctx.consignments})
+
+
+def consignment_notes(ctx):
+    return ctx.client.get(reverse('download_consignment_note'), {'consignments': ctx.consignments, 'pdf': 'yes'})
+
+
+def manifest_detail(ctx):
+    return ctx.client.get(reverse('manifest_detail', args=[ctx.manifest.pk]))
+
+
+def tracking(ctx):
+    return ctx.client.get(reverse('public_tracking_status'), {'consignments': ctx.consignments})
+
+
+def id_generation(ctx):
+    for _ in range(100):
+        Shipment.reserve_consignment_numbers(1)
+
+
+SCENARIOS = {
+    'shipment_list': _get('shipment_list'),
+    'shipment_list_deep_page': lambda ctx: ctx.client.get(reverse('shipment_list'), {'after': ctx.deep_cursor}),
+    'shipment_list_customer': lambda ctx: ctx.client.get(reverse('shipment_list'), {'customer': ctx.customer}),
+    'download_shipment_report_csv': _get('shipment_report_download'),
+    'download_shipment_report_xlsx': _get('shipment_report_download', format='xlsx'),
+    'shipment_bulk_upload': bulk_upload,
+    'download_labels': labels,
+    'generate_consignment_notes_cold': _cold(consignment_notes),
+    'generate_consignment_notes_warm': consignment_notes,
+    'manifest_detail': manifest_detail,
+    'public_tracking_status_cold': _cold(tracking),
+    'public_tracking_status_warm': tracking,
+    'dashboard': _get('dashboard'),
+    'id_generation_x100': id_generation,
+}
+
+
+def run(ctx, names=None, repeat=5):
+    """Time each scenario ``repeat`` times; returns {name: result dict} ready for JSON."""
+    results = {}
+    for name, scenario in SCENARIOS.items():
+        if names and name not in names:
+            continue
+        timings, queries, size, status, error = [], None, None, None, None
+        for _ in range(repeat):
+            try:
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = scenario(ctx)
+                    size = _drain(response) if response is not None else None
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = len(captured)
+                status = response.status_code if response is not None else None
+            except Exception as e:  # keep going; a broken scenario should not hide the others
+                error = f"{type(e).__name__}: {e}"
+                break
+        results[name] = summarize(timings, queries=queries, bytes=size, status=status, error=error)
+    return results
+
+
+def summarize(timings, **extra):
+    ordered = sorted(timings)
+    result = {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 2) if ordered else None,
+        'median_ms': round(statistics.median(ordered), 2) if ordered else None,
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2) if ordered else None,
+        'max_ms': round(ordered[-1], 2) if ordered else None,
+        'timings_ms': [round(t, 2) for t in timings],
+    }
+    result.update(extra)
+    return result
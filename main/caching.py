@@ -0,0 +1,84 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+
+
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+VERSION_TIMEOUT = None  # version keys never expire on their own
+VERSION_CACHE = getattr(settings, 'CACHE_VERSION_ALIAS', 'versions')  # a cache nothing else fills, so never culled
+
+
+# ---------------------------
+# Per-model version keys
+# ---------------------------
+
+def _version_key(model):
+    return f"model-version:{model._meta.label_lower}"
+
+
+def bump(*models):
+    """Mark ``models`` as changed. The version is a timestamp in ns, so it doubles as Last-Modified and
+    never repeats after an eviction (a counter restarting at 1 could revive stale fragments)."""
+    now = time.time_ns()
+    caches[VERSION_CACHE].set_many({_version_key(model): now for model in models}, VERSION_TIMEOUT)
+
+
+def version(model):
+    versions_cache = caches[VERSION_CACHE]
+    key = _version_key(model)
+    value = versions_cache.get(key)
+    if value is None:
+        value = time.time_ns()
+        versions_cache.add(key, value, VERSION_TIMEOUT)
+        value = versions_cache.get(key, value)
+    return value
+
+
+def versions(*models):
+    """A short string that changes whenever any of ``models`` does; use it in cache keys."""
+    return '-'.join(str(version(model)) for model in models)
+
+
+def get_or_set(name, models, compute, *parts, timeout=FRAGMENT_CACHE_TIMEOUT):
+    """compute() cached until one of ``models`` changes; ``parts`` (e.g. GET filters) are hashed into the key.
+
+    For data shared by every user: per-user markup such as CSRF tokens is rendered around it.
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return cache.get_or_set(f"{name}:{versions(*models)}:{digest}", compute, timeout)
+
+
+# ---------------------------
+# Conditional responses (ETag / Last-Modified)
+# ---------------------------
+
+def conditional(*models):
+    """(etag_func, last_modified_func) for django.views.decorators.http.condition.
+
+    The ETag covers the model versions plus who is asking and with which query string,
+    since the pages render the user's menu and a CSRF token. Requests with pending
+    flash messages are never answered with 304 so the messages are not lost.
+    """
+    def etag(request, *args, **kwargs):
+        if len(get_messages(request)):
+            return None
+        parts = [
+            versions(*models),
+            str(request.user.pk),
+            request.META.get('CSRF_COOKIE', ''),
+            request.META.get('QUERY_STRING', ''),
+            *map(str, args), *(f"{k}={v}" for k, v in sorted(kwargs.items())),
+        ]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if len(get_messages(request)):
+            return None
+        newest = max(version(model) for model in models)
+        return datetime.fromtimestamp(newest / 1e9, tz=dt_timezone.utc)
+
+    return etag, last_modified
@@ -0,0 +1,107 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching
+from .models import Fleet, Shipment
+
+
+DOCUMENTS = (
+    ('insurance_validity', 'Insurance'),
+    ('fitness_validity', 'Fitness'),
+    ('permit_validity', 'Permit'),
+    ('pollution_validity', 'Pollution'),
+)
+COMPLIANCE_DAYS = getattr(settings, 'FLEET_COMPLIANCE_DAYS', 30)
+COMPLIANCE_CACHE_TIMEOUT = 24 * 60 * 60
+OPEN_STATUSES = ('Booked', 'In Transit', 'Out For Delivery')
+
+_FLEET_COLUMNS = ('vehicle_number', 'vehicle_type', 'branch__name', *(field for field, _ in DOCUMENTS))
+
+
+def _flagged_ids(horizon):
+    """UNION of one index range per document: a plain OR across the four columns makes SQLite scan the table."""
+    parts = [
+        Fleet.objects.filter(Q(**{f'{field}__lte': horizon}) | Q(**{f'{field}__isnull': True})).values('pk')
+        for field, _ in DOCUMENTS
+    ]
+    return parts[0].union(*parts[1:])
+
+
+def _document_state(valid_till, today):
+    if valid_till is None:
+        return 'Missing'
+    return 'Expired' if valid_till < today else 'Due'
+
+
+def scan(days=COMPLIANCE_DAYS, today=None):
+    """Active vehicles with a document missing, expired or expiring within ``days``.
+
+    One query, searching the per-document validity indexes instead of scanning
+    the fleet table. Returns a dict with the vehicles (lapsed ones first, then
+    soonest expiry) and per-document counts.
+    """
+    today = today or timezone.localdate()
+    horizon = today + timedelta(days=days)
+    vehicles = []
+    counts = {label: {'Expired': 0, 'Due': 0, 'Missing': 0} for _, label in DOCUMENTS}
+    for row in Fleet.objects.filter(pk__in=_flagged_ids(horizon), status='Active').values(*_FLEET_COLUMNS):
+        documents = []
+        for field, label in DOCUMENTS:
+            valid_till = row[field]
+            if valid_till is not None and valid_till > horizon:
+                continue
+            state = _document_state(valid_till, today)
+            counts[label][state] += 1
+            documents.append({
+                'document': label, 'valid_till': valid_till, 'state': state,
+                'days_left': (valid_till - today).days if valid_till else None,
+            })
+        vehicles.append({
+            'vehicle_number': row['vehicle_number'],
+            'vehicle_type': row['vehicle_type'],
+            'branch': row['branch__name'],
+            'documents': documents,
+            'compliant': all(doc['state'] == 'Due' for doc in documents),  # nothing lapsed yet
+            'first_expiry': min((doc['valid_till'] for doc in documents if doc['valid_till']), default=today),
+        })
+    vehicles.sort(key=lambda vehicle: (vehicle['compliant'], vehicle['first_expiry'], vehicle['vehicle_number']))
+    return {'date': today, 'days': days, 'vehicles': vehicles, 'counts': counts}
+
+
+def daily_scan(days=COMPLIANCE_DAYS):
+    """scan() cached until the date changes or a Fleet row is saved."""
+    today = timezone.localdate()
+    key = f"fleet-compliance:{today.isoformat()}:{days}:{caching.versions(Fleet)}"
+    report = cache.get(key)
+    if report is None:
+        report = scan(days, today)
+        cache.set(key, report, COMPLIANCE_CACHE_TIMEOUT)
+    return report
+
+
+def open_bookings(vehicle_numbers):
+    """{vehicle number: [(consignment_no, status)]} for open shipments on ``vehicle_numbers``, in one query."""
+    bookings = defaultdict(list)
+    rows = (
+        Shipment.objects.filter(vehicle_no__in=list(vehicle_numbers), status__in=OPEN_STATUSES)
+        .order_by('vehicle_no', 'date')
+        .values_list('vehicle_no', 'consignment_no', 'status')
+    )
+    for vehicle_no, consignment_no, status in rows:
+        bookings[vehicle_no].append((consignment_no, status))
+    return bookings
+
+
+def report(days=COMPLIANCE_DAYS):
+    """daily_scan() plus the live cross-check of open bookings on vehicles that are not compliant today."""
+    result = dict(daily_scan(days))
+    bookings = open_bookings(v['vehicle_number'] for v in result['vehicles'] if not v['compliant'])
+    result['vehicles'] = [dict(vehicle, bookings=bookings.get(vehicle['vehicle_number'], []))
+                          for vehicle in result['vehicles']]
+    result['blocked_bookings'] = sum(len(found) for found in bookings.values())
+    return result
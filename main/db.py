@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# set per profile in settings.py; empty means leave SQLite's defaults alone
+SQLITE_PRAGMAS = getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def journal_mode(connection, mode=None):
+    """The journal mode stored in the SQLite database file, after setting it to ``mode`` if given.
+
+    Switching needs no other open connection to the file; SQLite leaves the mode
+    unchanged otherwise, so compare the result with what was asked for.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode = {mode}" if mode else "PRAGMA journal_mode")
+        return cursor.fetchone()[0].upper()
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to each new SQLite connection (busy_timeout, synchronous, mmap_size, cache_size)."""
+    if connection.vendor != 'sqlite' or not SQLITE_PRAGMAS:
+        return
+    # synchronous=NORMAL is only crash-safe with a write-ahead log; a rollback journal keeps FULL
+    wal = 'synchronous' in SQLITE_PRAGMAS and journal_mode(connection) == 'WAL'
+    with connection.cursor() as cursor:
+        for name, value in SQLITE_PRAGMAS.items():
+            if name == 'synchronous' and not wal:
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
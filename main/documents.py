@@ -0,0 +1,195 @@
+import io
+import os
+import zipfile
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from pypdf import PdfReader, PdfWriter
+from reportlab.graphics.barcode import code128
+from reportlab.lib.units import inch, mm
+from reportlab.pdfgen import canvas
+from xhtml2pdf import pisa
+
+
+CONSIGNMENT_NOTE_TEMPLATE = 'consignment_notes_pdf.html'
+COPY_LABELS = ['Consignor Copy', 'Consignee Copy']
+
+NOTE_CACHE_TIMEOUT = getattr(settings, 'CONSIGNMENT_NOTE_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+NOTE_WORKERS = getattr(settings, 'CONSIGNMENT_NOTE_WORKERS', min(4, os.cpu_count() or 1))
+
+
+class PDFRenderError(Exception):
+    pass
+
+
+def html_to_pdf(html):
+    """Render one HTML document with xhtml2pdf. Module level so worker processes can unpickle it."""
+    result = io.BytesIO()
+    pdf = pisa.CreatePDF(io.BytesIO(html.encode("UTF-8")), dest=result)
+    if pdf.err:
+        return None
+    return result.getvalue()
+
+
+def consignment_note_cache_key(shipment):
+    # updated_at moves on every save, so an edited shipment never hits a stale note
+    return f"consignment-note:{shipment.pk}:{shipment.updated_at.timestamp()}"
+
+
+def render_consignment_notes(shipments, progress=None):
+    """Return one merged PDF holding the consignment notes of ``shipments``, in order.
+
+    Each shipment is rendered (and cached) on its own; cache misses are rendered in a
+    process pool so a large batch uses every core instead of one request thread.
+    ``progress`` is called with (notes ready, total) as each one is rendered.
+    """
+    shipments = list(shipments)
+    keys = [consignment_note_cache_key(s) for s in shipments]
+    pdfs = cache.get_many(keys)
+
+    missing = [(key, s) for key, s in zip(keys, shipments) if key not in pdfs]
+    if missing:
+        template = get_template(CONSIGNMENT_NOTE_TEMPLATE)
+        htmls = [template.render({'shipments': [s], 'copy_labels': COPY_LABELS}) for _, s in missing]
+        with ExitStack() as stack:
+            if NOTE_WORKERS > 1 and len(htmls) > 1:
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=min(NOTE_WORKERS, len(htmls))))
+                rendered = executor.map(html_to_pdf, htmls)
+            else:
+                rendered = map(html_to_pdf, htmls)
+
+            for (key, shipment), pdf in zip(missing, rendered):
+                if pdf is None:
+                    raise PDFRenderError(f"Could not render consignment note {shipment.consignment_no}")
+                pdfs[key] = pdf
+                if progress is not None:
+                    progress(len(pdfs), len(keys))
+        cache.set_many({key: pdfs[key] for key, _ in missing}, NOTE_CACHE_TIMEOUT)
+
+    writer = PdfWriter()
+    for key in keys:
+        writer.append(PdfReader(io.BytesIO(pdfs[key])))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_manifest_pdf(manifest, progress=None):
+    template = get_template('manifest_pdf_template.html')
+    html = template.render({'manifest': manifest, 'shipments': manifest.shipments.all()})
+    if progress is not None:
+        progress(1, 2)  # the PDF conversion is the other half
+    pdf = html_to_pdf(html)
+    if pdf is None:
+        raise PDFRenderError(f"Could not render manifest {manifest.manifest_id}")
+    return pdf
+
+
+# ---------------------------
+# Shipment labels
+# ---------------------------
+
+LABEL_SIZE = (5 * inch, 4 * inch)
+
+LABEL_COLUMNS = (
+    'consignment_no', 'no_article',
+    'consignor_name', 'consignor_address', 'consignor_contact',
+    'consignee_name', 'consignee_address', 'consignee_contact',
+)
+
+
+def _draw_label_body(p, shipment, height):
+    """Draw everything on a label except the package counter; return the counter's y position."""
+    y = height - 15 * mm
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(10 * mm, y, "FROM:")
+    y -= 5 * mm
+    p.setFont("Helvetica", 9)
+    p.drawString(10 * mm, y, shipment.consignor_name)
+    y -= 5 * mm
+    p.drawString(10 * mm, y, shipment.consignor_address[:60])
+    y -= 5 * mm
+    p.drawString(10 * mm, y, f"Ph: {shipment.consignor_contact}")
+    y -= 10 * mm
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(10 * mm, y, "TO:")
+    y -= 5 * mm
+    p.setFont("Helvetica", 9)
+    p.drawString(10 * mm, y, shipment.consignee_name)
+    y -= 5 * mm
+    p.drawString(10 * mm, y, shipment.consignee_address[:60])
+    y -= 5 * mm
+    p.drawString(10 * mm, y, f"Ph: {shipment.consignee_contact}")
+    y -= 10 * mm
+    p.setFont("Helvetica", 9)
+    p.drawString(10 * mm, y, f"Consignment No: {shipment.consignment_no}")
+    y -= 5 * mm
+    package_y = y
+    y -= 20 * mm
+    barcode = code128.Code128(shipment.consignment_no, barHeight=15 * mm, barWidth=0.5)
+    barcode.drawOn(p, 10 * mm, y)
+    return package_y
+
+
+def draw_shipment_labels(p, shipment):
+    """Add one page per article of ``shipment`` to canvas ``p``.
+
+    The addresses and barcode are drawn once into a form XObject that every page
+    references; only the "Package i of N" line is drawn per page.
+    """
+    _, height = LABEL_SIZE
+    form_name = f"label-{shipment.pk}"
+    p.beginForm(form_name)
+    package_y = _draw_label_body(p, shipment, height)
+    p.endForm()
+
+    for i in range(shipment.no_article):
+        p.doForm(form_name)
+        p.setFont("Helvetica", 9)
+        p.drawString(10 * mm, package_y, f"Package: {i+1} of {shipment.no_article}")
+        p.showPage()
+
+
+def render_labels(shipments, output):
+    """Write the labels of all ``shipments`` as one PDF into the file-like ``output``."""
+    p = canvas.Canvas(output, pagesize=LABEL_SIZE)
+    for shipment in shipments:
+        draw_shipment_labels(p, shipment)
+    p.save()
+
+
+class _ZipChunks:
+    """Write-only sink for ZipFile that lets a generator drain what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def stream_labels_zip(shipments):
+    """Yield a ZIP archive with one label PDF per shipment, produced as the archive is sent.
+
+    A single PDF can only be written once every page exists, so very large runs are
+    streamed as per-shipment files instead and the download starts with the first one.
+    """
+    sink = _ZipChunks()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for shipment in shipments:
+            buffer = io.BytesIO()
+            render_labels([shipment], buffer)
+            archive.writestr(f"labels_{shipment.consignment_no}.pdf", buffer.getvalue())
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Shipment, ShipmentEvent
+
+
+EVENT_BATCH_SIZE = getattr(settings, 'SHIPMENT_EVENT_BATCH_SIZE', 1000)
+
+STATUS_NAMES = dict(ShipmentEvent.STATUS_CHOICES)
+
+# statuses reached at the destination end of the lane; everything else happens at the origin
+_DESTINATION_STATUSES = ('Out For Delivery', 'Delivered')
+
+
+def _value(shipment, field):
+    return shipment[field] if isinstance(shipment, dict) else getattr(shipment, field)
+
+
+def event_for(shipment, note='', ts=None):
+    """Unsaved ShipmentEvent for the current status of a Shipment or a dict with pk/status/origin/destination."""
+    status = _value(shipment, 'status')
+    return ShipmentEvent(
+        shipment_id=_value(shipment, 'pk'),
+        status=ShipmentEvent.STATUS_CODES[status],
+        ts=ts or timezone.now(),
+        branch=_value(shipment, 'destination' if status in _DESTINATION_STATUSES else 'origin'),
+        note=note[:200],
+    )
+
+
+def record(shipments, note='', ts=None):
+    """Append one event per shipment with a single batched INSERT. Returns the events."""
+    ts = ts or timezone.now()
+    return ShipmentEvent.objects.bulk_create([event_for(s, note, ts) for s in shipments], batch_size=EVENT_BATCH_SIZE)
+
+
+def record_created(shipments, note=''):
+    """Events for freshly bulk-created shipments; backends that do not return ids get them looked up in one query."""
+    missing = [s for s in shipments if s.pk is None]
+    if missing:
+        ids = dict(Shipment.objects.filter(consignment_no__in=[s.consignment_no for s in missing])
+                   .values_list('consignment_no', 'pk'))
+        for shipment in missing:
+            shipment.pk = ids[shipment.consignment_no]
+    return record(shipments, note)
+
+
+def timelines(shipment_ids):
+    """{shipment id: [event dicts, oldest first]} for ``shipment_ids`` in one query over the (shipment, ts) index."""
+    result = defaultdict(list)
+    rows = (
+        ShipmentEvent.objects.filter(shipment_id__in=shipment_ids)
+        .order_by('shipment_id', 'ts', 'pk')
+        .values_list('shipment_id', 'status', 'ts', 'branch', 'note')
+    )
+    for shipment_id, status, ts, branch, note in rows:
+        result[shipment_id].append({'status': STATUS_NAMES[status], 'ts': ts, 'branch': branch, 'note': note})
+    return result
@@ -0,0 +1,93 @@
+import csv
+import tempfile
+
+import openpyxl
+from django.conf import settings
+
+from .models import Shipment
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'SHIPMENT_EXPORT_CHUNK_SIZE', 2000)
+
+# (header, column) in report order
+REPORT_COLUMNS = [
+    ('Consignment No', 'consignment_no'),
+    ('Date', 'date'),
+    ('Freight', 'freight'),
+    ('Shipment Type', 'shipment_type'),
+    ('Payment Mode', 'payment_mode'),
+    ('Origin', 'origin'),
+    ('Origin Pin', 'origin_pin'),
+    ('Destination', 'destination'),
+    ('Destination Pin', 'destination_pin'),
+    ('Vehicle No', 'vehicle_no'),
+    ('Driver Details', 'driver_details'),
+    ('Consignor Name', 'consignor_name'),
+    ('Consignor Address', 'consignor_address'),
+    ('Consignor GST', 'consignor_gst'),
+    ('Consignor Contact', 'consignor_contact'),
+    ('Consignee Name', 'consignee_name'),
+    ('Consignee Address', 'consignee_address'),
+    ('Consignee GST', 'consignee_gst'),
+    ('Consignee Contact', 'consignee_contact'),
+    ('Invoice Ref No', 'invoice_ref_number'),
+    ('E-waybill No', 'ewaybill_number'),
+    ('Value', 'value'),
+    ('No. of Articles', 'no_article'),
+    ('Actual Weight', 'actual_weight'),
+    ('Charged Weight', 'charged_weight'),
+    ('Pack Type', 'pack_type'),
+    ('Status', 'status'),
+    ('Estimated Delivery Date', 'estimated_delivery_date'),
+    ('Delivery Date', 'delivery_date'),
+    ('POD Scan URL', 'pod_scan'),
+]
+
+REPORT_HEADERS = [header for header, _ in REPORT_COLUMNS]
+
+
+class Echo:
+    """File-like object whose write() hands the value straight back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def report_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield report rows as plain tuples, reading the database ``chunk_size`` rows at a time."""
+    storage = Shipment._meta.get_field('pod_scan').storage
+    columns = [column for _, column in REPORT_COLUMNS]
+    pod_index = columns.index('pod_scan')
+    rows = queryset.order_by('-date', '-id').values_list(*columns).iterator(chunk_size=chunk_size)
+    for row in rows:
+        row = ['' if value is None else value for value in row]
+        if row[pod_index]:
+            row[pod_index] = storage.url(row[pod_index])
+        yield row
+
+
+def stream_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the report as encoded CSV, one chunk of ``chunk_size`` rows per yield."""
+    writer = csv.writer(Echo())
+    buffer = [writer.writerow(REPORT_HEADERS)]
+    for row in report_rows(queryset, chunk_size):
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def write_xlsx(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the report with openpyxl's write-only mode and return the open temporary file."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Shipments")
+    ws.append(REPORT_HEADERS)
+    for row in report_rows(queryset, chunk_size):
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
@@ -1,6 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.db.models import Q
 from .models import Shipment, Manifest, CustomUser
+from .lifecycle import LIFECYCLE_BATCH_LIMIT, OPERATION_CHOICES
+from .tracking import TooManyConsignments, parse_consignment_numbers
 
 class ShipmentForm(forms.ModelForm):
     class Meta:
@@ -54,24 +57,17 @@ class CustomUserCreationForm(UserCreationForm):
 class ManifestForm(forms.ModelForm):
     class Meta:
         model = Manifest
-        fields = '__all__'
+        # totals are maintained from the shipments by main.signals
+        exclude = ['total_articles', 'total_freight']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['shipments'].widget = forms.CheckboxSelectMultiple()
-        self.fields['shipments'].queryset = Shipment.objects.filter(status='Booked')
-
-    def clean(self):
-        cleaned_data = super().clean()
-        shipments = cleaned_data.get('shipments')
-
-        if shipments:
-            total_articles = sum(s.no_article for s in shipments)
-            total_freight = sum(s.freight for s in shipments)
-            cleaned_data['total_articles'] = total_articles
-            cleaned_data['total_freight'] = total_freight
-
-        return cleaned_data
+        # Choices are never listed: the page searches them through manifest_shipment_search and
+        # posts the picked ids, which the field checks with one id__in query over these columns.
+        shipments = Shipment.objects.filter(status='Booked')
+        if self.instance.pk:
+            shipments = Shipment.objects.filter(Q(status='Booked') | Q(manifests=self.instance)).distinct()
+        self.fields['shipments'].queryset = shipments.only('id')
 
 
 class PODUploadForm(forms.ModelForm):
@@ -86,10 +82,43 @@ class PODUploadForm(forms.ModelForm):
     def save(self, commit=True):
         instance = super().save(commit=False)
         instance.status = 'Delivered'  # ✅ FORCE status to Delivered
+        instance._event_note = 'POD uploaded'
         if commit:
             instance.save()
         return instance
 
+
+class BulkStatusForm(forms.Form):
+    """Pick a lifecycle operation and the shipments it applies to: a whole manifest or a pasted list."""
+    operation = forms.ChoiceField(choices=OPERATION_CHOICES)
+    manifest = forms.CharField(max_length=100, required=False, label='Manifest ID')
+    consignments = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'rows': 4, 'placeholder': 'Consignment numbers separated by space or comma'}),
+    )
+
+    def clean_manifest(self):
+        manifest_id = self.cleaned_data['manifest'].strip()
+        if not manifest_id:
+            return None
+        try:
+            return Manifest.objects.get(manifest_id=manifest_id)
+        except Manifest.DoesNotExist:
+            raise forms.ValidationError(f"Manifest {manifest_id} does not exist.")
+
+    def clean_consignments(self):
+        try:
+            return parse_consignment_numbers(self.cleaned_data['consignments'], limit=LIFECYCLE_BATCH_LIMIT)
+        except TooManyConsignments as e:
+            raise forms.ValidationError(str(e))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if bool(cleaned_data.get('manifest')) == bool(cleaned_data.get('consignments')):
+            if not self.errors:
+                raise forms.ValidationError("Enter either a manifest ID or a list of consignment numbers.")
+        return cleaned_data
+
 # forms.py
 from django import forms
 from .models import VendorMaster, TripOutToVendor
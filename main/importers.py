@@ -0,0 +1,384 @@
+import io
+from collections import defaultdict
+
+import openpyxl
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, events, matching, search, stats
+from .models import Shipment, CustomerMaster
+
+
+# ---------------------------
+# Column layout
+# ---------------------------
+
+SUMMARY_FIELDS = ['invoice_ref_number', 'consignment_no', 'date', 'origin', 'destination', 'freight']
+
+REQUIRED_TEXT_COLUMNS = [
+    'payment_mode', 'shipment_type', 'origin', 'origin_pin', 'destination', 'destination_pin',
+    'vehicle_no', 'driver_details', 'consignor_name', 'consignor_address', 'consignor_contact',
+    'consignee_name', 'consignee_address', 'consignee_contact', 'invoice_ref_number',
+]
+
+# column -> value used when the cell (or the whole column) is missing
+OPTIONAL_TEXT_COLUMNS = {
+    'billto_customer': None,
+    'consignor_gst': None,
+    'consignee_gst': None,
+    'ewaybill_number': None,
+    'boe_num': '',
+    'pack_type': 'NA',
+    'status': 'Booked',
+    'consignment_no': None,  # only honoured by import_shipments(keep_consignment_no=True)
+    'remark': None,
+    'pod_link': None,
+}
+
+REQUIRED_NUMBER_COLUMNS = ['freight', 'value']
+OPTIONAL_NUMBER_COLUMNS = {'no_article': 0, 'actual_weight': 0, 'charged_weight': 0}
+
+DATE_COLUMNS = ['date', 'estimated_delivery_date', 'delivery_date', 'appointment_date']
+# ISO (and Excel cells, which read back as ISO timestamps), else day first as written in India:
+# 05/04/2025 is 5 April. Anything else is rejected rather than guessed.
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y')
+
+BOOLEAN_VALUES = {'true': True, '1': True, 'yes': True, 'y': True, 'false': False, '0': False, 'no': False, 'n': False}
+
+CHOICE_COLUMNS = {
+    'payment_mode': Shipment.PAYMENT_MODES,
+    'shipment_type': Shipment.SHIPMENT_TYPES,
+    'status': Shipment.STATUS_CHOICES,
+}
+
+
+class UnsupportedFileFormat(Exception):
+    pass
+
+
+class ShipmentImportError(Exception):
+    """Raised with every (row_number, message) pair found while validating a file."""
+
+    def __init__(self, errors, rows=None):
+        self.errors = errors
+        self.rows = rows  # the raw failing rows, indexed by row_number - 1, when the file was streamed
+        super().__init__(self.first_message())
+
+    def first_message(self):
+        row_number, message = self.errors[0]
+        return f"Row {row_number} failed: {message}"
+
+
+IMPORT_CHUNK_SIZE = getattr(settings, 'SHIPMENT_IMPORT_CHUNK_SIZE', 5000)
+
+
+def read_shipment_chunks(file, chunk_size=None):
+    """Yield the rows of an uploaded CSV/Excel file as text DataFrames of at most ``chunk_size`` rows.
+
+    Only one chunk is held in memory at a time. Each chunk keeps the file's running
+    row index, so ``index + 1`` is the data row number across the whole file.
+    """
+    # Everything is read as text so the column conversions below are the only place types are decided.
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    ext = file.name.split('.')[-1].lower()
+    if ext == 'csv':
+        yield from pd.read_csv(file, dtype=str, chunksize=chunk_size)
+    elif ext == 'xlsx':
+        yield from _xlsx_chunks(file, chunk_size)
+    elif ext == 'xls':
+        # the legacy binary format has no streaming reader; slice the loaded sheet instead
+        df = pd.read_excel(file, dtype=str)
+        for start in range(0, len(df.index), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise UnsupportedFileFormat(ext)
+
+
+def count_rows(file):
+    """Data rows in an uploaded file, for progress reporting, or None when they cannot be counted cheaply.
+
+    A CSV counts its line breaks, an .xlsx reads the sheet's stored dimensions. The file is rewound.
+    """
+    ext = file.name.split('.')[-1].lower()
+    try:
+        if ext == 'csv':
+            lines = sum(block.count(b'\n') for block in iter(lambda: file.read(1 << 20), b''))
+            return max(lines - 1, 0)
+        if ext == 'xlsx':
+            wb = openpyxl.load_workbook(file, read_only=True)
+            try:
+                rows = wb.active.max_row
+            finally:
+                wb.close()
+            return rows - 1 if rows else None
+        return None
+    finally:
+        file.seek(0)
+
+
+def _cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # pin codes and phone numbers typed into Excel come back as floats
+    return str(value)
+
+
+def _xlsx_chunks(file, chunk_size):
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(column).strip() if column is not None else '' for column in next(rows, [])]
+        batch, start = [], 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append([_cell_text(value) for value in row[:len(header)]])
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch)), dtype=object)
+                start += len(batch)
+                batch = []
+        if batch or not start:
+            yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch)), dtype=object)
+    finally:
+        wb.close()
+
+
+# ---------------------------
+# Vectorized validation / conversion
+# ---------------------------
+
+def _text(df, column, default=None):
+    if column not in df:
+        # pd.Series(None, dtype=object) would fill with NaN, so spell the default out per row
+        return pd.Series([default] * len(df.index), index=df.index, dtype=object)
+    values = df[column].astype(object).where(df[column].notna(), None)
+    values = values.map(lambda v: v.strip() if isinstance(v, str) else v)
+    return values.where(values.astype(bool), default)
+
+
+def _parse_dates(raw):
+    text = raw.astype(object).where(raw.notna(), None).map(lambda v: v.strip() if isinstance(v, str) else v)
+    parsed = pd.Series(pd.NaT, index=raw.index, dtype='datetime64[ns]')
+    for date_format in DATE_FORMATS:
+        parsed = parsed.fillna(pd.to_datetime(text, errors='coerce', format=date_format))
+    return parsed
+
+
+def missing_columns(columns):
+    return [c for c in REQUIRED_TEXT_COLUMNS + REQUIRED_NUMBER_COLUMNS if c not in columns]
+
+
+def prepare_shipment_frame(df):
+    """Return (frame, errors): a frame of clean python values and a list of (row_number, message)."""
+    clean = pd.DataFrame(index=df.index)
+    problems = pd.Series('', index=df.index, dtype=object)
+
+    def flag(mask, message):
+        mask = mask & (problems == '')
+        problems[mask] = message
+
+    missing = missing_columns(df.columns)
+    if missing:
+        return clean, [(1, f"Missing column(s): {', '.join(missing)}")]
+
+    for column in REQUIRED_TEXT_COLUMNS:
+        clean[column] = _text(df, column)
+        flag(clean[column].isna(), f"'{column}' is required")
+
+    for column, default in OPTIONAL_TEXT_COLUMNS.items():
+        clean[column] = _text(df, column, default)
+
+    for column, choices in CHOICE_COLUMNS.items():
+        allowed = [value for value, _ in choices]
+        flag(~clean[column].isin(allowed), f"'{column}' must be one of {', '.join(allowed)}")
+
+    for column in REQUIRED_NUMBER_COLUMNS:
+        clean[column] = pd.to_numeric(df[column], errors='coerce').astype(float)
+        flag(clean[column].isna(), f"'{column}' must be a number")
+
+    for column, default in OPTIONAL_NUMBER_COLUMNS.items():
+        raw = df[column] if column in df else pd.Series(None, index=df.index, dtype=object)
+        clean[column] = pd.to_numeric(raw, errors='coerce').astype(float)
+        flag(raw.notna() & clean[column].isna(), f"'{column}' must be a number")
+        clean[column] = clean[column].fillna(default)
+    clean['no_article'] = clean['no_article'].astype(int)
+
+    today = timezone.now().date()
+    for column in DATE_COLUMNS:
+        raw = df[column] if column in df else pd.Series(None, index=df.index, dtype=object)
+        parsed = _parse_dates(raw)
+        flag(raw.notna() & parsed.isna(), f"'{column}' is not a valid date")
+        clean[column] = pd.Series(parsed.dt.date, index=df.index, dtype=object).where(parsed.notna(), None)
+    clean['date'] = clean['date'].where(clean['date'].notna(), today)
+
+    raw = _text(df, 'appointment_delivery', 'false').str.lower()
+    flag(~raw.isin(list(BOOLEAN_VALUES)), "'appointment_delivery' must be TRUE or FALSE")
+    clean['appointment_delivery'] = raw.map(lambda v: BOOLEAN_VALUES.get(v, False))
+
+    bad = problems[problems != '']
+    errors = [(index + 1, message) for index, message in bad.items()]
+    return clean, errors
+
+
+def resolve_customers(customer_ids):
+    """Map customer_id -> CustomerMaster with a single customer_id__in query."""
+    wanted = {c for c in customer_ids if c}
+    if not wanted:
+        return {}
+    return {c.customer_id: c for c in CustomerMaster.objects.filter(customer_id__in=wanted)}
+
+
+# ---------------------------
+# Import
+# ---------------------------
+
+def validate_shipments(df, keep_consignment_no=False, seen=None, reviews=None):
+    """Check every row before anything is written; raise ShipmentImportError listing all problems.
+
+    ``seen`` collects the consignment numbers of earlier chunks of the same file, ``reviews``
+    the low-confidence fuzzy matches to queue (see main.matching).
+    """
+    reviews = {} if reviews is None else reviews
+    clean, errors = prepare_shipment_frame(df)
+    if clean.empty and errors:
+        raise ShipmentImportError(errors)  # missing columns, nothing else can be checked
+
+    customers = resolve_customers(clean['billto_customer'].unique())
+    unknown = clean['billto_customer'].notna() & ~clean['billto_customer'].isin(list(customers))
+    if unknown.any():
+        # slightly-off IDs or company names resolve to the customer when the match is confident
+        matched = matching.match_customers(clean.loc[unknown, 'billto_customer'].unique(), reviews)
+        clean['billto_customer'] = clean['billto_customer'].replace({raw: m.value for raw, m in matched.items()})
+        customers.update(resolve_customers(m.value for m in matched.values()))
+        unknown = clean['billto_customer'].notna() & ~clean['billto_customer'].isin(list(customers))
+    errors += [
+        (index + 1, _unknown_customer(customer_id, reviews.get(('customer', customer_id))))
+        for index, customer_id in clean.loc[unknown, 'billto_customer'].items()
+    ]
+
+    for kind in ('consignor', 'consignee'):
+        clean[f'{kind}_name'] = matching.canonical_parties(clean[f'{kind}_name'], kind, reviews)
+
+    if keep_consignment_no:
+        seen = set() if seen is None else seen
+        given = clean['consignment_no'].dropna()
+        repeated = given.duplicated(keep='first') | given.isin(seen)
+        errors += [(index + 1, f"Consignment No '{no}' appears more than once") for index, no in given[repeated].items()]
+        given = given[~repeated]
+        taken = set(Shipment.objects.filter(consignment_no__in=set(given)).values_list('consignment_no', flat=True))
+        errors += [(index + 1, f"Consignment No '{no}' already exists") for index, no in given.items() if no in taken]
+        seen.update(given)
+    else:
+        clean['consignment_no'] = None
+
+    if errors:
+        raise ShipmentImportError(sorted(errors, key=lambda error: error[0]))
+    return clean, customers
+
+
+def _unknown_customer(customer_id, suggestion):
+    if suggestion is None:
+        return f"Customer with ID '{customer_id}' not found"
+    return (f"Customer with ID '{customer_id}' not found; closest is '{suggestion.value}' "
+            f"({suggestion.score}%), queued for review")
+
+
+def import_shipments(df, batch_size=None, keep_consignment_no=False, seen=None, reviews=None):
+    """Validate ``df`` and insert every row, all or nothing. Returns the summary rows.
+
+    Blank consignment numbers are filled from one reserved block; with
+    ``keep_consignment_no`` the numbers given in the file are used as they are.
+    """
+    batch_size = batch_size or getattr(settings, 'SHIPMENT_IMPORT_BATCH_SIZE', 500)
+    clean, customers = validate_shipments(df, keep_consignment_no, seen, reviews)
+
+    records = clean.to_dict('records')
+    summary = []
+    with transaction.atomic():
+        if keep_consignment_no:
+            # before reserving, so the numbers filled in below cannot repeat one given in the file
+            Shipment.claim_consignment_numbers(clean['consignment_no'].dropna())
+        numbers = iter(Shipment.reserve_consignment_numbers(int(clean['consignment_no'].isna().sum())))
+        shipments = []
+        for record in records:
+            record['billto_customer'] = customers.get(record['billto_customer'])
+            record['consignment_no'] = record['consignment_no'] or next(numbers)
+            shipments.append(Shipment(**record))
+            summary.append({field: record[field] for field in SUMMARY_FIELDS})
+        Shipment.objects.bulk_create(shipments, batch_size=batch_size)
+        stats.add(shipments)  # bulk_create sends no post_save
+        events.record_created(shipments, note='Bulk upload')
+        search.index(shipments)
+        matching.count_parties(shipments)
+        transaction.on_commit(lambda: caching.bump(Shipment))
+    return summary
+
+
+def import_shipment_file(file, keep_consignment_no=False, summary=None, chunk_size=None, batch_size=None,
+                         progress=None):
+    """Stream ``file`` into the database one chunk at a time, all or nothing. Returns the row count.
+
+    Chunks are validated and inserted as they are read, inside one transaction; after the
+    first bad chunk the rest of the file is only validated, and the transaction is rolled
+    back with every error found. ``summary`` (e.g. a csv.DictWriter) receives each chunk's
+    summary rows so they never pile up in memory. ``progress`` is called with the number
+    of rows handled so far as each chunk finishes.
+    """
+    errors, failed = [], []
+    seen = set()
+    reviews = {}
+    count = read = 0
+    try:
+        with transaction.atomic():
+            for df in read_shipment_chunks(file, chunk_size):
+                if progress is not None and read:
+                    progress(read)  # the chunk before this one is done
+                read += len(df)
+                missing = missing_columns(df.columns)
+                if missing:
+                    # the empty frame keeps the file's header for the error workbook
+                    raise ShipmentImportError([(1, f"Missing column(s): {', '.join(missing)}")], rows=df.iloc[:0])
+                try:
+                    if errors:
+                        validate_shipments(df, keep_consignment_no, seen, reviews)
+                        continue
+                    rows = import_shipments(df, batch_size, keep_consignment_no, seen, reviews)
+                except ShipmentImportError as e:
+                    errors += e.errors
+                    failed.append(df.loc[df.index.isin([row_number - 1 for row_number, _ in e.errors])])
+                    continue
+                count += len(rows)
+                if summary is not None:
+                    summary.writerows(rows)
+            if progress is not None:
+                progress(read)
+            if errors:
+                raise ShipmentImportError(errors, rows=pd.concat(failed))
+    finally:
+        # outside the import transaction, so a rejected file still leaves its matches to review
+        matching.queue_reviews(reviews)
+    return count
+
+
+def error_workbook(df, errors):
+    """Return an .xlsx (bytes) with every failing row of ``df`` and the reasons it failed.
+
+    ``df`` is indexed by ``row_number - 1``: the whole upload, or ShipmentImportError.rows.
+    """
+    messages = defaultdict(list)
+    for row_number, message in errors:
+        messages[row_number].append(message)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Errors")
+    ws.append(['row', 'errors'] + [str(column) for column in df.columns])
+    for row_number in sorted(messages):
+        values = df.loc[row_number - 1].tolist() if (row_number - 1) in df.index else []
+        ws.append([row_number, '; '.join(messages[row_number])] + [None if pd.isna(v) else v for v in values])
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
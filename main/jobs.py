@@ -0,0 +1,156 @@
+import csv
+import io
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .documents import render_consignment_notes, render_labels, render_manifest_pdf
+from .importers import SUMMARY_FIELDS, count_rows, import_shipment_file
+from .models import Job, Manifest, Shipment
+
+
+JOB_STALE_AFTER = getattr(settings, 'JOB_STALE_AFTER', 10 * 60)  # seconds without a heartbeat
+JOB_MAX_ATTEMPTS = getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+
+
+def submit(kind, user=None, params=None, input_file=None):
+    job = Job(kind=kind, params=params or {}, created_by=user if user and user.is_authenticated else None)
+    if input_file is not None:
+        job.input_file.save(os.path.basename(input_file.name), input_file, save=False)
+    job.save()
+    return job
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_jobs(limit, worker):
+    """Move up to ``limit`` queued jobs to Running for ``worker`` and return their ids.
+
+    The status check in the UPDATE makes claiming safe when several run_workers
+    processes poll the same table: only one of them gets a row count of 1.
+    """
+    claimed = []
+    candidates = Job.objects.filter(status='Queued').order_by('created_at').values_list('pk', flat=True)
+    for pk in candidates[:limit]:
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status='Queued').update(
+            status='Running', worker=worker, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def heartbeat(pks):
+    """Mark the jobs ``pks`` as still running. run_workers calls this on every poll."""
+    if pks:
+        Job.objects.filter(pk__in=list(pks), status='Running').update(heartbeat_at=timezone.now())
+
+
+def reclaim_stale_jobs(stale_after=JOB_STALE_AFTER, max_attempts=JOB_MAX_ATTEMPTS):
+    """Requeue Running jobs whose worker stopped sending heartbeats, or fail them after ``max_attempts``.
+
+    A worker that was killed or lost its host leaves its jobs Running forever
+    otherwise. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=stale_after)
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), status='Running',
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='Failed', finished_at=now, message=f"The worker stopped responding ({max_attempts} attempts).",
+    )
+    requeued = stale.update(status='Queued', worker='', progress=0, started_at=None, heartbeat_at=None)
+    return requeued, failed
+
+
+def run_job(pk):
+    """Execute a claimed job. Runs inside a worker process."""
+    close_old_connections()
+    job = Job.objects.get(pk=pk)
+    try:
+        filename, content = TASKS[job.kind](job)
+    except Exception as e:
+        job.status = 'Failed'
+        job.message = str(e)
+    else:
+        job.result_file.save(filename, ContentFile(content), save=False)
+        job.status = 'Done'
+        job.progress = 100
+    job.finished_at = timezone.now()
+    # only this attempt's row: a job reclaimed in the meantime belongs to another worker now
+    finished = Job.objects.filter(pk=pk, status='Running', attempts=job.attempts).update(
+        status=job.status, message=job.message, progress=job.progress, result_file=job.result_file.name,
+        finished_at=job.finished_at,
+    )
+    if not finished:
+        if job.result_file:
+            job.result_file.delete(save=False)
+        job.status = 'Reclaimed'
+    close_old_connections()
+    return job.status
+
+
+# ---------------------------
+# Tasks: each returns (filename, bytes)
+# ---------------------------
+
+def _requested_shipments(job):
+    numbers = job.params['consignments']
+    shipments = {s.consignment_no: s for s in Shipment.objects.filter(consignment_no__in=numbers)}
+    return [shipments[no] for no in numbers if no in shipments]
+
+
+def bulk_upload_task(job):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=SUMMARY_FIELDS)
+    writer.writeheader()
+    with job.input_file.open('rb') as file:
+        total = count_rows(file)
+
+        def progress(done):
+            if total:
+                job.set_progress(min(done, total), total)
+
+        # ShipmentImportError carries the "Row N failed" message
+        count = import_shipment_file(file, summary=writer, progress=progress)
+    job.message = f"Imported {count} shipments."
+    return 'uploaded_shipments.csv', output.getvalue().encode('utf-8')
+
+
+def labels_task(job):
+    shipments = _requested_shipments(job)
+    output = io.BytesIO()
+
+    def with_progress():
+        for done, shipment in enumerate(shipments, start=1):
+            yield shipment
+            job.set_progress(done, len(shipments))
+
+    render_labels(with_progress(), output)
+    return 'shipment_labels.pdf', output.getvalue()
+
+
+def consignment_notes_task(job):
+    return 'consignment_notes.pdf', render_consignment_notes(_requested_shipments(job), progress=job.set_progress)
+
+
+def manifest_pdf_task(job):
+    manifest = Manifest.objects.get(pk=job.params['manifest'])
+    return f"manifest_{manifest.manifest_id}.pdf", render_manifest_pdf(manifest, progress=job.set_progress)
+
+
+TASKS = {
+    'bulk_upload': bulk_upload_task,
+    'labels': labels_task,
+    'consignment_notes': consignment_notes_task,
+    'manifest_pdf': manifest_pdf_task,
+}
@@ -0,0 +1,88 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import caching, events, stats, tracking
+from .models import Shipment, ShipmentStatusChange
+
+
+LIFECYCLE_BATCH_LIMIT = getattr(settings, 'LIFECYCLE_BATCH_LIMIT', 1000)  # consignments per pasted list
+
+Operation = namedtuple('Operation', 'label from_statuses to_status')
+
+OPERATIONS = {
+    'dispatch': Operation('Dispatch', ('Booked',), 'In Transit'),
+    'out_for_delivery': Operation('Out For Delivery', ('In Transit',), 'Out For Delivery'),
+    'deliver': Operation('Deliver', ('In Transit', 'Out For Delivery'), 'Delivered'),
+}
+
+OPERATION_CHOICES = [(name, operation.label) for name, operation in OPERATIONS.items()]
+
+# read once before the UPDATE: the audit rows, the rollup and the tracking cache all need the old values
+_BEFORE_COLUMNS = ('pk', 'consignment_no', *stats.STAT_FIELDS)
+
+
+def transition(shipments, operation, user=None, manifest=None):
+    """Move the ``shipments`` (a queryset) that are in a valid state for ``operation`` in one UPDATE.
+
+    Shipments in any other state are left alone. Since QuerySet.update() skips the
+    model signals, the audit trail, status events, rollup, tracking cache and page
+    versions are maintained here, for the rows the UPDATE really moved. Returns
+    (moved, skipped).
+    """
+    op = OPERATIONS[operation]
+    now = timezone.now()
+    with transaction.atomic():
+        # locked so a concurrent transition cannot move them between this read and the UPDATE
+        # (SQLite ignores the lock, but its IMMEDIATE transactions already hold the write lock here)
+        before = list(shipments.select_for_update().order_by().values(*_BEFORE_COLUMNS))
+        eligible = [row for row in before if row['status'] in op.from_statuses]
+        if not eligible:
+            return 0, len(before)
+
+        delivering = op.to_status == 'Delivered'
+        today = timezone.localdate()
+        changes = {'status': op.to_status, 'updated_at': now}
+        if delivering:
+            changes['delivery_date'] = Coalesce('delivery_date', Value(today))  # keep a date entered earlier
+        ids = [row['pk'] for row in eligible]
+        moved = Shipment.objects.filter(pk__in=ids, status__in=op.from_statuses).update(**changes)
+        if moved != len(eligible):
+            # some rows changed after the read anyway: record only the ones this UPDATE stamped
+            stamped = set(
+                Shipment.objects.filter(pk__in=ids, status=op.to_status, updated_at=now).values_list('pk', flat=True)
+            )
+            eligible = [row for row in eligible if row['pk'] in stamped]
+            if not eligible:
+                return 0, len(before)
+
+        after = [
+            dict(row, status=op.to_status, delivery_date=(row['delivery_date'] or today) if delivering else row['delivery_date'])
+            for row in eligible
+        ]
+        ShipmentStatusChange.objects.bulk_create([
+            ShipmentStatusChange(
+                shipment_id=row['pk'], operation=operation, from_status=row['status'], to_status=op.to_status,
+                manifest=manifest, changed_by=user, changed_at=now,
+            )
+            for row in eligible
+        ], batch_size=500)
+        events.record(after, note=f"Manifest {manifest.manifest_id}" if manifest else op.label, ts=now)
+        stats.move_many(eligible, after)
+
+        numbers = [row['consignment_no'] for row in eligible]
+        transaction.on_commit(lambda: tracking.invalidate(numbers))
+        transaction.on_commit(lambda: caching.bump(Shipment))
+    return len(eligible), len(before) - len(eligible)
+
+
+def transition_manifest(manifest, operation, user=None):
+    return transition(manifest.shipments.all(), operation, user=user, manifest=manifest)
+
+
+def transition_consignments(numbers, operation, user=None):
+    return transition(Shipment.objects.filter(consignment_no__in=numbers), operation, user=user)
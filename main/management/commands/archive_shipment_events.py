@@ -0,0 +1,60 @@
+import csv
+import gzip
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from main.events import STATUS_NAMES
+from main.models import ShipmentEvent
+
+
+ARCHIVE_COLUMNS = ('id', 'shipment_id', 'shipment__consignment_no', 'status', 'ts', 'branch', 'note')
+
+
+class Command(BaseCommand):
+    help = "Move shipment events older than N months into a gzipped CSV and delete them from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help="Archive events older than this many months (default 12).")
+        parser.add_argument('--output', help="Archive file; defaults to MEDIA_ROOT/archive/shipment_events_before_<date>.csv.gz.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help="Only count the events that would be archived.")
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError("--months must be at least 1.")
+        cutoff = timezone.now() - timedelta(days=30 * options['months'])
+        old = ShipmentEvent.objects.filter(ts__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f"{old.count()} event(s) older than {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        output = options['output'] or os.path.join(
+            settings.MEDIA_ROOT, 'archive', f"shipment_events_before_{cutoff:%Y-%m-%d}.csv.gz")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+        archived = 0
+        new_file = not os.path.exists(output)
+        with gzip.open(output, 'at', newline='') as handle:  # re-running with the same cutoff appends
+            writer = csv.writer(handle)
+            if new_file:
+                writer.writerow(['id', 'shipment_id', 'consignment_no', 'status', 'ts', 'branch', 'note'])
+            while True:
+                # each batch is written to the file before its rows are deleted
+                with transaction.atomic():
+                    batch = list(old.order_by('pk').values_list(*ARCHIVE_COLUMNS)[:options['batch_size']])
+                    if not batch:
+                        break
+                    writer.writerows(
+                        (pk, shipment_id, consignment_no, STATUS_NAMES[status], ts.isoformat(), branch, note)
+                        for pk, shipment_id, consignment_no, status, ts, branch, note in batch
+                    )
+                    handle.flush()
+                    ShipmentEvent.objects.filter(pk__in=[row[0] for row in batch]).delete()
+                archived += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} event(s) older than {cutoff:%Y-%m-%d} to {output}."))
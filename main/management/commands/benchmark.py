@@ -0,0 +1,106 @@
+import json
+import platform
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from main import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Generate synthetic data in a throwaway test database and time the hot views and helpers. "
+            "The real database is never touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=20)
+        parser.add_argument('--vendors', type=int, default=10)
+        parser.add_argument('--branches', type=int, default=8)
+        parser.add_argument('--fleets', type=int, default=30)
+        parser.add_argument('--shipments', type=int, default=5000)
+        parser.add_argument('--manifests', type=int, default=200)
+        parser.add_argument('--trips', type=int, default=300)
+        parser.add_argument('--days', type=int, default=180, help="Spread shipment dates over this many days.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per scenario.")
+        parser.add_argument('--upload-rows', type=int, default=1000, help="Rows per shipment_bulk_upload run.")
+        parser.add_argument('--batch', type=int, default=20,
+                            help="Consignments per label / consignment note / tracking request.")
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=list(benchmark.SCENARIOS),
+                            help="Only run this scenario (repeatable).")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="A previous JSON result to compare median times against.")
+
+    def handle(self, *args, **options):
+        baseline = self.load(options['compare']) if options['compare'] else None
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            created = benchmark.generate(
+                customers=options['customers'], vendors=options['vendors'], branches=options['branches'],
+                fleets=options['fleets'], shipments=options['shipments'], manifests=options['manifests'],
+                trips=options['trips'], days=options['days'], seed=options['seed'],
+            )
+            generated_in = time.perf_counter() - start
+            self.stdout.write(f"Generated {created} in {generated_in:.1f}s")
+
+            ctx = benchmark.Context(seed=options['seed'], upload_rows=options['upload_rows'], batch=options['batch'])
+            results = benchmark.run(ctx, names=options['scenarios'], repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'git_commit': self.git_commit(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'options': {key: options[key] for key in (
+                    'customers', 'vendors', 'branches', 'fleets', 'shipments', 'manifests', 'trips',
+                    'days', 'seed', 'repeat', 'upload_rows', 'batch',
+                )},
+                'generated': created,
+                'generate_seconds': round(generated_in, 2),
+            },
+            'scenarios': results,
+        }
+        self.print_table(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, default=str)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)['scenarios']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_table(self, results, baseline):
+        self.stdout.write(f"{'scenario':36} {'median ms':>10} {'p95 ms':>10} {'queries':>8} {'vs base':>8}")
+        for name, result in results.items():
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"{name:36} {result['error']}"))
+                continue
+            change = ''
+            before = (baseline or {}).get(name, {}).get('median_ms')
+            if before:
+                change = f"{result['median_ms'] / before:.2f}x"
+            self.stdout.write(
+                f"{name:36} {result['median_ms']:>10} {result['p95_ms']:>10} {result['queries']!s:>8} {change:>8}"
+            )
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory
+from django.utils import timezone
+
+from main.models import CustomUser, Shipment
+from main.queries import SHIPMENT_LIST_COLUMNS, SHIPMENT_PAGE_SIZE, with_consignment_prefix
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot Shipment queries from main.views and ShipmentAdmin to check index use."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help="Run EXPLAIN ANALYZE where the database supports it (MySQL 8.0.18+).")
+
+    def handle(self, *args, **options):
+        sample = Shipment.objects.values('billto_customer', 'vehicle_no', 'consignment_no').first() or {}
+        customer = sample.get('billto_customer') or 'CUST-000000'
+        vehicle = sample.get('vehicle_no') or 'KA01AB1234'
+        consignment_no = sample.get('consignment_no') or 'CN-25001'
+        year_prefix = f"CN-{str(timezone.now().year)[2:4]}"
+        today = timezone.now().date()
+        month_ago = today - timedelta(days=30)
+        listing = Shipment.objects.only(*SHIPMENT_LIST_COLUMNS).order_by('-date', '-pk')
+
+        queries = [
+            ("shipment_list (Internal, first page)", listing[:SHIPMENT_PAGE_SIZE + 1]),
+            ("shipment_list (next page)",
+             listing.filter(Q(date__lt=today) | Q(date=today, pk__lt=1_000_000))[:SHIPMENT_PAGE_SIZE + 1]),
+            ("shipment_list (External, date range)",
+             listing.filter(billto_customer=customer, date__range=(month_ago, today))[:SHIPMENT_PAGE_SIZE + 1]),
+            ("shipment_list (status filter)", listing.filter(status='Booked')[:SHIPMENT_PAGE_SIZE + 1]),
+            ("download_shipment_report (customer)",
+             Shipment.objects.filter(billto_customer=customer).order_by('-date', '-id').values_list('consignment_no')),
+            ("bulk/public tracking", Shipment.objects.filter(consignment_no__in=[consignment_no])),
+            ("vehicle bookings", Shipment.objects.filter(vehicle_no=vehicle)),
+            ("consignment prefix (startswith)", Shipment.objects.filter(consignment_no__startswith=year_prefix)),
+            ("consignment prefix (range)", with_consignment_prefix(Shipment.objects.all(), year_prefix)),
+        ]
+        queries += self.admin_queries()
+
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'mysql' else {}
+        for label, queryset in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
+
+    def admin_queries(self):
+        """Build the changelist querysets exactly as ShipmentAdmin would for a superuser."""
+        model_admin = admin.site._registry[Shipment]
+        user = CustomUser(username='explain', is_superuser=True, is_staff=True, is_active=True)
+        factory = RequestFactory()
+        queries = []
+        for label, params in [
+            ("ShipmentAdmin changelist", {}),
+            ("ShipmentAdmin status filter", {'status__exact': 'Booked'}),
+            ("ShipmentAdmin origin/destination filter", {'origin': 'Bengaluru', 'destination': 'Chennai'}),
+            ("ShipmentAdmin date hierarchy", {'date__year': str(timezone.now().year)}),
+        ]:
+            request = factory.get('/admin/main/shipment/', params)
+            request.user = user
+            changelist = model_admin.get_changelist_instance(request)
+            queries.append((label, changelist.get_queryset(request)))
+        return queries
@@ -0,0 +1,87 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from main import benchmark, db
+from main.models import Shipment
+
+
+class Command(BaseCommand):
+    help = ("Post concurrent shipment_create bookings against a throwaway test database and report throughput "
+            "for the active TMS_DB_PROFILE. Run once per profile to compare. The real database is never touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent clients.")
+        parser.add_argument('--bookings', type=int, default=25, help="Bookings posted by each client.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        threads, per_thread = options['threads'], options['bookings']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        scratch = None
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # the default in-memory test database has no journal or file locks, so it would measure nothing
+            scratch = tempfile.mkdtemp(prefix='tms-load-')
+            test_settings['NAME'] = os.path.join(scratch, 'load_test.sqlite3')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if connection.vendor == 'sqlite' and settings.SQLITE_JOURNAL_MODE:
+                db.journal_mode(connection, settings.SQLITE_JOURNAL_MODE)  # the mode this profile deploys with
+            connection.close()  # every client opens its own connection, through connection_created
+            latencies, failures = [], []
+            lock = threading.Lock()
+
+            def client(index):
+                rng = random.Random(options['seed'] + index)
+                http = Client()
+                try:
+                    for _ in range(per_thread):
+                        start = time.perf_counter()
+                        try:
+                            response = http.post(reverse('shipment_create'), benchmark.booking_form(rng))
+                            error = None if response.status_code == 302 else f"HTTP {response.status_code}"
+                        except Exception as e:  # "database is locked" surfaces here
+                            error = f"{type(e).__name__}: {e}"
+                        elapsed = (time.perf_counter() - start) * 1000
+                        with lock:
+                            (failures if error else latencies).append(error or elapsed)
+                finally:
+                    connections.close_all()
+
+            workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            wall = time.perf_counter() - start
+            created = Shipment.objects.count()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if scratch:
+                test_settings.pop('NAME', None)
+                shutil.rmtree(scratch, ignore_errors=True)  # including the -wal/-shm files
+
+        result = benchmark.summarize(latencies)
+        self.stdout.write(f"profile {settings.DB_PROFILE} ({connection.vendor}), "
+                          f"{threads} clients x {per_thread} bookings")
+        self.stdout.write(f"  created      {created} shipments in {wall:.2f}s = {created / wall:.1f} bookings/s")
+        if result['runs']:
+            self.stdout.write(f"  latency ms   median {result['median_ms']}  p95 {result['p95_ms']}  max {result['max_ms']}")
+        if failures:
+            self.stdout.write(self.style.ERROR(f"  failed       {len(failures)}, e.g. {failures[0]}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("  failed       0"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from main import matching
+from main.models import PartyName
+
+
+class Command(BaseCommand):
+    help = "Recount the PartyName table (the fuzzy-match party index) from the Shipment table."
+
+    def handle(self, *args, **options):
+        matching.rebuild_party_names()
+        self.stdout.write(self.style.SUCCESS(f"Counted {PartyName.objects.count()} party name(s)."))
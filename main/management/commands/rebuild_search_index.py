@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from main import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite full-text shipment index (MySQL's FULLTEXT index needs no rebuild)."
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"Nothing to do on {connection.vendor}.")
+            return
+        with transaction.atomic():
+            count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} shipment(s)."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from main import stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ShipmentDailyStat rollup from the Shipment table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First shipment date to rebuild (YYYY-MM-DD); from the beginning if omitted.")
+        parser.add_argument('--end', help="Last shipment date to rebuild (YYYY-MM-DD); up to the latest if omitted.")
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and not parse_date(start) or end and not parse_date(end):
+            raise CommandError("Dates must be YYYY-MM-DD.")
+        rows = stats.rebuild(start and parse_date(start), end and parse_date(end))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily stat row(s)."))
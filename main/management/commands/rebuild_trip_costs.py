@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main import tripcosts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the TripCostRollup table from TripOutToVendor."
+
+    def handle(self, *args, **options):
+        rows = tripcosts.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} trip cost row(s)."))
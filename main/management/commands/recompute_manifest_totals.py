@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Manifest
+from main.signals import recompute_manifest_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored total_articles/total_freight of manifests from their shipments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest_ids', nargs='*', help="Manifest IDs (e.g. MF-25001); all manifests if omitted.")
+
+    def handle(self, *args, **options):
+        manifests = Manifest.objects.all()
+        if options['manifest_ids']:
+            manifests = manifests.filter(manifest_id__in=options['manifest_ids'])
+        updated = recompute_manifest_totals(manifests)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed totals for {updated} manifest(s)."))
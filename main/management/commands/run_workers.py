@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main.jobs import claim_jobs, heartbeat, reclaim_stale_jobs, run_job, worker_name
+from main.models import Job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (bulk upload, labels, consignment notes, manifest PDFs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=getattr(settings, 'JOB_WORKER_PROCESSES', 2),
+                            help="Number of worker processes.")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is empty (e.g. when run from cron).")
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        name = worker_name()
+        self.stdout.write(f"Worker {name} started with {processes} process(es).")
+
+        running = {}
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            try:
+                while True:
+                    heartbeat(running.values())
+                    requeued, failed = reclaim_stale_jobs()
+                    if requeued or failed:
+                        self.stderr.write(f"Reclaimed stale jobs: {requeued} requeued, {failed} failed.")
+                    free = processes - len(running)
+                    claimed = claim_jobs(free, name) if free else []
+                    # worker processes are forked on submit and must not inherit an open connection
+                    connections.close_all()
+                    for pk in claimed:
+                        running[executor.submit(run_job, pk)] = pk
+                        self.stdout.write(f"Job {pk} started.")
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pk = running.pop(future)
+                        try:
+                            self.stdout.write(f"Job {pk} {future.result().lower()}.")
+                        except Exception as e:
+                            Job.objects.filter(pk=pk, status='Running').update(status='Failed', message=str(e))
+                            self.stderr.write(f"Job {pk} crashed: {e}")
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping; waiting for running jobs to finish.")
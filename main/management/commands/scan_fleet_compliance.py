@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from main import compliance
+
+
+class Command(BaseCommand):
+    help = ("List active vehicles whose insurance, fitness, permit or pollution certificate has lapsed or "
+            "expires within --days, with the open bookings on the lapsed ones. Meant to run daily from cron; "
+            "the scan is cached for the rest of the day, so the compliance page reuses it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=compliance.COMPLIANCE_DAYS,
+                            help="Flag documents expiring within this many days.")
+
+    def handle(self, *args, **options):
+        report = compliance.report(options['days'])
+        for vehicle in report['vehicles']:
+            documents = ', '.join(
+                f"{doc['document']} {doc['state'].lower()}" + (f" {doc['valid_till']}" if doc['valid_till'] else '')
+                for doc in vehicle['documents']
+            )
+            line = f"{vehicle['vehicle_number']}: {documents}"
+            if vehicle['bookings']:
+                line += f" ({len(vehicle['bookings'])} open booking(s))"
+            self.stdout.write(line if vehicle['compliant'] else self.style.ERROR(line))
+
+        lapsed = sum(1 for vehicle in report['vehicles'] if not vehicle['compliant'])
+        summary = (f"{len(report['vehicles'])} vehicle(s) flagged within {report['days']} days, "
+                   f"{lapsed} with an expired or missing document, "
+                   f"{report['blocked_bookings']} open booking(s) on those.")
+        self.stdout.write(self.style.WARNING(summary) if lapsed else self.style.SUCCESS(summary))
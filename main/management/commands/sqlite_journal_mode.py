@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from main import db
+
+
+class Command(BaseCommand):
+    help = ("Show or switch the journal mode stored in the SQLite database file. Run once with 'wal' when "
+            "deploying the tuned sqlite profile, with 'delete' to go back; stop the app server first, "
+            "since SQLite only switches when no other connection has the file open.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('mode', nargs='?', type=str.upper, choices=('WAL', 'DELETE'),
+                            help=f"New journal mode (this profile expects {settings.SQLITE_JOURNAL_MODE or 'neither'}).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Nothing to do on {connection.vendor}.")
+        mode = options['mode']
+        current = db.journal_mode(connection, mode)
+        if mode and current != mode:
+            raise CommandError(f"Still {current}: another connection has the database open.")
+        self.stdout.write(self.style.SUCCESS(f"{connection.settings_dict['NAME']}: journal_mode={current}"))
@@ -0,0 +1,254 @@
+"""Fuzzy matching of bulk-import values against known customers and parties.
+
+Each index is a list of normalised keys built once per process and reused until
+the data behind it changes (customers, accepted reviews) or it gets old (parties,
+read from the PartyName counts). Values whose normalised key is in the index are
+resolved with a dict lookup; the rest of a column is matched with one rapidfuzz
+``process.cdist`` call over its distinct values:
+
+* score >= MATCH_ACCEPT_SCORE: the value is replaced by the match;
+* score >= MATCH_REVIEW_SCORE: left as it is and queued as a MatchReview;
+* anything lower is treated as unknown.
+
+Consignor and consignee names print on notes and labels, so those are only
+replaced when the key is identical (or an accepted alias); every fuzzy party
+match goes to review, whatever its score.
+"""
+import time
+from collections import Counter, namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from rapidfuzz import fuzz, process, utils
+
+from . import caching
+from .models import CustomerMaster, MatchReview, PartyName, Shipment
+
+
+MATCH_ACCEPT_SCORE = getattr(settings, 'MATCH_ACCEPT_SCORE', 92)
+MATCH_REVIEW_SCORE = getattr(settings, 'MATCH_REVIEW_SCORE', 75)
+PARTY_INDEX_SIZE = getattr(settings, 'PARTY_INDEX_SIZE', 20000)  # most frequent consignor/consignee names
+PARTY_INDEX_TIMEOUT = getattr(settings, 'PARTY_INDEX_TIMEOUT', 60 * 60)
+MATCH_BLOCK_SIZE = 1000  # query rows per cdist call, bounds the score matrix to block x index bytes
+
+# words that tell nothing apart: "ABC Pvt. Ltd." and "abc private limited" are the same party
+STOP_WORDS = {'pvt', 'private', 'ltd', 'limited', 'llp', 'inc', 'co', 'company', 'corp', 'the', 'and', 'm', 's'}
+
+Match = namedtuple('Match', 'value score')
+
+
+def normalize(name):
+    """Lower-cased words without punctuation or STOP_WORDS, sorted so word order does not matter."""
+    words = utils.default_process(name or '').split()
+    return ' '.join(sorted(w for w in words if w not in STOP_WORDS) or words)
+
+
+def _digits(text):
+    return ''.join(c for c in text if c.isdigit())
+
+
+class MatchIndex:
+    """Normalised keys and the value each stands for (None when a key is shared by several values)."""
+
+    def __init__(self, pairs, aliases=None):
+        values = {}
+        for key, value in pairs:
+            if key:
+                values[key] = value if values.get(key, value) == value else None
+        self.lookup = values
+        self.keys = list(values)
+        self.values = [values[key] for key in self.keys]
+        self.aliases = aliases or {}
+
+    def match(self, raw_values):
+        """{raw value: Match} for every value scoring at least MATCH_REVIEW_SCORE."""
+        found = {}
+        pending = {}
+        for raw in raw_values:
+            key = normalize(raw)
+            if key in self.aliases:
+                found[raw] = Match(self.aliases[key], 100)
+            elif key in self.lookup:
+                # an exact hit needs no scoring; an ambiguous key would win cdist and be dropped anyway
+                if self.lookup[key] is not None:
+                    found[raw] = Match(self.lookup[key], 100)
+            elif key:
+                pending.setdefault(key, []).append(raw)
+        if not pending or not self.keys:
+            return found
+
+        queries = list(pending)
+        for start in range(0, len(queries), MATCH_BLOCK_SIZE):
+            block = queries[start:start + MATCH_BLOCK_SIZE]
+            # keys are token-sorted by normalize(), so plain ratio scores like token_sort_ratio at half the cost
+            scores = process.cdist(block, self.keys, scorer=fuzz.ratio, dtype=np.uint8,
+                                   score_cutoff=MATCH_REVIEW_SCORE, workers=-1)
+            best = scores.argmax(axis=1)
+            for query, column, score in zip(block, best, scores[np.arange(len(block)), best]):
+                value = self.values[column]
+                if not score or value is None:
+                    continue
+                if _digits(query) != _digits(self.keys[column]):
+                    # "Consignee 1234" vs "Consignee 1235" scores high but is another party: never auto-apply
+                    score = min(score, MATCH_ACCEPT_SCORE - 1)
+                for raw in pending[query]:
+                    found[raw] = Match(value, int(score))
+        return found
+
+
+# ---------------------------
+# Cached indexes
+# ---------------------------
+
+_indexes = {}
+
+
+def _aliases(kind):
+    accepted = MatchReview.objects.filter(kind=kind, status='Accepted').values_list('raw_value', 'suggestion')
+    return {normalize(raw): suggestion for raw, suggestion in accepted}
+
+
+def _cached(name, version, build, max_age=None):
+    entry = _indexes.get(name)
+    if entry and entry[0] == version and (max_age is None or time.monotonic() - entry[1] < max_age):
+        return entry[2]
+    index = build()
+    _indexes[name] = (version, time.monotonic(), index)
+    return index
+
+
+def customer_index():
+    """Customers by normalised company name and by customer_id, plus accepted customer aliases."""
+    def build():
+        pairs = []
+        for customer_id, company_name in CustomerMaster.objects.values_list('customer_id', 'company_name'):
+            pairs.append((normalize(customer_id), customer_id))
+            pairs.append((normalize(company_name), customer_id))
+        return MatchIndex(pairs, _aliases('customer'))
+    return _cached('customer', caching.versions(CustomerMaster, MatchReview), build)
+
+
+def party_index(kind):
+    """The most frequent consignor (or consignee) names; each normalised key maps to its commonest spelling."""
+    def build():
+        counts = (
+            PartyName.objects.filter(kind=kind, shipments__gt=0)
+            .order_by('-shipments')
+            .values_list('name', 'shipments')[:PARTY_INDEX_SIZE]
+        )
+        spellings = Counter()
+        for name, shipments in counts:
+            spellings[(normalize(name), name)] += shipments
+        canonical = {}
+        for (key, spelling), _ in spellings.most_common():
+            canonical.setdefault(key, spelling)
+        return MatchIndex(canonical.items(), _aliases(kind))
+    return _cached(kind, caching.versions(MatchReview), build, max_age=PARTY_INDEX_TIMEOUT)
+
+
+def reset():
+    _indexes.clear()
+
+
+# ---------------------------
+# Party name counts
+# ---------------------------
+
+PARTY_KINDS = ('consignor', 'consignee')
+PARTY_FIELDS = tuple(f'{kind}_name' for kind in PARTY_KINDS)
+_NAME_BATCH_SIZE = 500
+
+
+def _value(shipment, field):
+    return shipment[field] if isinstance(shipment, dict) else getattr(shipment, field)
+
+
+def count_parties(shipments, sign=1):
+    """Count (or with ``sign=-1`` uncount) the consignor/consignee names of ``shipments`` in PartyName.
+
+    One UPDATE per kind and distinct count, after inserting the names not seen before.
+    """
+    counts = Counter()
+    for shipment in shipments:
+        for kind in PARTY_KINDS:
+            name = _value(shipment, f'{kind}_name')
+            if name:
+                counts[(kind, name[:100])] += sign
+    if not counts:
+        return
+    groups = {}
+    for (kind, name), n in counts.items():
+        groups.setdefault((kind, n), []).append(name)
+    with transaction.atomic():
+        if sign > 0:
+            PartyName.objects.bulk_create(
+                [PartyName(kind=kind, name=name) for kind, name in counts], ignore_conflicts=True,
+            )
+        for (kind, n), names in groups.items():
+            for start in range(0, len(names), _NAME_BATCH_SIZE):
+                PartyName.objects.filter(kind=kind, name__in=names[start:start + _NAME_BATCH_SIZE]).update(
+                    shipments=F('shipments') + n,
+                )
+
+
+def rebuild_party_names():
+    """Recount PartyName from Shipment with one GROUP BY per kind."""
+    with transaction.atomic():
+        PartyName.objects.all().delete()
+        for kind in PARTY_KINDS:
+            column = f'{kind}_name'
+            groups = Shipment.objects.exclude(**{column: ''}).order_by().values(column).annotate(n=Count('pk'))
+            PartyName.objects.bulk_create(
+                (PartyName(kind=kind, name=row[column][:100], shipments=row['n']) for row in groups.iterator()),
+                batch_size=500, ignore_conflicts=True,
+            )
+    reset()
+
+
+# ---------------------------
+# Import integration
+# ---------------------------
+
+def match_customers(raw_values, reviews):
+    """Resolve bill-to values that are not exact customer_ids. Returns {raw: Match} for the confident ones.
+
+    Low-confidence matches are added to ``reviews`` ({(kind, raw): Match}) instead.
+    """
+    confident = {}
+    for raw, match in customer_index().match(raw_values).items():
+        if match.score >= MATCH_ACCEPT_SCORE:
+            confident[raw] = match
+        else:
+            reviews[('customer', raw)] = match
+    return confident
+
+
+def canonical_parties(names, kind, reviews):
+    """Map a Series of consignor/consignee names onto the usual spelling of the same party.
+
+    Only names that normalise to the same key (case, punctuation, Pvt/Ltd, word order)
+    or are accepted aliases are rewritten; "Raj Kumari" is never turned into "Raj Kumar".
+    Fuzzy matches keep the typed name and are added to ``reviews``.
+    """
+    index = party_index(kind)
+    replace = {}
+    for raw, match in index.match(names.dropna().unique()).items():
+        key = normalize(raw)
+        if key in index.aliases or key == normalize(match.value):
+            if match.value != raw:
+                replace[raw] = match.value
+        else:
+            reviews[(kind, raw)] = match
+    return names.replace(replace) if replace else names
+
+
+def queue_reviews(reviews):
+    """Store low-confidence matches for review; a value already queued (or decided) is left alone."""
+    if not reviews:
+        return
+    MatchReview.objects.bulk_create([
+        MatchReview(kind=kind, raw_value=raw[:255], suggestion=match.value[:255], score=match.score)
+        for (kind, raw), match in reviews.items()
+    ], ignore_conflicts=True)
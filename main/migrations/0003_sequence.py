@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    """Start every counter after the highest number already issued."""
+    Sequence = apps.get_model('main', 'Sequence')
+    sources = [
+        ('CN', 'Shipment', 'consignment_no', True),
+        ('MF', 'Manifest', 'manifest_id', True),
+        ('TRP', 'TripOutToVendor', 'trip_id', True),
+        ('VND', 'VendorMaster', 'vendor_code', False),
+    ]
+    for prefix, model_name, field, yearly in sources:
+        highest = {}
+        codes = apps.get_model('main', model_name).objects.values_list(field, flat=True)
+        for code in codes.iterator():
+            # CN-25001 -> year 2025, number 1; VND-007 -> year 0, number 7
+            digits = code[len(prefix) + 1:]
+            if not digits.isdigit() or (yearly and len(digits) < 3):
+                continue
+            year = 2000 + int(digits[:2]) if yearly else 0
+            number = int(digits[2:] if yearly else digits)
+            highest[year] = max(highest.get(year, 0), number)
+        Sequence.objects.bulk_create(
+            Sequence(prefix=prefix, year=year, last_value=number) for year, number in highest.items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_vendormaster_shipment_boe_num_tripouttovendor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10)),
+                ('year', models.PositiveSmallIntegerField(default=0)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('prefix', 'year')},
+            },
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
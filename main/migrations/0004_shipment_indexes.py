@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['date', 'id'], name='shipment_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['billto_customer', 'date'], name='shipment_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['status', 'date'], name='shipment_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['vehicle_no'], name='shipment_vehicle_idx'),
+        ),
+    ]
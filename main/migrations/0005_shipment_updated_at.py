@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_shipment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:20
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def build_rollup(apps, schema_editor):
+    """Fill the rollup from the shipments that already exist (same GROUP BY as main.stats.rollup_rows)."""
+    Shipment = apps.get_model('main', 'Shipment')
+    ShipmentDailyStat = apps.get_model('main', 'ShipmentDailyStat')
+    delivered = Q(status='Delivered', delivery_date__isnull=False, estimated_delivery_date__isnull=False)
+    groups = (
+        Shipment.objects.order_by()
+        .values('date', 'billto_customer', 'origin', 'destination', 'status')
+        .annotate(
+            n=Count('pk'), article_sum=Sum('no_article'), freight_sum=Sum('freight'),
+            actual_sum=Sum('actual_weight'), charged_sum=Sum('charged_weight'),
+            on_time=Count('pk', filter=delivered & Q(delivery_date__lte=F('estimated_delivery_date'))),
+            late=Count('pk', filter=delivered & Q(delivery_date__gt=F('estimated_delivery_date'))),
+        )
+    )
+    ShipmentDailyStat.objects.bulk_create([
+        ShipmentDailyStat(
+            date=g['date'], customer=g['billto_customer'] or '', origin=g['origin'],
+            destination=g['destination'], status=g['status'], shipments=g['n'],
+            articles=g['article_sum'] or 0, freight=g['freight_sum'] or 0,
+            actual_weight=g['actual_sum'] or 0, charged_weight=g['charged_sum'] or 0,
+            delivered_on_time=g['on_time'], delivered_late=g['late'],
+        )
+        for g in groups
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('customer', models.CharField(blank=True, max_length=50)),
+                ('origin', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('Booked', 'Booked'), ('In Transit', 'In Transit'), ('Out For Delivery', 'Out For Delivery'), ('Delivered', 'Delivered'), ('Cancelled', 'Cancelled')], max_length=20)),
+                ('shipments', models.IntegerField(default=0)),
+                ('articles', models.IntegerField(default=0)),
+                ('freight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actual_weight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('charged_weight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('delivered_on_time', models.IntegerField(default=0)),
+                ('delivered_late', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'date'], name='dailystat_status_date_idx'), models.Index(fields=['customer', 'date'], name='dailystat_customer_date_idx')],
+                'unique_together': {('date', 'customer', 'origin', 'destination', 'status')},
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_shipment_daily_stat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('dispatch', 'Dispatch'), ('out_for_delivery', 'Out For Delivery'), ('deliver', 'Deliver')], max_length=20)),
+                ('from_status', models.CharField(choices=[('Booked', 'Booked'), ('In Transit', 'In Transit'), ('Out For Delivery', 'Out For Delivery'), ('Delivered', 'Delivered'), ('Cancelled', 'Cancelled')], max_length=20)),
+                ('to_status', models.CharField(choices=[('Booked', 'Booked'), ('In Transit', 'In Transit'), ('Out For Delivery', 'Out For Delivery'), ('Delivered', 'Delivered'), ('Cancelled', 'Cancelled')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('manifest', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_changes', to='main.manifest')),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='main.shipment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shipment', 'changed_at'], name='statuschange_shipment_idx')],
+            },
+        ),
+    ]
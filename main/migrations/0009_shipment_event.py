@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+STATUS_CODES = {'Booked': 1, 'In Transit': 2, 'Out For Delivery': 3, 'Delivered': 4, 'Cancelled': 5}
+
+
+def seed_events(apps, schema_editor):
+    """Start each existing shipment's timeline with its current status, stamped with its last update."""
+    Shipment = apps.get_model('main', 'Shipment')
+    ShipmentEvent = apps.get_model('main', 'ShipmentEvent')
+    rows = Shipment.objects.values_list('pk', 'status', 'origin', 'destination', 'updated_at').iterator(chunk_size=2000)
+    batch = []
+    for pk, status, origin, destination, updated_at in rows:
+        batch.append(ShipmentEvent(
+            shipment_id=pk, status=STATUS_CODES.get(status, 1), ts=updated_at,
+            branch=destination if status in ('Out For Delivery', 'Delivered') else origin,
+        ))
+        if len(batch) == 2000:
+            ShipmentEvent.objects.bulk_create(batch)
+            batch = []
+    ShipmentEvent.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_shipment_status_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Booked'), (2, 'In Transit'), (3, 'Out For Delivery'), (4, 'Delivered'), (5, 'Cancelled')])),
+                ('ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('branch', models.CharField(blank=True, max_length=100)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('shipment', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='main.shipment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shipment', 'ts'], name='shipmentevent_shipment_ts_idx')],
+            },
+        ),
+        migrations.RunPython(seed_events, migrations.RunPython.noop),
+    ]
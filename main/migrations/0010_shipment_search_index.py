@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+COLUMNS = 'consignment_no, vehicle_no, driver_details, consignor_name, consignee_name, invoice_ref_number'
+
+
+def create_index(apps, schema_editor):
+    """FTS5 table filled from the existing rows on SQLite; a FULLTEXT index on MySQL; nothing elsewhere."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        values = ', '.join(f"coalesce({column}, '')" for column in COLUMNS.split(', '))
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE main_shipment_search USING fts5({COLUMNS}, tokenize = 'trigram')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO main_shipment_search (rowid, {COLUMNS}) SELECT id, {values} FROM main_shipment"
+        )
+    elif vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE main_shipment ADD FULLTEXT INDEX shipment_search_ft ({COLUMNS})")
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS main_shipment_search")
+    elif vendor == 'mysql':
+        schema_editor.execute("ALTER TABLE main_shipment DROP INDEX shipment_search_ft")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_shipment_event'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
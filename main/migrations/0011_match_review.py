@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_shipment_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('customer', 'Bill-to Customer'), ('consignor', 'Consignor'), ('consignee', 'Consignee')], max_length=10)),
+                ('raw_value', models.CharField(max_length=255)),
+                ('suggestion', models.CharField(max_length=255)),
+                ('score', models.PositiveSmallIntegerField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Accepted', 'Accepted'), ('Rejected', 'Rejected')], default='Pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='matchreview_status_idx')],
+                'unique_together': {('kind', 'raw_value')},
+            },
+        ),
+    ]
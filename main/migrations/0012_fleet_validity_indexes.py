@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_match_review'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fleet',
+            index=models.Index(fields=['insurance_validity'], name='fleet_insurance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fleet',
+            index=models.Index(fields=['fitness_validity'], name='fleet_fitness_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fleet',
+            index=models.Index(fields=['permit_validity'], name='fleet_permit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fleet',
+            index=models.Index(fields=['pollution_validity'], name='fleet_pollution_idx'),
+        ),
+    ]
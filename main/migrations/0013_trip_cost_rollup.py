@@ -0,0 +1,76 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def build_rollup(apps, schema_editor):
+    """Fill the rollup from the trips that already exist (same cells as main.tripcosts.rollup_rows)."""
+    TripOutToVendor = apps.get_model('main', 'TripOutToVendor')
+    TripCostRollup = apps.get_model('main', 'TripCostRollup')
+    cells = {}
+    trips = TripOutToVendor.objects.exclude(status='Cancelled').values(
+        'trip_id', 'vendor_id', 'from_location', 'destination', 'vehicle_type', 'created_at',
+        'kilometer', 'total_bill_amount',
+    )
+    for trip in trips.iterator():
+        month = timezone.localtime(trip['created_at']).date().replace(day=1)
+        key = (trip['vendor_id'], trip['from_location'], trip['destination'], trip['vehicle_type'], month)
+        row = cells.get(key)
+        if row is None:
+            row = cells[key] = TripCostRollup(
+                vendor_id=key[0], from_location=key[1], destination=key[2], vehicle_type=key[3], month=month,
+                trips=0, kilometers=0, amount=0,
+            )
+        row.trips += 1
+        row.kilometers += trip['kilometer']
+        row.amount += trip['total_bill_amount']
+        if trip['kilometer'] > 0:
+            rate = round(trip['total_bill_amount'] / trip['kilometer'], 2)
+            if row.max_rate is None or rate > row.max_rate:
+                row.max_rate, row.max_rate_trip = rate, trip['trip_id']
+    TripCostRollup.objects.bulk_create(cells.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_fleet_validity_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripCostRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_location', models.CharField(max_length=255)),
+                ('destination', models.CharField(max_length=255)),
+                ('vehicle_type', models.CharField(max_length=50)),
+                ('month', models.DateField()),
+                ('trips', models.IntegerField(default=0)),
+                ('kilometers', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('max_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('max_rate_trip', models.CharField(blank=True, max_length=20)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tripouttovendor',
+            index=models.Index(fields=['vendor', 'from_location', 'destination', 'vehicle_type', 'created_at'], name='trip_cost_cell_idx'),
+        ),
+        migrations.AddField(
+            model_name='tripcostrollup',
+            name='vendor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_rollups', to='main.vendormaster'),
+        ),
+        migrations.AddIndex(
+            model_name='tripcostrollup',
+            index=models.Index(fields=['month'], name='tripcost_month_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tripcostrollup',
+            unique_together={('vendor', 'from_location', 'destination', 'vehicle_type', 'month')},
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
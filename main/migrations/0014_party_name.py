@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:58
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_parties(apps, schema_editor):
+    """Count the names already on shipments (same GROUP BY as main.matching.rebuild_party_names)."""
+    Shipment = apps.get_model('main', 'Shipment')
+    PartyName = apps.get_model('main', 'PartyName')
+    for kind in ('consignor', 'consignee'):
+        column = f'{kind}_name'
+        groups = Shipment.objects.exclude(**{column: ''}).order_by().values(column).annotate(n=Count('pk'))
+        PartyName.objects.bulk_create(
+            (PartyName(kind=kind, name=row[column], shipments=row['n']) for row in groups.iterator()),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_trip_cost_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('consignor', 'Consignor'), ('consignee', 'Consignee')], max_length=10)),
+                ('name', models.CharField(max_length=100)),
+                ('shipments', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', '-shipments'], name='partyname_kind_count_idx')],
+                'unique_together': {('kind', 'name')},
+            },
+        ),
+        migrations.RunPython(count_parties, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+COLUMNS = 'consignment_no, vehicle_no, driver_details, consignor_name, consignee_name, invoice_ref_number'
+
+
+def use_ngram_parser(apps, schema_editor):
+    """Rebuild the MySQL FULLTEXT index with the ngram parser, so a term matches inside words as on SQLite.
+
+    Stopwords are switched off while the index is built: with them, every ngram containing
+    one ("is", "an", ...) would be left out and substrings spanning it would never match.
+    """
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("ALTER TABLE main_shipment DROP INDEX shipment_search_ft")
+    schema_editor.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+    schema_editor.execute(f"ALTER TABLE main_shipment ADD FULLTEXT INDEX shipment_search_ft ({COLUMNS}) WITH PARSER ngram")
+
+
+def use_word_parser(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("ALTER TABLE main_shipment DROP INDEX shipment_search_ft")
+    schema_editor.execute(f"ALTER TABLE main_shipment ADD FULLTEXT INDEX shipment_search_ft ({COLUMNS})")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_ngram_parser, use_word_parser),
+    ]
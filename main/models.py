@@ -1,5 +1,10 @@
+import re
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.core.exceptions import ValidationError
 import uuid
 from django.utils import timezone
@@ -103,6 +108,15 @@ class Fleet(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # one per document so main.compliance's OR of date ranges is answered from the indexes
+        indexes = [
+            models.Index(fields=['insurance_validity'], name='fleet_insurance_idx'),
+            models.Index(fields=['fitness_validity'], name='fleet_fitness_idx'),
+            models.Index(fields=['permit_validity'], name='fleet_permit_idx'),
+            models.Index(fields=['pollution_validity'], name='fleet_pollution_idx'),
+        ]
+
     def insurance_expiry(self):
         """Read-only field for admin."""
         return self.insurance_validity
@@ -163,6 +177,46 @@ class CustomUser(AbstractUser):
         return self.username
 
 
+class Sequence(models.Model):
+    """Counter behind the generated CN-/MF-/TRP-/VND- numbers, one row per prefix and year."""
+    prefix = models.CharField(max_length=10)
+    year = models.PositiveSmallIntegerField(default=0)  # 0 for sequences that never reset
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('prefix', 'year')
+
+    @classmethod
+    def reserve(cls, prefix, count=1, year=0):
+        """Atomically reserve ``count`` consecutive numbers and return them as a range."""
+        with transaction.atomic():
+            # The UPDATE takes the row lock first, so concurrent callers queue up here.
+            counter = cls.objects.filter(prefix=prefix, year=year)
+            if not counter.update(last_value=F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(prefix=prefix, year=year, last_value=count)
+                except IntegrityError:
+                    counter.update(last_value=F('last_value') + count)
+            last_value = counter.select_for_update().values_list('last_value', flat=True).get()
+        return range(last_value - count + 1, last_value + 1)
+
+    @classmethod
+    def advance(cls, prefix, value, year=0):
+        """Move the counter up to at least ``value``, for numbers that were issued without reserve()."""
+        with transaction.atomic():
+            counter = cls.objects.filter(prefix=prefix, year=year)
+            if not counter.update(last_value=Greatest('last_value', Value(value))):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(prefix=prefix, year=year, last_value=value)
+                except IntegrityError:
+                    counter.update(last_value=Greatest('last_value', Value(value)))
+
+    def __str__(self):
+        return f"{self.prefix}-{self.year}: {self.last_value}"
+
+
 class Shipment(models.Model):
     objects = None
     PAYMENT_MODES = [
@@ -238,25 +292,49 @@ class Shipment(models.Model):
     remark = models.TextField(null=True, blank=True)
     pod_link = models.URLField(blank=True, null=True)
 
-    def save(self, *args, **kwargs):
-        if not self.pk and not self.consignment_no:
-            current_year = timezone.now().year
-            year_prefix = str(current_year)[2:4]
-
-            last_shipment = Shipment.objects.filter(
-                consignment_no__startswith=f"CN-{year_prefix}"
-            ).order_by('-id').first()
+    updated_at = models.DateTimeField(auto_now=True)
 
-            if last_shipment and last_shipment.consignment_no[-3:].isdigit():
-                last_number = int(last_shipment.consignment_no[-3:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='shipment_date_id_idx'),  # newest-first keyset listing
+            models.Index(fields=['billto_customer', 'date'], name='shipment_customer_date_idx'),
+            models.Index(fields=['status', 'date'], name='shipment_status_date_idx'),
+            models.Index(fields=['vehicle_no'], name='shipment_vehicle_idx'),
+        ]
 
-            self.consignment_no = f"CN-{year_prefix}{new_number:03d}"
+    def save(self, *args, **kwargs):
+        if not self.pk and not self.consignment_no:
+            self.consignment_no = self.reserve_consignment_numbers(1)[0]
+        elif not self.pk:
+            self.claim_consignment_numbers([self.consignment_no])
 
         super().save(*args, **kwargs)
 
+    @classmethod
+    def reserve_consignment_numbers(cls, count):
+        year = timezone.now().year
+        return [f"CN-{str(year)[2:4]}{number:03d}" for number in Sequence.reserve('CN', count, year=year)]
+
+    @staticmethod
+    def parse_consignment_no(consignment_no):
+        """(year, number) when ``consignment_no`` is one reserve_consignment_numbers() could issue, else None."""
+        match = re.fullmatch(r'CN-(\d{2})(\d{3,})', consignment_no or '')
+        if not match or len(match[2]) > 3 and match[2].startswith('0'):
+            return None
+        return 2000 + int(match[1]), int(match[2])
+
+    @classmethod
+    def claim_consignment_numbers(cls, consignment_nos):
+        """Move the CN counters past explicitly given numbers, so generated ones never collide with them."""
+        highest = {}
+        for consignment_no in consignment_nos:
+            parsed = cls.parse_consignment_no(consignment_no)
+            if parsed:
+                year, number = parsed
+                highest[year] = max(highest.get(year, 0), number)
+        for year, number in highest.items():
+            Sequence.advance('CN', number, year=year)
+
     def __str__(self):
         return self.consignment_no
 
@@ -276,14 +354,9 @@ class Manifest(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.manifest_id:
-            year_prefix = str(timezone.now().year)[2:]
-            last_manifest = Manifest.objects.filter(manifest_id__startswith=f"MF-{year_prefix}").order_by('-id').first()
-            if last_manifest:
-                last_number = int(last_manifest.manifest_id[-3:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            self.manifest_id = f"MF-{year_prefix}{new_number:03d}"
+            year = timezone.now().year
+            new_number = Sequence.reserve('MF', year=year)[0]
+            self.manifest_id = f"MF-{str(year)[2:]}{new_number:03d}"
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -313,12 +386,7 @@ class VendorMaster(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.vendor_code:
-            last_vendor = VendorMaster.objects.order_by('-id').first()
-            if last_vendor and last_vendor.vendor_code[-3:].isdigit():
-                last_number = int(last_vendor.vendor_code[-3:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            new_number = Sequence.reserve('VND')[0]
             self.vendor_code = f"VND-{new_number:03d}"
         super().save(*args, **kwargs)
 
@@ -350,16 +418,18 @@ class TripOutToVendor(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # one cost rollup cell: vendor x lane x vehicle type, by month
+            models.Index(fields=['vendor', 'from_location', 'destination', 'vehicle_type', 'created_at'],
+                         name='trip_cost_cell_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.trip_id:
-            last_trip = TripOutToVendor.objects.order_by('-id').first()
-            if last_trip and last_trip.trip_id[-3:].isdigit():
-                last_number = int(last_trip.trip_id[-3:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            year_prefix = str(timezone.now().year)[2:]  # e.g. 25 for 2025
-            self.trip_id = f"TRP-{year_prefix}{new_number:03d}"
+            year = timezone.now().year
+            new_number = Sequence.reserve('TRP', year=year)[0]
+            self.trip_id = f"TRP-{str(year)[2:]}{new_number:03d}"  # e.g. TRP-25001 for 2025
 
         # Auto-calculate total bill if not given
         if not self.total_bill_amount:
@@ -369,3 +439,231 @@ class TripOutToVendor(models.Model):
 
     def __str__(self):
         return self.trip_id
+
+
+class TripCostRollup(models.Model):
+    """Vendor trips per vendor x lane x vehicle type x month, kept current by main.tripcosts."""
+    vendor = models.ForeignKey(VendorMaster, on_delete=models.CASCADE, related_name="cost_rollups")
+    from_location = models.CharField(max_length=255)
+    destination = models.CharField(max_length=255)
+    vehicle_type = models.CharField(max_length=50)
+    month = models.DateField()  # first day of the month the trips were created in
+
+    trips = models.IntegerField(default=0)  # not counting cancelled trips
+    kilometers = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)  # sum of total_bill_amount
+    max_rate = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)  # dearest trip, per km
+    max_rate_trip = models.CharField(max_length=20, blank=True)  # its trip_id
+
+    class Meta:
+        unique_together = ('vendor', 'from_location', 'destination', 'vehicle_type', 'month')
+        indexes = [
+            models.Index(fields=['month'], name='tripcost_month_idx'),
+        ]
+
+    @property
+    def cost_per_km(self):
+        return self.amount / self.kilometers if self.kilometers else None
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.vendor_id} {self.from_location}->{self.destination} {self.vehicle_type}: {self.trips}"
+
+
+class Job(models.Model):
+    """A long-running task (import or document) queued in the database for `manage.py run_workers`."""
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Done', 'Done'),
+        ('Failed', 'Failed'),
+    ]
+
+    KIND_CHOICES = [
+        ('bulk_upload', 'Shipment Bulk Upload'),
+        ('labels', 'Shipment Labels'),
+        ('consignment_notes', 'Consignment Notes'),
+        ('manifest_pdf', 'Manifest PDF'),
+    ]
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Queued')
+    params = models.JSONField(default=dict, blank=True)
+    input_file = models.FileField(upload_to='jobs/input/', blank=True, null=True)
+    result_file = models.FileField(upload_to='jobs/results/', blank=True, null=True)
+    progress = models.PositiveSmallIntegerField(default=0)  # percent
+    message = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)  # times claimed; a reclaimed job runs again
+    created_by = models.ForeignKey('main.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)  # refreshed by run_workers while the job runs
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+    def _progress_key(self):
+        # per attempt: a reclaimed attempt must not move the progress of the one that replaced it
+        return f"job-progress:{self.pk}:{self.attempts}"
+
+    def set_progress(self, done, total):
+        self.progress = int(done * 100 / total) if total else 100
+        # published through the cache: a task running in a transaction (bulk upload) would keep
+        # an UPDATE of the row invisible to the status page until the whole file commits
+        cache.set(self._progress_key(), self.progress, 24 * 60 * 60)
+        Job.objects.filter(pk=self.pk, status='Running', attempts=self.attempts).update(progress=self.progress)
+
+    @property
+    def live_progress(self):
+        """Percent done, including progress a running task has not committed yet."""
+        if self.status != 'Running':
+            return self.progress
+        return cache.get(self._progress_key(), self.progress)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+
+class ShipmentDailyStat(models.Model):
+    """Rollup of shipments per day x customer x lane x status, kept current by main.stats."""
+    date = models.DateField()
+    customer = models.CharField(max_length=50, blank=True)  # CustomerMaster.customer_id, '' when not billed to one
+    origin = models.CharField(max_length=100)
+    destination = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES)
+
+    shipments = models.IntegerField(default=0)
+    articles = models.IntegerField(default=0)
+    freight = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    actual_weight = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    charged_weight = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    delivered_on_time = models.IntegerField(default=0)  # delivery_date <= estimated_delivery_date
+    delivered_late = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'customer', 'origin', 'destination', 'status')
+        indexes = [
+            models.Index(fields=['status', 'date'], name='dailystat_status_date_idx'),
+            models.Index(fields=['customer', 'date'], name='dailystat_customer_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.customer or '-'} {self.origin}->{self.destination} {self.status}: {self.shipments}"
+
+
+class ShipmentStatusChange(models.Model):
+    """Audit row for every shipment moved by a bulk lifecycle operation (main.lifecycle)."""
+    OPERATION_CHOICES = [
+        ('dispatch', 'Dispatch'),
+        ('out_for_delivery', 'Out For Delivery'),
+        ('deliver', 'Deliver'),
+    ]
+
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='status_changes')
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    from_status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES)
+    manifest = models.ForeignKey(Manifest, on_delete=models.SET_NULL, null=True, blank=True, related_name='status_changes')
+    changed_by = models.ForeignKey('main.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)  # one value per batch, matching Shipment.updated_at
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shipment', 'changed_at'], name='statuschange_shipment_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.shipment_id}: {self.from_status} -> {self.to_status}"
+
+
+class ShipmentEvent(models.Model):
+    """Append-only status history of a shipment, written through main.events. Never updated in place."""
+    # stored as a small int; codes are fixed so reordering Shipment.STATUS_CHOICES cannot rewrite history
+    STATUS_CODES = {
+        'Booked': 1,
+        'In Transit': 2,
+        'Out For Delivery': 3,
+        'Delivered': 4,
+        'Cancelled': 5,
+    }
+    STATUS_CHOICES = [(code, name) for name, code in STATUS_CODES.items()]
+
+    # the (shipment, ts) index below serves shipment lookups, so the FK gets no index of its own
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='events', db_index=False)
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES)
+    ts = models.DateTimeField(default=timezone.now)
+    branch = models.CharField(max_length=100, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shipment', 'ts'], name='shipmentevent_shipment_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.shipment_id} {self.get_status_display()} @ {self.ts:%Y-%m-%d %H:%M}"
+
+
+class MatchReview(models.Model):
+    """A bulk-import value that fuzzily matched a customer or party with too little confidence (main.matching).
+
+    Accepting one turns it into an alias: later imports map ``raw_value`` to ``suggestion`` directly.
+    """
+    KIND_CHOICES = [
+        ('customer', 'Bill-to Customer'),
+        ('consignor', 'Consignor'),
+        ('consignee', 'Consignee'),
+    ]
+
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Accepted', 'Accepted'),
+        ('Rejected', 'Rejected'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    raw_value = models.CharField(max_length=255)
+    suggestion = models.CharField(max_length=255)  # a customer_id for customers, the usual spelling for parties
+    score = models.PositiveSmallIntegerField()  # 0-100
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    reviewed_by = models.ForeignKey('main.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    reviewed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ('kind', 'raw_value')
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='matchreview_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.raw_value} -> {self.suggestion} ({self.score}%)"
+
+
+class PartyName(models.Model):
+    """How many shipments use each consignor/consignee spelling, kept current by main.matching.
+
+    The fuzzy-match party index reads the most used rows from here instead of grouping Shipment.
+    """
+    KIND_CHOICES = [
+        ('consignor', 'Consignor'),
+        ('consignee', 'Consignee'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    name = models.CharField(max_length=100)
+    shipments = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('kind', 'name')
+        indexes = [
+            models.Index(fields=['kind', '-shipments'], name='partyname_kind_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.name} ({self.shipments})"
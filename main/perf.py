@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.base import Template
+
+
+PERF_ENABLED = getattr(settings, 'PERF_MONITORING', False)
+PERF_WINDOW = getattr(settings, 'PERF_WINDOW', 500)  # requests kept per view
+
+PERCENTILES = (50, 95, 99)
+
+_samples = defaultdict(lambda: deque(maxlen=PERF_WINDOW))
+_lock = threading.Lock()
+_local = threading.local()
+
+
+# ---------------------------
+# Per-request probes
+# ---------------------------
+
+class QueryTimer:
+    """connection.execute_wrapper hook counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def _timed_render(render):
+    # only the outermost render is counted, so {% include %} and {% extends %} aren't added twice
+    def wrapper(self, context):
+        stats = getattr(_local, 'request', None)
+        if stats is None:
+            return render(self, context)
+
+        stats['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats['depth'] -= 1
+            if not stats['depth']:
+                stats['template'] += time.perf_counter() - start
+
+    wrapper.perf_wrapped = True
+    return wrapper
+
+
+def _install_template_timer():
+    if not getattr(Template.render, 'perf_wrapped', False):
+        Template.render = _timed_render(Template.render)
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+
+class PerfMiddleware:
+    """Record wall time, query count/time, template time and response size per view.
+
+    Opt in with ``PERF_MONITORING = True``; otherwise Django drops the middleware at
+    startup and requests pay nothing. Each response gets a ``Server-Timing`` header.
+    """
+
+    def __init__(self, get_response):
+        if not PERF_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        _local.request = {'template': 0.0, 'depth': 0}
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            template = _local.request['template']
+            _local.request = None
+        total = time.perf_counter() - start
+
+        size = len(response.content) if not response.streaming else None
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        record(view, total, queries.count, queries.seconds, template, size)
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries"',
+            f'tpl;dur={template * 1000:.1f}',
+        ])
+        return response
+
+
+# ---------------------------
+# Rolling statistics
+# ---------------------------
+
+def record(view, total, query_count, query_seconds, template_seconds, size):
+    with _lock:
+        _samples[view].append((total, query_count, query_seconds, template_seconds, size))
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def summary():
+    """Return one row per view with p50/p95/p99 of each measure over the rolling window, slowest first."""
+    with _lock:
+        snapshot = {view: list(samples) for view, samples in _samples.items()}
+
+    rows = []
+    for view, samples in snapshot.items():
+        columns = list(zip(*samples))
+        row = {'view': view, 'count': len(samples)}
+        for name, values, scale in [
+            ('total_ms', columns[0], 1000),
+            ('queries', columns[1], 1),
+            ('db_ms', columns[2], 1000),
+            ('template_ms', columns[3], 1000),
+            ('bytes', [v for v in columns[4] if v is not None], 1),
+        ]:
+            values = sorted(values)
+            for pct in PERCENTILES:
+                value = _percentile(values, pct)
+                row[f'{name}_p{pct}'] = None if value is None else round(value * scale, 1)
+        rows.append(row)
+    rows.sort(key=lambda row: row['total_ms_p95'], reverse=True)
+    return rows
+
+
+def reset():
+    with _lock:
+        _samples.clear()
@@ -0,0 +1,169 @@
+from datetime import date
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .models import Shipment
+
+
+SHIPMENT_PAGE_SIZE = 50
+
+# the eight columns shipment_list.html renders
+SHIPMENT_LIST_COLUMNS = (
+    'consignment_no', 'date', 'consignor_name', 'origin',
+    'consignee_name', 'destination', 'vehicle_no', 'status',
+)
+
+
+def visible_shipments(user):
+    """Shipments ``user`` may see: everything for Internal staff, their own company's for External users."""
+    if not user.is_authenticated:
+        return Shipment.objects.none()
+    if user.usertype == "Internal":
+        return Shipment.objects.all()
+    if not user.company_name_id:
+        return Shipment.objects.none()
+    # billto_customer points at CustomerMaster.customer_id, not its pk
+    return Shipment.objects.filter(billto_customer=user.company_name)
+
+
+def shipment_filters(params, user):
+    """Read the list-page filters from a GET QueryDict, dropping anything malformed."""
+    statuses = dict(Shipment.STATUS_CHOICES)
+    filters = {
+        'start_date': _date(params.get('start_date')),
+        'end_date': _date(params.get('end_date')),
+        'status': params.get('status') if params.get('status') in statuses else '',
+        'customer': (params.get('customer') or '').strip(),
+    }
+    if user.usertype != "Internal":
+        filters['customer'] = ''  # External users are already scoped to their company
+    return filters
+
+
+def filter_shipments(queryset, filters):
+    if filters['start_date']:
+        queryset = queryset.filter(date__gte=filters['start_date'])
+    if filters['end_date']:
+        queryset = queryset.filter(date__lte=filters['end_date'])
+    if filters['status']:
+        queryset = queryset.filter(status=filters['status'])
+    if filters['customer']:
+        queryset = queryset.filter(billto_customer=filters['customer'])
+    return queryset
+
+
+def consignment_prefix_q(prefix):
+    """A consignment-number prefix as a range, so the unique index on consignment_no is used.
+
+    ``consignment_no__startswith`` becomes a case-insensitive LIKE on SQLite, which cannot seek a B-tree.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(consignment_no__gte=prefix, consignment_no__lt=upper)
+
+
+def with_consignment_prefix(queryset, prefix):
+    return queryset.filter(consignment_prefix_q(prefix))
+
+
+def _date(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+# ---------------------------
+# Keyset pagination on (date, id)
+# ---------------------------
+
+def encode_cursor(shipment):
+    if isinstance(shipment, dict):  # a .values() row
+        return f"{shipment['date'].isoformat()}_{shipment['id']}"
+    return f"{shipment.date.isoformat()}_{shipment.pk}"
+
+
+def decode_cursor(value):
+    try:
+        day, pk = value.split('_')
+        return date.fromisoformat(day), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, after=None, before=None, page_size=SHIPMENT_PAGE_SIZE):
+    """Return (rows, next_cursor, prev_cursor) for a newest-first listing.
+
+    ``after`` seeks to rows older than the cursor, ``before`` to rows newer than it;
+    neither needs an OFFSET, so every page costs the same regardless of depth.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before:
+        day, pk = before
+        queryset = queryset.filter(Q(date__gt=day) | Q(date=day, pk__gt=pk)).order_by('date', 'pk')
+    else:
+        if after:
+            day, pk = after
+            queryset = queryset.filter(Q(date__lt=day) | Q(date=day, pk__lt=pk))
+        queryset = queryset.order_by('-date', '-pk')
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+    next_cursor = encode_cursor(rows[-1]) if (has_more or before) else None
+    prev_cursor = encode_cursor(rows[0]) if (after or (before and has_more)) else None
+    return rows, next_cursor, prev_cursor
+
+
+# ---------------------------
+# Manifest shipment picker
+# ---------------------------
+
+PICKER_PAGE_SIZE = 25
+
+# (json key, column) for each picker row
+PICKER_COLUMNS = (
+    ('id', 'id'),
+    ('consignment_no', 'consignment_no'),
+    ('date', 'date'),
+    ('origin', 'origin'),
+    ('destination', 'destination'),
+    ('customer', 'billto_customer__company_name'),
+    ('articles', 'no_article'),
+    ('freight', 'freight'),
+    ('weight', 'actual_weight'),
+)
+
+
+def pickable_shipments():
+    return Shipment.objects.filter(status='Booked')
+
+
+def shipment_search(queryset, term):
+    """Match ``term`` against a consignment-number prefix, the destination or the billed customer."""
+    term = (term or '').strip()
+    if not term:
+        return queryset
+    return queryset.filter(
+        consignment_prefix_q(term.upper())
+        | Q(destination__istartswith=term)
+        | Q(billto_customer=term)
+        | Q(billto_customer__company_name__icontains=term)
+    )
+
+
+def picker_rows(queryset):
+    """.values() rows for the picker, with only the columns it shows."""
+    return queryset.values(*[column for _, column in PICKER_COLUMNS])
+
+
+def picker_json(row):
+    return {
+        key: (str(row[column]) if column in ('freight', 'actual_weight', 'date') else row[column])
+        for key, column in PICKER_COLUMNS
+    }
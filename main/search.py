@@ -0,0 +1,111 @@
+"""Full-text index over the shipment columns people search by.
+
+SQLite keeps a separate FTS5 table (trigram tokenizer, so any 3+ character
+substring matches, like the admin's icontains did) with one row per shipment,
+rowid = Shipment.id, maintained by main.signals and the bulk paths. MySQL uses
+a FULLTEXT index on main_shipment itself, which the server keeps current; it is
+built with the ngram parser (migration 0016), so there too a term matches
+anywhere inside a value ("2500" finds CN-25001, "rishn" finds Krishna) rather
+than only whole words. That needs ngram_token_size <= MIN_TERM_LENGTH (the
+server default is 2). Other backends, and terms shorter than MIN_TERM_LENGTH,
+fall back to the ORM's icontains.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Shipment
+
+
+SEARCH_FIELDS = (
+    'consignment_no', 'vehicle_no', 'driver_details',
+    'consignor_name', 'consignee_name', 'invoice_ref_number',
+)
+SEARCH_TABLE = 'main_shipment_search'
+MYSQL_INDEX = 'shipment_search_ft'
+MIN_TERM_LENGTH = 3  # trigrams need three characters; MySQL's ngram_token_size must not exceed it
+
+_COLUMNS = ', '.join(SEARCH_FIELDS)
+
+
+def _sqlite():
+    return connection.vendor == 'sqlite'
+
+
+# ---------------------------
+# Keeping the SQLite index current
+# ---------------------------
+
+def index(shipments):
+    """(Re)index Shipment objects or dicts with pk and SEARCH_FIELDS. No-op outside SQLite."""
+    if not _sqlite():
+        return
+    rows = [
+        (s['pk'], *(s[f] or '' for f in SEARCH_FIELDS)) if isinstance(s, dict)
+        else (s.pk, *(getattr(s, f) or '' for f in SEARCH_FIELDS))
+        for s in shipments
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {_COLUMNS}) VALUES ({', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))})",
+            rows,
+        )
+
+
+def unindex(shipment_ids):
+    if not _sqlite() or not shipment_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in shipment_ids])
+
+
+def rebuild():
+    """Refill the SQLite index from main_shipment in one statement. Returns the number of shipments indexed."""
+    if not _sqlite():
+        return 0
+    values = ', '.join(f"coalesce({field}, '')" for field in SEARCH_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, {_COLUMNS}) SELECT id, {values} FROM main_shipment")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")  # merge segments
+    return Shipment.objects.count()
+
+
+# ---------------------------
+# Querying
+# ---------------------------
+
+def _terms(term):
+    return [t for t in (term or '').split() if t]
+
+
+def matching_ids(term):
+    """RawSQL selecting the ids of shipments matching every word of ``term``, or None if the index can't answer it."""
+    terms = _terms(term)
+    if not terms or any(len(t) < MIN_TERM_LENGTH for t in terms):
+        return None
+    if _sqlite():
+        # each word is a quoted phrase: a substring match under the trigram tokenizer; words are ANDed
+        query = ' '.join('"{}"'.format(t.replace('"', '""')) for t in terms)
+        return RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", (query,))
+    if connection.vendor == 'mysql':
+        # under the ngram parser a quoted phrase is a run of consecutive ngrams, i.e. a substring
+        query = ' '.join('+"{}"'.format(t.replace('"', '')) for t in terms)
+        return RawSQL(f"SELECT id FROM main_shipment WHERE MATCH ({_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)", (query,))
+    return None
+
+
+def search(queryset, term):
+    """Narrow ``queryset`` to shipments matching ``term``: through the index when possible, else icontains ORs."""
+    ids = matching_ids(term)
+    if ids is not None:
+        return queryset.filter(pk__in=ids)
+    for word in _terms(term):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': word})
+        queryset = queryset.filter(condition)
+    return queryset
@@ -0,0 +1,229 @@
+from django.db import transaction
+from django.db.models import DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, events, matching, search, stats, tracking, tripcosts
+from .models import CustomerMaster, Fleet, Manifest, MatchReview, Shipment, TripOutToVendor, VendorMaster
+
+
+# ---------------------------
+# Manifest totals
+# ---------------------------
+
+def _manifest_total(field, output_field):
+    totals = (
+        Shipment.objects.filter(manifests=OuterRef('pk'))
+        .order_by()
+        .values('manifests')
+        .annotate(total=Sum(field))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=output_field), Value(0), output_field=output_field)
+
+
+def recompute_manifest_totals(manifests):
+    """Refresh total_articles/total_freight for ``manifests`` (a queryset) in a single UPDATE."""
+    transaction.on_commit(lambda: caching.bump(Manifest))
+    return manifests.update(
+        total_articles=_manifest_total('no_article', IntegerField()),
+        total_freight=_manifest_total('freight', DecimalField(max_digits=12, decimal_places=2)),
+    )
+
+
+@receiver(m2m_changed, sender=Manifest.shipments.through)
+def manifest_shipments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # shipment.manifests.clear() does not pass pk_set, so note the manifests before they go
+        instance._cleared_manifest_ids = list(instance.manifests.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recompute_manifest_totals(Manifest.objects.filter(pk=instance.pk))
+    elif action == 'post_clear':
+        recompute_manifest_totals(Manifest.objects.filter(pk__in=getattr(instance, '_cleared_manifest_ids', [])))
+    else:
+        recompute_manifest_totals(Manifest.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Shipment)
+def shipment_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return  # a new shipment is not on any manifest yet
+    if update_fields is not None and not {'no_article', 'freight'} & set(update_fields):
+        return
+    recompute_manifest_totals(Manifest.objects.filter(shipments=instance))
+
+
+@receiver(pre_delete, sender=Shipment)
+def shipment_deleting(sender, instance, **kwargs):
+    # the through rows are cascaded away without an m2m_changed signal
+    instance._manifest_ids = list(instance.manifests.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Shipment)
+def shipment_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_manifest_ids', None):
+        recompute_manifest_totals(Manifest.objects.filter(pk__in=instance._manifest_ids))
+
+
+# ---------------------------
+# Tracking cache
+# ---------------------------
+
+@receiver(post_save, sender=Shipment)
+@receiver(post_delete, sender=Shipment)
+def invalidate_tracking(sender, instance, **kwargs):
+    # after the commit: a read in between would cache the old row again
+    numbers = [instance.consignment_no]
+    transaction.on_commit(lambda: tracking.invalidate(numbers))
+
+
+# ---------------------------
+# Search index
+# ---------------------------
+
+@receiver(post_save, sender=Shipment)
+def index_shipment(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(search.SEARCH_FIELDS) & set(update_fields):
+        return
+    search.index([instance])
+
+
+@receiver(post_delete, sender=Shipment)
+def unindex_shipment(sender, instance, **kwargs):
+    search.unindex([instance.pk])
+
+
+# ---------------------------
+# Stored-row snapshots (rollup, party counts, status events)
+# ---------------------------
+
+_STAT_COLUMNS = {field[:-3] if field == 'billto_customer_id' else field for field in stats.STAT_FIELDS}
+_SNAPSHOT_FIELDS = (*stats.STAT_FIELDS, *matching.PARTY_FIELDS)
+
+
+@receiver(pre_save, sender=Shipment)
+def snapshot_shipment(sender, instance, update_fields=None, **kwargs):
+    # the stored row before the change, read once for every receiver below: the rollup row to take
+    # this shipment out of, the party names to uncount, and the status to compare for events
+    instance._stats_before = instance._parties_before = None
+    if instance._state.adding:
+        return
+    fields = set(update_fields) if update_fields is not None else None
+    wants_stats = fields is None or bool(_STAT_COLUMNS & fields)
+    wants_parties = fields is None or bool(set(matching.PARTY_FIELDS) & fields)
+    if not (wants_stats or wants_parties):
+        return
+    before = Shipment.objects.filter(pk=instance.pk).values(*_SNAPSHOT_FIELDS).first()
+    instance._stats_before = before if wants_stats else None
+    instance._parties_before = before if wants_parties else None
+
+
+@receiver(pre_delete, sender=Shipment)
+def snapshot_deleted_shipment(sender, instance, **kwargs):
+    # the instance may be stale (e.g. loaded before a bulk transition); uncount what is stored
+    instance._stored = Shipment.objects.filter(pk=instance.pk).values(*_SNAPSHOT_FIELDS).first()
+
+
+# ---------------------------
+# Daily statistics rollup
+# ---------------------------
+
+@receiver(post_save, sender=Shipment)
+def update_shipment_stats(sender, instance, created, **kwargs):
+    if created:
+        stats.add([instance])
+    elif getattr(instance, '_stats_before', None) is not None:
+        stats.move(instance._stats_before, instance)
+
+
+@receiver(post_delete, sender=Shipment)
+def remove_shipment_stats(sender, instance, **kwargs):
+    stats.add([getattr(instance, '_stored', None) or instance], sign=-1)
+
+
+# ---------------------------
+# Party name counts
+# ---------------------------
+
+@receiver(post_save, sender=Shipment)
+def update_party_names(sender, instance, created, **kwargs):
+    before = getattr(instance, '_parties_before', None)
+    if created:
+        matching.count_parties([instance])
+    elif before and any(before[field] != getattr(instance, field) for field in matching.PARTY_FIELDS):
+        matching.count_parties([before], sign=-1)
+        matching.count_parties([instance])
+
+
+@receiver(post_delete, sender=Shipment)
+def remove_party_names(sender, instance, **kwargs):
+    matching.count_parties([getattr(instance, '_stored', None) or instance], sign=-1)
+
+
+# ---------------------------
+# Status events
+# ---------------------------
+
+@receiver(post_save, sender=Shipment)
+def record_status_event(sender, instance, created, **kwargs):
+    # relies on the snapshot taken for the rollup; bulk paths call events.record themselves
+    before = getattr(instance, '_stats_before', None)
+    if created or before is not None and before['status'] != instance.status:
+        events.record([instance], note=getattr(instance, '_event_note', ''))
+
+
+# ---------------------------
+# Vendor trip cost rollup
+# ---------------------------
+
+@receiver(pre_save, sender=TripOutToVendor)
+def snapshot_trip_cell(sender, instance, **kwargs):
+    # a trip moved to another vendor, lane or vehicle type must leave its old cell too
+    before = None
+    if not instance._state.adding:
+        before = TripOutToVendor.objects.filter(pk=instance.pk).values(*tripcosts.CELL_FIELDS).first()
+    instance._cost_cell_before = before and tripcosts.cell_of(before)
+
+
+@receiver(post_save, sender=TripOutToVendor)
+def update_trip_costs(sender, instance, **kwargs):
+    before = getattr(instance, '_cost_cell_before', None)
+    tripcosts.refresh([tripcosts.cell_of(instance), *([before] if before else [])])
+
+
+@receiver(post_delete, sender=TripOutToVendor)
+def remove_trip_costs(sender, instance, **kwargs):
+    tripcosts.refresh([tripcosts.cell_of(instance)])
+
+
+# ---------------------------
+# Cache versions
+# ---------------------------
+
+@receiver(post_save, sender=Shipment)
+@receiver(post_delete, sender=Shipment)
+@receiver(post_save, sender=Manifest)
+@receiver(post_delete, sender=Manifest)
+@receiver(post_save, sender=TripOutToVendor)
+@receiver(post_delete, sender=TripOutToVendor)
+@receiver(post_save, sender=VendorMaster)
+@receiver(post_delete, sender=VendorMaster)
+@receiver(post_save, sender=CustomerMaster)
+@receiver(post_delete, sender=CustomerMaster)
+@receiver(post_save, sender=MatchReview)
+@receiver(post_delete, sender=MatchReview)
+@receiver(post_save, sender=Fleet)
+@receiver(post_delete, sender=Fleet)
+def bump_cache_version(sender, **kwargs):
+    # after the commit, or a page rendered in between is cached under the new version with the old rows
+    transaction.on_commit(lambda: caching.bump(sender))
+
+
+@receiver(m2m_changed, sender=Manifest.shipments.through)
+def bump_manifest_shipments_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: caching.bump(Manifest, Shipment))
@@ -0,0 +1,202 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Shipment, ShipmentDailyStat
+
+
+# shipment columns the rollup reads; pre_save snapshots these
+STAT_FIELDS = (
+    'date', 'billto_customer_id', 'origin', 'destination', 'status',
+    'no_article', 'freight', 'actual_weight', 'charged_weight',
+    'delivery_date', 'estimated_delivery_date',
+)
+
+MEASURES = ('shipments', 'articles', 'freight', 'actual_weight', 'charged_weight', 'delivered_on_time', 'delivered_late')
+
+
+def _value(shipment, field):
+    return shipment[field] if isinstance(shipment, dict) else getattr(shipment, field)
+
+
+def stat_key(shipment):
+    """(date, customer, origin, destination, status) for a Shipment or a dict of STAT_FIELDS."""
+    return (
+        _value(shipment, 'date'),
+        _value(shipment, 'billto_customer_id') or '',
+        _value(shipment, 'origin'),
+        _value(shipment, 'destination'),
+        _value(shipment, 'status'),
+    )
+
+
+def contribution(shipment):
+    delivered = _value(shipment, 'delivery_date')
+    estimated = _value(shipment, 'estimated_delivery_date')
+    sla = _value(shipment, 'status') == 'Delivered' and delivered and estimated
+    return {
+        'shipments': 1,
+        'articles': _value(shipment, 'no_article') or 0,
+        'freight': Decimal(str(_value(shipment, 'freight') or 0)),
+        'actual_weight': Decimal(str(_value(shipment, 'actual_weight') or 0)),
+        'charged_weight': Decimal(str(_value(shipment, 'charged_weight') or 0)),
+        'delivered_on_time': int(bool(sla and delivered <= estimated)),
+        'delivered_late': int(bool(sla and delivered > estimated)),
+    }
+
+
+# ---------------------------
+# Incremental maintenance
+# ---------------------------
+
+def apply(deltas):
+    """Add ``deltas`` ({stat_key: {measure: amount}}) to the rollup, one UPDATE per key."""
+    with transaction.atomic():
+        for key, delta in deltas.items():
+            if not any(delta.values()):
+                continue
+            date, customer, origin, destination, status = key
+            rows = ShipmentDailyStat.objects.filter(
+                date=date, customer=customer, origin=origin, destination=destination, status=status,
+            )
+            changes = {measure: F(measure) + amount for measure, amount in delta.items()}
+            if rows.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    ShipmentDailyStat.objects.create(
+                        date=date, customer=customer, origin=origin, destination=destination, status=status, **delta,
+                    )
+            except IntegrityError:
+                rows.update(**changes)  # another request created the row first
+
+
+def add(shipments, sign=1):
+    """Count (or with ``sign=-1`` uncount) ``shipments`` in the rollup, grouped so each key is written once."""
+    deltas = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    for shipment in shipments:
+        delta = deltas[stat_key(shipment)]
+        for measure, amount in contribution(shipment).items():
+            delta[measure] += sign * amount
+    apply(deltas)
+
+
+def move(before, after):
+    """Re-file one shipment whose STAT_FIELDS went from ``before`` to ``after``."""
+    move_many([before], [after])
+
+
+def move_many(befores, afters):
+    """Re-file many shipments at once; ``befores[i]`` and ``afters[i]`` describe the same shipment."""
+    deltas = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    for shipments, sign in ((befores, -1), (afters, 1)):
+        for shipment in shipments:
+            delta = deltas[stat_key(shipment)]
+            for measure, amount in contribution(shipment).items():
+                delta[measure] += sign * amount
+    apply(deltas)
+
+
+# ---------------------------
+# Full rebuild
+# ---------------------------
+
+def rollup_rows(shipments):
+    """Aggregate the ``shipments`` queryset into unsaved ShipmentDailyStat rows with one GROUP BY."""
+    delivered = Q(status='Delivered', delivery_date__isnull=False, estimated_delivery_date__isnull=False)
+    groups = (
+        shipments.order_by()
+        .values('date', 'billto_customer', 'origin', 'destination', 'status')
+        .annotate(
+            n=Count('pk'),
+            article_sum=Coalesce(Sum('no_article'), Value(0)),
+            freight_sum=Sum('freight'),
+            actual_sum=Sum('actual_weight'),
+            charged_sum=Sum('charged_weight'),
+            on_time=Count('pk', filter=delivered & Q(delivery_date__lte=F('estimated_delivery_date'))),
+            late=Count('pk', filter=delivered & Q(delivery_date__gt=F('estimated_delivery_date'))),
+        )
+    )
+    for group in groups.iterator():
+        yield ShipmentDailyStat(
+            date=group['date'], customer=group['billto_customer'] or '',
+            origin=group['origin'], destination=group['destination'], status=group['status'],
+            shipments=group['n'], articles=group['article_sum'],
+            freight=group['freight_sum'] or 0,
+            actual_weight=group['actual_sum'] or 0, charged_weight=group['charged_sum'] or 0,
+            delivered_on_time=group['on_time'], delivered_late=group['late'],
+        )
+
+
+def rebuild(start=None, end=None, batch_size=500):
+    """Recompute the rollup from Shipment for dates in [start, end] (everything by default)."""
+    shipments = Shipment.objects.all()
+    stats = ShipmentDailyStat.objects.all()
+    if start:
+        shipments, stats = shipments.filter(date__gte=start), stats.filter(date__gte=start)
+    if end:
+        shipments, stats = shipments.filter(date__lte=end), stats.filter(date__lte=end)
+    with transaction.atomic():
+        stats.delete()
+        rows = ShipmentDailyStat.objects.bulk_create(rollup_rows(shipments), batch_size=batch_size)
+    return len(rows)
+
+
+# ---------------------------
+# Dashboard
+# ---------------------------
+
+DASHBOARD_DAYS = (7, 30, 90)
+
+
+def visible_stats(user):
+    """Rollup rows ``user`` may see, scoped like queries.visible_shipments."""
+    if not user.is_authenticated:
+        return ShipmentDailyStat.objects.none()
+    if user.usertype == "Internal":
+        return ShipmentDailyStat.objects.all()
+    if not user.company_name_id:
+        return ShipmentDailyStat.objects.none()
+    return ShipmentDailyStat.objects.filter(customer=user.company_name.customer_id)
+
+
+def dashboard_summary(rows, top_customers=10):
+    """Status counts, freight by customer and per-day SLA from a rollup queryset. Never touches Shipment."""
+    rows = rows.order_by()
+    by_status = {
+        row['status']: row
+        for row in rows.values('status').annotate(count=Sum('shipments'), freight_sum=Sum('freight'))
+    }
+    customers = list(
+        rows.values('customer')
+        .annotate(count=Sum('shipments'), freight_sum=Sum('freight'), articles_sum=Sum('articles'))
+        .order_by('-freight_sum')[:top_customers]
+    )
+    daily = list(
+        rows.values('date')
+        .annotate(
+            count=Sum('shipments'),
+            delivered=Sum('shipments', filter=Q(status='Delivered')),
+            on_time=Sum('delivered_on_time'),
+            late=Sum('delivered_late'),
+            freight_sum=Sum('freight'),
+        )
+        .order_by('-date')
+    )
+    for day in daily:
+        measured = day['on_time'] + day['late']
+        day['on_time_pct'] = round(100 * day['on_time'] / measured, 1) if measured else None
+
+    on_time = sum(day['on_time'] for day in daily)
+    measured = on_time + sum(day['late'] for day in daily)
+    return {
+        'total': sum(row['count'] for row in by_status.values()),
+        'freight': sum((row['freight_sum'] for row in by_status.values()), Decimal(0)),
+        'status_counts': [(status, by_status.get(status, {}).get('count', 0)) for status, _ in Shipment.STATUS_CHOICES],
+        'customers': customers,
+        'daily': daily,
+        'on_time_pct': round(100 * on_time / measured, 1) if measured else None,
+    }
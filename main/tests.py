@@ -1,3 +1,650 @@
-from django.test import TestCase
+import importlib
+import io
+import random
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+import pandas as pd
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    benchmark, caching, compliance, importers, jobs, lifecycle, matching, search, stats, tracking, tripcosts,
+)
+from .importers import ShipmentImportError, error_workbook, import_shipment_file
+from .models import (
+    CustomUser, Fleet, Job, Manifest, PartyName, Sequence, Shipment, ShipmentDailyStat, ShipmentEvent,
+    ShipmentStatusChange, TripCostRollup, TripOutToVendor, VendorMaster,
+)
+from .queries import decode_cursor, encode_cursor, keyset_page
+from .signals import recompute_manifest_totals
+
+
+LOCAL_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'versions'},
+}
+
+
+def make_shipment(**fields):
+    values = {
+        'freight': 1000, 'shipment_type': 'LTL', 'payment_mode': 'TBB',
+        'origin': 'Bengaluru', 'origin_pin': '560001', 'destination': 'Chennai', 'destination_pin': '600001',
+        'vehicle_no': 'KA01AB0001', 'driver_details': 'Driver',
+        'consignor_name': 'Consignor', 'consignor_address': 'Address', 'consignor_contact': '9800000000',
+        'consignee_name': 'Consignee', 'consignee_address': 'Address', 'consignee_contact': '9700000000',
+        'invoice_ref_number': 'INV-1', 'boe_num': '', 'value': 5000, 'pack_type': 'Box',
+    }
+    values.update(fields)
+    return Shipment.objects.create(**values)
+
+
+def make_trip(trip_id, vendor, **fields):
+    values = {
+        'vehicle_type': 'Truck', 'vehicle_capacity': Decimal(9), 'from_location': 'Chennai', 'destination': 'Bengaluru',
+        'kilometer': Decimal(350), 'trip_charge': Decimal(10000), 'additional_charge': Decimal(0),
+        'total_bill_amount': Decimal(10000),
+    }
+    values.update(fields)
+    return TripOutToVendor.objects.create(trip_id=trip_id, vendor=vendor, **values)
+
+
+def make_vendor(code, name='Vendor'):
+    return VendorMaster.objects.create(vendor_code=code, vendor_name=name, billing_address='Address', city='Chennai',
+                                       state='State')
+
+
+def upload(content, name='shipments.csv'):
+    return SimpleUploadedFile(name, content, content_type='text/csv')
+
+
+def make_user(username, **fields):
+    return CustomUser.objects.create_user(username=username, password='secret', gender='O', phone_number='0',
+                                          role='Executive', **fields)
+
+
+class SequenceTests(TestCase):
+
+    def test_reserve_returns_consecutive_blocks(self):
+        self.assertEqual(list(Sequence.reserve('TST', 3)), [1, 2, 3])
+        self.assertEqual(list(Sequence.reserve('TST', 2)), [4, 5])
+        self.assertEqual(list(Sequence.reserve('TST', 1, year=2030)), [1])
+        self.assertEqual(Sequence.objects.get(prefix='TST', year=0).last_value, 5)
+
+    def test_reserve_retries_when_first_create_loses_the_race(self):
+        # another request inserts the counter between our UPDATE (which found nothing) and our INSERT
+        Sequence.objects.create(prefix='TST', last_value=7)
+        update = QuerySet.update
+        calls = []
+
+        def first_update_misses(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', first_update_misses):
+            numbers = Sequence.reserve('TST', 2)
+        self.assertEqual(list(numbers), [8, 9])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Sequence.objects.get(prefix='TST').last_value, 9)
+
+    def test_advance_only_moves_forward(self):
+        Sequence.advance('TST', 10)
+        Sequence.advance('TST', 4)
+        self.assertEqual(Sequence.objects.get(prefix='TST').last_value, 10)
+        self.assertEqual(list(Sequence.reserve('TST')), [11])
+
+    def test_migration_seeds_counters_after_highest_number(self):
+        for consignment_no in ('CN-25007', 'CN-25012', 'CN-24003', 'LEGACY-1'):
+            make_shipment(consignment_no=consignment_no)
+        Sequence.objects.all().delete()
+
+        importlib.import_module('main.migrations.0003_sequence').seed_sequences(apps, None)
+
+        counters = dict(Sequence.objects.filter(prefix='CN').values_list('year', 'last_value'))
+        self.assertEqual(counters, {2025: 12, 2024: 3})
+
+    def test_parse_consignment_no_matches_generated_numbers_only(self):
+        self.assertEqual(Shipment.parse_consignment_no('CN-26003'), (2026, 3))
+        self.assertEqual(Shipment.parse_consignment_no('CN-261234'), (2026, 1234))
+        self.assertIsNone(Shipment.parse_consignment_no('CN-260003'))  # never generated: 3 is CN-26003
+        self.assertIsNone(Shipment.parse_consignment_no('AWB-26003'))
+
+
+class ConsignmentNumberImportTests(TestCase):
+
+    def test_imported_numbers_advance_the_counter(self):
+        yy = str(timezone.now().year)[2:]
+        content = benchmark.upload_csv(random.Random(1), 2, None).decode()
+        lines = content.splitlines()
+        lines[0] += ',consignment_no'
+        lines[1] += f',CN-{yy}003'
+        lines[2] += ','  # blank: filled in from the counter
+        make_shipment()  # CN-yy001
+
+        self.assertEqual(import_shipment_file(upload('\n'.join(lines).encode()), keep_consignment_no=True), 2)
+
+        self.assertTrue(Shipment.objects.filter(consignment_no=f'CN-{yy}004').exists())
+        self.assertEqual(make_shipment().consignment_no, f'CN-{yy}005')
+
+
+class ChunkedImportTests(TestCase):
+
+    def test_error_in_a_later_chunk_rolls_back_the_first(self):
+        lines = benchmark.upload_csv(random.Random(1), 5, None).decode().splitlines()
+        header = lines[0].split(',')
+        value = lambda number, column: lines[number].split(',')[header.index(column)]
+        lines[3] = lines[3].replace(f",{value(3, 'freight')},", ',abc,', 1)  # second chunk
+        lines[5] = lines[5].replace(',TBB,', ',XYZ,', 1)  # third chunk, only validated
+
+        with self.assertRaises(ShipmentImportError) as raised:
+            import_shipment_file(upload('\n'.join(lines).encode()), chunk_size=2)
+
+        self.assertEqual([number for number, _ in raised.exception.errors], [3, 5])
+        self.assertEqual(raised.exception.errors[0][1], "'freight' must be a number")
+        self.assertFalse(Shipment.objects.exists())
+        self.assertFalse(ShipmentEvent.objects.exists())
+        self.assertFalse(PartyName.objects.filter(shipments__gt=0).exists())
+        self.assertFalse(Sequence.objects.filter(prefix='CN').exists())
+
+        workbook = openpyxl.load_workbook(io.BytesIO(error_workbook(raised.exception.rows, raised.exception.errors)))
+        rows = list(workbook['Errors'].iter_rows(values_only=True))
+        self.assertEqual(rows[0][:2], ('row', 'errors'))
+        self.assertEqual([(row[0], row[header.index('freight') + 2], row[header.index('payment_mode') + 2])
+                          for row in rows[1:]], [(3, 'abc', 'TBB'), (5, value(5, 'freight'), 'XYZ')])
+
+    def test_dates_are_read_day_first(self):
+        lines = benchmark.upload_csv(random.Random(2), 3, None).decode().splitlines()
+        column = lines[0].split(',').index('date')
+        for number, typed in ((1, '05/04/2025'), (2, '2025-04-05'), (3, '05-04-2025')):
+            cells = lines[number].split(',')
+            cells[column] = typed
+            lines[number] = ','.join(cells)
+
+        import_shipment_file(upload('\n'.join(lines).encode()))
+
+        self.assertEqual(set(Shipment.objects.values_list('date', flat=True)), {date(2025, 4, 5)})
+
+        cells = lines[1].split(',')
+        cells[column] = '04/13/2025'  # month first is not guessed
+        with self.assertRaises(ShipmentImportError) as raised:
+            import_shipment_file(upload('\n'.join([lines[0], ','.join(cells)]).encode()))
+        self.assertEqual(raised.exception.errors, [(1, "'date' is not a valid date")])
+
+
+class AdminUploadTests(TestCase):
+
+    def test_missing_columns_return_an_error_report(self):
+        self.client.force_login(make_user('admin', is_staff=True, is_superuser=True))
+        response = self.client.post(reverse('admin:upload-shipments'),
+                                    {'file': upload(b'freight,value\n100,5000\n')})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="shipment_upload_errors.xlsx"')
+        rows = list(openpyxl.load_workbook(io.BytesIO(response.content))['Errors'].iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('row', 'errors', 'freight', 'value'))
+        self.assertEqual(rows[1][0], 1)
+        self.assertTrue(rows[1][1].startswith('Missing column(s): '))
+        self.assertFalse(Shipment.objects.exists())
+
+
+class KeysetPagingTests(TestCase):
+
+    def setUp(self):
+        today = timezone.localdate()
+        # three shipments on each of two days and one on a third: pages break inside a day
+        for days in (0, 0, 0, 1, 1, 1, 2):
+            make_shipment(date=today - timedelta(days=days))
+        self.expected = list(Shipment.objects.order_by('-date', '-pk').values_list('pk', flat=True))
+
+    def test_cursor_round_trip(self):
+        shipment = Shipment.objects.first()
+        cursor = encode_cursor(shipment)
+        self.assertEqual(decode_cursor(cursor), (shipment.date, shipment.pk))
+        self.assertEqual(encode_cursor({'date': shipment.date, 'id': shipment.pk}), cursor)
+        for garbage in (None, '', 'yesterday', '2026-13-01_4', '2026-01-01_x', '2026-01-01_4_5'):
+            self.assertIsNone(decode_cursor(garbage))
+
+    def test_paging_forward_and_back_over_duplicate_dates(self):
+        pages, after = [], None
+        while True:
+            rows, next_cursor, prev_cursor = keyset_page(Shipment.objects.all(), after=after, page_size=3)
+            pages.append([row.pk for row in rows])
+            if next_cursor is None:
+                break
+            after = next_cursor
+        self.assertEqual(pages, [self.expected[0:3], self.expected[3:6], self.expected[6:]])
+        self.assertIsNotNone(prev_cursor)
+
+        rows, next_cursor, back = keyset_page(Shipment.objects.all(), before=prev_cursor, page_size=3)
+        self.assertEqual([row.pk for row in rows], self.expected[3:6])
+        self.assertEqual(next_cursor, encode_cursor(Shipment.objects.get(pk=self.expected[5])))
+        rows, _, back = keyset_page(Shipment.objects.all(), before=back, page_size=3)
+        self.assertEqual([row.pk for row in rows], self.expected[0:3])
+        self.assertIsNone(back)
+
+        # stepping past the last row gives an empty page, not an error
+        last = Shipment.objects.get(pk=self.expected[-1])
+        self.assertEqual(keyset_page(Shipment.objects.all(), after=encode_cursor(last), page_size=3), ([], None, None))
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.krishna = make_shipment(consignee_name='Krishna Logistics', vehicle_no='KA01AB1234')
+        self.other = make_shipment(consignee_name='Balaji Transport', vehicle_no='TN09XY5678')
+
+    def found(self, term):
+        return set(search.search(Shipment.objects.all(), term).values_list('pk', flat=True))
+
+    def test_terms_match_inside_words(self):
+        self.assertIsNotNone(search.matching_ids('rishn'))  # answered by the index
+        self.assertEqual(self.found('rishn'), {self.krishna.pk})
+        self.assertEqual(self.found(self.krishna.consignment_no[3:]), {self.krishna.pk})
+        self.assertEqual(self.found('AB12 logist'), {self.krishna.pk})
+        self.assertEqual(self.found('12'), {self.krishna.pk})  # too short for the index: icontains
+
+    def test_index_follows_saves_and_deletes(self):
+        def indexed():
+            with connection.cursor() as cursor:
+                columns = ', '.join(search.SEARCH_FIELDS)
+                cursor.execute(f"SELECT rowid, {columns} FROM {search.SEARCH_TABLE} ORDER BY rowid")
+                return cursor.fetchall()
+
+        self.krishna.consignee_name = 'Krishna Freight Carriers'
+        self.krishna.save()
+        self.other.vehicle_no = 'TN10ZZ0001'
+        self.other.save(update_fields=['vehicle_no'])
+        lifecycle.transition(Shipment.objects.all(), 'dispatch')
+        make_shipment(consignor_name='Late Addition').delete()
+        import_shipment_file(upload(benchmark.upload_csv(random.Random(1), 2, None)))
+
+        kept = indexed()
+        search.rebuild()
+        self.assertEqual(kept, indexed())
+        self.assertEqual(len(kept), Shipment.objects.count())
+        self.assertEqual(self.found('freight carr'), {self.krishna.pk})
+        self.assertEqual(self.found('TN10ZZ'), {self.other.pk})
+
+    def test_mysql_queries_ngram_phrases(self):
+        with mock.patch.object(search, 'connection', mock.Mock(vendor='mysql')):
+            sql, params = search.matching_ids('rishn AB12').as_sql(None, None)
+        self.assertIn('MATCH (consignment_no', sql)
+        self.assertEqual(params, ('+"rishn" +"AB12"',))
+
+
+class PartyMatchingTests(TestCase):
+
+    def setUp(self):
+        matching.reset()
+
+    def test_exact_keys_skip_fuzzy_scoring(self):
+        index = matching.MatchIndex([(matching.normalize('Acme Traders Pvt Ltd'), 'Acme Traders Pvt Ltd')])
+        with mock.patch.object(matching.process, 'cdist') as cdist:
+            found = index.match(['ACME TRADERS PRIVATE LIMITED', 'traders acme'])
+        cdist.assert_not_called()
+        self.assertEqual({raw: match.score for raw, match in found.items()},
+                         {'ACME TRADERS PRIVATE LIMITED': 100, 'traders acme': 100})
+
+    def test_party_counts_follow_shipments(self):
+        shipment = make_shipment(consignor_name='Acme Traders')
+        make_shipment(consignor_name='Acme Traders')
+        counts = lambda: dict(PartyName.objects.filter(kind='consignor').values_list('name', 'shipments'))
+        self.assertEqual(counts(), {'Acme Traders': 2})
+
+        shipment.consignor_name = 'Beta Freight'
+        shipment.save()
+        self.assertEqual(counts(), {'Acme Traders': 1, 'Beta Freight': 1})
+
+        shipment.delete()
+        self.assertEqual(counts(), {'Acme Traders': 1, 'Beta Freight': 0})
+        self.assertEqual(list(matching.party_index('consignor').lookup.values()), ['Acme Traders'])
+
+    def test_only_identical_party_keys_are_rewritten(self):
+        make_shipment(consignee_name='Raj Kumar')
+        reviews = {}
+        names = matching.canonical_parties(pd.Series(['Raj Kumari', 'RAJ KUMAR.']), 'consignee', reviews)
+        self.assertEqual(list(names), ['Raj Kumari', 'Raj Kumar'])
+        self.assertEqual({key: match.value for key, match in reviews.items()},
+                         {('consignee', 'Raj Kumari'): 'Raj Kumar'})
+
+    def test_save_reads_the_stored_row_once(self):
+        shipment = make_shipment(consignor_name='Acme Traders')
+        shipment.status = 'In Transit'
+        shipment.consignor_name = 'Beta Freight'
+        with CaptureQueriesContext(connection) as queries:
+            shipment.save()
+        reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "main_shipment"' in q['sql']]
+        self.assertEqual(len(reads), 1, reads)
+        self.assertEqual(PartyName.objects.get(kind='consignor', name='Beta Freight').shipments, 1)
+        self.assertEqual(ShipmentDailyStat.objects.get(status='In Transit').shipments, 1)
+
+    def test_import_counts_parties(self):
+        import_shipment_file(upload(benchmark.upload_csv(random.Random(1), 3, None)))
+        self.assertEqual(PartyName.objects.get(kind='consignee', name='Consignee').shipments, 3)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class CacheInvalidationTests(TestCase):
+
+    def test_versions_and_tracking_move_only_on_commit(self):
+        shipment = make_shipment()
+        tracking.track([shipment.consignment_no])  # cache the booked row
+        before = caching.version(Shipment)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            shipment.status = 'In Transit'
+            shipment.save()
+            self.assertEqual(caching.version(Shipment), before)
+            self.assertEqual(tracking.track([shipment.consignment_no])[0]['status'], 'Booked')
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(caching.version(Shipment), before)
+        self.assertEqual(tracking.track([shipment.consignment_no])[0]['status'], 'In Transit')
+
+
+@override_settings(CACHES=dict(LOCAL_CACHE, default=dict(LOCAL_CACHE['default'], OPTIONS={'MAX_ENTRIES': 3})))
+class CacheVersionTests(TestCase):
+
+    def test_culling_the_default_cache_keeps_versions(self):
+        before = caching.version(Shipment)
+        cache.set_many({f'filler-{n}': n for n in range(10)})
+        self.assertLess(len([n for n in range(10) if cache.get(f'filler-{n}') is not None]), 10)  # culled
+        self.assertEqual(caching.version(Shipment), before)
+
+
+class LifecycleTests(TestCase):
+
+    def test_dispatch_moves_booked_shipments_only(self):
+        booked, delivered = make_shipment(), make_shipment(status='Delivered')
+        moved, skipped = lifecycle.transition(Shipment.objects.filter(pk__in=[booked.pk, delivered.pk]), 'dispatch')
+        self.assertEqual((moved, skipped), (1, 1))
+        self.assertEqual(ShipmentStatusChange.objects.get().shipment_id, booked.pk)
+
+    def test_rows_changed_after_the_read_are_not_recorded(self):
+        first, second = make_shipment(), make_shipment()
+        localdate = timezone.localdate
+
+        def concurrent_cancel():
+            # runs between the read and the UPDATE, as a backend without row locks would allow
+            Shipment.objects.filter(pk=second.pk).update(status='Cancelled')
+            return localdate()
+
+        with mock.patch.object(lifecycle.timezone, 'localdate', side_effect=concurrent_cancel):
+            moved, skipped = lifecycle.transition(Shipment.objects.filter(pk__in=[first.pk, second.pk]), 'dispatch')
+
+        self.assertEqual((moved, skipped), (1, 1))
+        self.assertEqual(list(ShipmentStatusChange.objects.values_list('shipment_id', flat=True)), [first.pk])
+        self.assertEqual(ShipmentEvent.objects.filter(shipment=second).count(), 1)  # only its booking
+        in_transit = ShipmentDailyStat.objects.filter(status='In Transit').values_list('shipments', flat=True)
+        self.assertEqual(sum(in_transit), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TripListTests(TestCase):
+
+    def test_status_form_posts_without_javascript(self):
+        trip = make_trip('TRIP-1', make_vendor('VND-001', 'Vendor One'))
+        client = Client(enforce_csrf_checks=True)
+        client.get(reverse('trip-list'))  # fills the row cache
+        page = client.get(reverse('trip-list')).content.decode()
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('trip-status-update', args=[trip.pk]),
+                        {'csrfmiddlewaretoken': token, 'status': 'Closed'})
+
+        trip.refresh_from_db()
+        self.assertEqual(trip.status, 'Closed')
+        self.assertIn('<option value="Closed" selected>', client.get(reverse('trip-list')).content.decode())
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+@mock.patch.object(jobs, 'close_old_connections', lambda: None)  # would close the test transaction
+class JobTests(TestCase):
+
+    def claimed_job(self, kind='labels', **params):
+        job = jobs.submit(kind, params=params)
+        self.assertEqual(jobs.claim_jobs(1, 'test-worker'), [job.pk])
+        return job
+
+    def test_stale_jobs_are_requeued_then_failed(self):
+        stale, given_up, alive = self.claimed_job(), self.claimed_job(), self.claimed_job()
+        old = timezone.now() - timedelta(seconds=jobs.JOB_STALE_AFTER + 1)
+        Job.objects.filter(pk__in=[stale.pk, given_up.pk]).update(heartbeat_at=old)
+        Job.objects.filter(pk=given_up.pk).update(attempts=jobs.JOB_MAX_ATTEMPTS)
+
+        self.assertEqual(jobs.reclaim_stale_jobs(), (1, 1))
+
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[job.pk] for job in (stale, given_up, alive)], ['Queued', 'Failed', 'Running'])
+        self.assertEqual(jobs.claim_jobs(1, 'test-worker'), [stale.pk])
+        self.assertEqual(Job.objects.get(pk=stale.pk).attempts, 2)
+
+    def test_reclaimed_attempt_does_not_overwrite_the_new_one(self):
+        job = self.claimed_job(consignments=[])
+
+        def reclaimed_meanwhile(job):
+            Job.objects.filter(pk=job.pk).update(status='Queued')
+            jobs.claim_jobs(1, 'other-worker')
+            return 'labels.pdf', b'%PDF'
+
+        with mock.patch.dict(jobs.TASKS, {'labels': reclaimed_meanwhile}):
+            self.assertEqual(jobs.run_job(job.pk), 'Reclaimed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts, job.result_file.name),
+                         ('Running', 'other-worker', 2, ''))
+
+    def test_bulk_upload_progress_is_visible_outside_the_import_transaction(self):
+        job = jobs.submit('bulk_upload', input_file=upload(benchmark.upload_csv(random.Random(1), 5, None)))
+        jobs.claim_jobs(1, 'test-worker')
+        claimed = Job.objects.get(pk=job.pk)
+        set_progress = Job.set_progress
+        seen = []
+
+        def observe(job, done, total):
+            set_progress(job, done, total)
+            # what another process sees while the import is uncommitted: the row as claimed, plus the cache
+            seen.append(Job(pk=claimed.pk, status='Running', attempts=claimed.attempts, progress=0).live_progress)
+
+        with mock.patch.object(importers, 'IMPORT_CHUNK_SIZE', 2), mock.patch.object(Job, 'set_progress', observe):
+            self.assertEqual(jobs.run_job(job.pk), 'Done')
+        self.assertEqual(seen, [40, 80, 100])
+        self.assertEqual(Shipment.objects.count(), 5)
+
+    def test_only_the_submitter_and_staff_see_a_job(self):
+        owner, other, staff = make_user('owner'), make_user('other'), make_user('staff', is_staff=True)
+        job = jobs.submit('labels', owner, {'consignments': []})
+        urls = [reverse(name, args=[job.token]) for name in ('job_detail', 'job_status')]
+
+        for url in urls:
+            self.assertRedirects(self.client.get(url), f"{reverse('login')}?next={url}", fetch_redirect_response=False)
+        for user, status_code in ((owner, 200), (other, 404), (staff, 200)):
+            self.client.force_login(user)
+            self.assertEqual([self.client.get(url).status_code for url in urls], [status_code] * 2)
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.token])).status_code, 404)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TripCostTests(TestCase):
+
+    def assertRollupMatchesRebuild(self):
+        rollup = lambda: sorted(TripCostRollup.objects.values_list(
+            'vendor_id', 'from_location', 'destination', 'vehicle_type', 'month', *tripcosts.MEASURES))
+        kept = rollup()
+        tripcosts.rebuild()
+        self.assertEqual(kept, rollup())
+
+    def test_rollup_follows_trips_between_cells(self):
+        first, second = make_vendor('VND-001'), make_vendor('VND-002')
+        cheap = make_trip('TRIP-1', first)
+        dear = make_trip('TRIP-2', first, total_bill_amount=Decimal(21000))
+        moved = make_trip('TRIP-3', first, kilometer=Decimal(0))
+        self.assertRollupMatchesRebuild()
+        self.assertEqual(TripCostRollup.objects.get().max_rate_trip, 'TRIP-2')
+
+        dear.status = 'Cancelled'  # the dearest trip leaves the cell, so its max_rate must be recomputed
+        dear.save()
+        self.assertRollupMatchesRebuild()
+        self.assertEqual(TripCostRollup.objects.get().max_rate_trip, 'TRIP-1')
+
+        moved.vendor, moved.destination, moved.kilometer = second, 'Mysuru', Decimal(150)
+        moved.save()
+        cheap.created_at -= timedelta(days=40)
+        cheap.save()
+        self.assertRollupMatchesRebuild()
+        self.assertEqual(TripCostRollup.objects.count(), 2)
+
+        moved.delete()
+        dear.status = 'Closed'
+        dear.save()
+        self.assertRollupMatchesRebuild()
+
+    def test_rebuild_changes_the_analytics_etag(self):
+        self.client.force_login(make_user('analyst'))
+        url = reverse('trip-cost-analytics')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tripcosts.rebuild()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ManifestTotalsTests(TestCase):
+
+    def assertTotalsMatchRebuild(self):
+        stored = lambda: list(Manifest.objects.order_by('pk').values_list('pk', 'total_articles', 'total_freight'))
+        kept = stored()
+        recompute_manifest_totals(Manifest.objects.all())
+        self.assertEqual(kept, stored())
+
+    def test_totals_follow_shipment_links_and_edits(self):
+        first, second = Manifest.objects.create(), Manifest.objects.create()
+        a, b, c = (make_shipment(no_article=n, freight=100 * n) for n in (1, 2, 3))
+
+        first.shipments.add(a, b)
+        second.shipments.add(b)
+        c.manifests.add(first, second)
+        self.assertTotalsMatchRebuild()
+        self.assertEqual(Manifest.objects.values_list('total_articles', flat=True).get(pk=first.pk), 6)
+
+        first.shipments.remove(a)
+        self.assertTotalsMatchRebuild()
+        b.freight, b.no_article = 250, 5
+        b.save()
+        self.assertTotalsMatchRebuild()
+        c.manifests.clear()
+        self.assertTotalsMatchRebuild()
+        b.delete()
+        self.assertTotalsMatchRebuild()
+        second.shipments.add(a)
+        second.shipments.clear()
+        self.assertTotalsMatchRebuild()
+        self.assertEqual(list(Manifest.objects.values_list('total_articles', 'total_freight')), [(0, 0), (0, 0)])
+
+
+class DailyStatsTests(TestCase):
+
+    def assertRollupMatchesRebuild(self):
+        def rollup():
+            rows = ShipmentDailyStat.objects.exclude(shipments=0).values_list(
+                'date', 'customer', 'origin', 'destination', 'status', *stats.MEASURES)
+            return sorted(rows)
+        kept = rollup()
+        stats.rebuild()
+        self.assertEqual(kept, rollup())
+
+    def test_rollup_follows_edits_transitions_and_deletes(self):
+        today = timezone.localdate()
+        first, second, third = make_shipment(), make_shipment(freight=2500), make_shipment(origin='Mysuru')
+        self.assertRollupMatchesRebuild()
+
+        first.date = today - timedelta(days=3)
+        first.freight = 1800
+        first.save()
+        second.status = 'Delivered'
+        second.estimated_delivery_date = today
+        second.delivery_date = today - timedelta(days=1)
+        second.save(update_fields=['status', 'estimated_delivery_date', 'delivery_date'])
+        self.assertRollupMatchesRebuild()
+
+        lifecycle.transition(Shipment.objects.filter(pk__in=[first.pk, third.pk]), 'dispatch')
+        self.assertRollupMatchesRebuild()
+        third.delete()
+        import_shipment_file(upload(benchmark.upload_csv(random.Random(1), 2, None)))
+        self.assertRollupMatchesRebuild()
+        self.assertEqual(ShipmentDailyStat.objects.get(status='Delivered').delivered_on_time, 1)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ComplianceTests(TestCase):
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        far, soon, lapsed = (self.today + timedelta(days=400), self.today + timedelta(days=10),
+                             self.today - timedelta(days=5))
+        documents = lambda **dates: {**{field: far for field, _ in compliance.DOCUMENTS}, **dates}
+        for number, status, dates in (
+            ('KA01AA0001', 'Active', documents()),
+            ('KA01AA0002', 'Active', documents(insurance_validity=lapsed, fitness_validity=soon)),
+            ('KA01AA0003', 'Active', documents(permit_validity=None)),
+            ('KA01AA0004', 'Active', documents(pollution_validity=soon)),
+            ('KA01AA0005', 'Inactive', documents(insurance_validity=lapsed)),
+            # due exactly on the horizon
+            ('KA01AA0006', 'Active', documents(fitness_validity=self.today + timedelta(compliance.COMPLIANCE_DAYS))),
+        ):
+            Fleet.objects.create(vehicle_number=number, vehicle_type='Truck', capacity_mt=9, status=status, **dates)
+
+    def reference(self, days):
+        """Every active vehicle checked document by document in Python."""
+        horizon = self.today + timedelta(days=days)
+        flagged = {}
+        for fleet in Fleet.objects.filter(status='Active'):
+            states = {}
+            for field, label in compliance.DOCUMENTS:
+                valid_till = getattr(fleet, field)
+                if valid_till is None:
+                    states[label] = 'Missing'
+                elif valid_till <= horizon:
+                    states[label] = 'Expired' if valid_till < self.today else 'Due'
+            if states:
+                flagged[fleet.vehicle_number] = states
+        return flagged
+
+    def scanned(self, report):
+        return {vehicle['vehicle_number']: {doc['document']: doc['state'] for doc in vehicle['documents']}
+                for vehicle in report['vehicles']}
+
+    def test_scan_matches_a_full_check(self):
+        for days in (0, 15, compliance.COMPLIANCE_DAYS):
+            self.assertEqual(self.scanned(compliance.scan(days, self.today)), self.reference(days))
+        report = compliance.scan(today=self.today)
+        self.assertEqual([v['vehicle_number'] for v in report['vehicles'] if not v['compliant']],
+                         ['KA01AA0002', 'KA01AA0003'])  # earliest expiry first; a missing document sorts as today
+        self.assertEqual(report['counts']['Insurance']['Expired'], 1)
+
+    def test_daily_scan_follows_fleet_edits_and_open_bookings(self):
+        self.assertIn('KA01AA0002', self.scanned(compliance.daily_scan()))
+        make_shipment(vehicle_no='KA01AA0002')
+        make_shipment(vehicle_no='KA01AA0002', status='Delivered')
+        self.assertEqual(compliance.report()['blocked_bookings'], 1)
+
+        fleet = Fleet.objects.get(vehicle_number='KA01AA0002')
+        fleet.insurance_validity = fleet.fitness_validity = self.today + timedelta(days=400)
+        with self.captureOnCommitCallbacks(execute=True):
+            fleet.save()
+        self.assertEqual(self.scanned(compliance.daily_scan()), self.reference(compliance.COMPLIANCE_DAYS))
+        self.assertNotIn('KA01AA0002', self.scanned(compliance.daily_scan()))
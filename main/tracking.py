@@ -0,0 +1,69 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import events
+from .models import Shipment
+
+
+TRACKING_BATCH_LIMIT = getattr(settings, 'TRACKING_BATCH_LIMIT', 50)
+TRACKING_CACHE_TIMEOUT = getattr(settings, 'TRACKING_CACHE_TIMEOUT', 300)
+TRACKING_MISS_TIMEOUT = 60  # unknown numbers are remembered briefly so polling them stays off the DB
+
+# only what a customer needs to follow a consignment; no addresses, contacts or values
+TRACKING_COLUMNS = (
+    'consignment_no', 'status', 'date', 'origin', 'origin_pin', 'destination', 'destination_pin',
+    'shipment_type', 'pack_type', 'no_article', 'estimated_delivery_date', 'delivery_date', 'pod_scan',
+)
+
+_NOT_FOUND = False
+
+
+class TooManyConsignments(Exception):
+    pass
+
+
+def parse_consignment_numbers(raw, limit=TRACKING_BATCH_LIMIT):
+    """Split user input on spaces/commas, de-duplicate it and enforce the batch cap."""
+    numbers = list(dict.fromkeys(n for n in re.split(r'[\s,]+', raw or '') if n))
+    if len(numbers) > limit:
+        raise TooManyConsignments(f"At most {limit} consignments can be tracked at once.")
+    return numbers
+
+
+def _cache_key(consignment_no):
+    return f"tracking:{consignment_no}"
+
+
+def track(numbers):
+    """Return tracking dicts for the ``numbers`` that exist, in the order given.
+
+    Results are read through the cache; everything not cached is fetched with one
+    narrow query (plus one for the status timelines) and cached until the shipment
+    is saved again.
+    """
+    keys = {no: _cache_key(no) for no in numbers}
+    cached = cache.get_many(keys.values())
+    results = {no: cached[key] for no, key in keys.items() if key in cached}
+
+    missing = [no for no in numbers if no not in results]
+    if missing:
+        storage = Shipment._meta.get_field('pod_scan').storage
+        rows = list(Shipment.objects.filter(consignment_no__in=missing).values('pk', *TRACKING_COLUMNS))
+        history = events.timelines([row['pk'] for row in rows])
+        found = {}
+        for row in rows:
+            pod_scan = row.pop('pod_scan')
+            row['pod_url'] = storage.url(pod_scan) if pod_scan else None
+            row['events'] = history.get(row.pop('pk'), [])
+            found[row['consignment_no']] = row
+        cache.set_many({keys[no]: row for no, row in found.items()}, TRACKING_CACHE_TIMEOUT)
+        cache.set_many({keys[no]: _NOT_FOUND for no in missing if no not in found}, TRACKING_MISS_TIMEOUT)
+        results.update(found)
+
+    return [results[no] for no in numbers if results.get(no)]
+
+
+def invalidate(consignment_nos):
+    cache.delete_many([_cache_key(no) for no in consignment_nos])
@@ -0,0 +1,234 @@
+"""Vendor trip costs rolled up per vendor x lane x vehicle type x month.
+
+Each TripCostRollup cell is recomputed from its own trips (through
+trip_cost_cell_idx) whenever one of them is saved or deleted, so it can carry
+the dearest trip per km as well as the sums. The analytics below read only the
+rollup: cost per km percentiles per lane, and the cells and trips that sit
+above the lane's outlier fence.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import caching
+from .models import TripCostRollup, TripOutToVendor
+
+
+TRIP_OUTLIER_IQR = getattr(settings, 'TRIP_OUTLIER_IQR', 1.5)  # fence = p75 + TRIP_OUTLIER_IQR x (p75 - p25)
+TRIP_MIN_PEERS = getattr(settings, 'TRIP_MIN_PEERS', 4)  # fewer cells on a lane: compare with the vehicle type instead
+PERCENTILES = (25, 50, 75, 90)
+
+# trip columns a cell is keyed on; pre_save snapshots these
+CELL_FIELDS = ('vendor_id', 'from_location', 'destination', 'vehicle_type', 'created_at')
+
+Cell = namedtuple('Cell', 'vendor_id from_location destination vehicle_type month')
+
+
+def _month(created_at):
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def _month_bounds(month):
+    start = timezone.make_aware(datetime(month.year, month.month, 1))
+    following = (month + timedelta(days=32)).replace(day=1)
+    return start, timezone.make_aware(datetime(following.year, following.month, 1))
+
+
+def cell_of(trip):
+    """The rollup cell of a TripOutToVendor or a dict of CELL_FIELDS."""
+    get = trip.get if isinstance(trip, dict) else lambda field: getattr(trip, field)
+    return Cell(get('vendor_id'), get('from_location'), get('destination'), get('vehicle_type'),
+                _month(get('created_at')))
+
+
+# ---------------------------
+# Incremental maintenance
+# ---------------------------
+
+MEASURES = ('trips', 'kilometers', 'amount', 'max_rate', 'max_rate_trip')
+_TRIP_COLUMNS = ('trip_id', 'kilometer', 'total_bill_amount', *CELL_FIELDS)
+
+
+def _empty(cell):
+    return TripCostRollup(**cell._asdict(), trips=0, kilometers=0, amount=0)
+
+
+def _accumulate(row, trip):
+    # in Python rather than SQL: SQLite stores whole-number decimals as integers and would divide them as such
+    row.trips += 1
+    row.kilometers += trip['kilometer']
+    row.amount += trip['total_bill_amount']
+    if trip['kilometer'] > 0:
+        rate = round(trip['total_bill_amount'] / trip['kilometer'], 2)
+        if row.max_rate is None or rate > row.max_rate:
+            row.max_rate, row.max_rate_trip = rate, trip['trip_id']
+
+
+def cell_trips(cell):
+    start, end = _month_bounds(cell.month)
+    return TripOutToVendor.objects.filter(
+        vendor_id=cell.vendor_id, from_location=cell.from_location, destination=cell.destination,
+        vehicle_type=cell.vehicle_type, created_at__gte=start, created_at__lt=end,
+    ).exclude(status='Cancelled')
+
+
+def refresh(cells):
+    """Recompute the rollup rows of ``cells`` from their trips; a cell left without trips is deleted."""
+    with transaction.atomic():
+        for cell in set(cells):
+            row = _empty(cell)
+            for trip in cell_trips(cell).values(*_TRIP_COLUMNS):
+                _accumulate(row, trip)
+            rows = TripCostRollup.objects.filter(**cell._asdict())
+            if not row.trips:
+                rows.delete()
+                continue
+            values = {measure: getattr(row, measure) for measure in MEASURES}
+            if rows.update(**values):
+                continue
+            try:
+                with transaction.atomic():
+                    row.save()
+            except IntegrityError:
+                rows.update(**values)  # another request created the row first
+
+
+# ---------------------------
+# Full rebuild
+# ---------------------------
+
+def rollup_rows(trips):
+    """Aggregate the ``trips`` queryset into unsaved TripCostRollup rows, reading each trip once."""
+    cells = {}
+    for trip in trips.exclude(status='Cancelled').order_by().values(*_TRIP_COLUMNS).iterator():
+        cell = cell_of(trip)
+        row = cells.get(cell)
+        if row is None:
+            row = cells[cell] = _empty(cell)
+        _accumulate(row, trip)
+    return cells.values()
+
+
+def rebuild(batch_size=500):
+    """Recompute the whole rollup from TripOutToVendor."""
+    with transaction.atomic():
+        TripCostRollup.objects.all().delete()
+        rows = TripCostRollup.objects.bulk_create(rollup_rows(TripOutToVendor.objects.all()), batch_size=batch_size)
+        # no signals on bulk_create; the analytics page's ETag follows this version
+        transaction.on_commit(lambda: caching.bump(TripCostRollup))
+    return len(rows)
+
+
+# ---------------------------
+# Analytics
+# ---------------------------
+
+def _groups(keys):
+    """Index of each key's group, and the distinct keys in first-seen order."""
+    distinct = {}
+    index = np.fromiter((distinct.setdefault(key, len(distinct)) for key in keys), dtype=np.intp, count=len(keys))
+    return index, list(distinct)
+
+
+def _quantiles(values, lane, lane_kind, kind):
+    """PERCENTILES of ``values`` per lane, and the fence above which a value is an outlier.
+
+    A lane with fewer than TRIP_MIN_PEERS values borrows the spread of its whole
+    vehicle type. NaN values are ignored; a group with none gets NaN throughout.
+    """
+    quantiles = np.full((len(lane_kind), len(PERCENTILES)), np.nan)
+    for group, group_kind in enumerate(lane_kind):
+        peers = values[lane == group]
+        peers = peers[~np.isnan(peers)]
+        if len(peers) < TRIP_MIN_PEERS:
+            peers = values[kind == group_kind]
+            peers = peers[~np.isnan(peers)]
+        if len(peers):
+            quantiles[group] = np.percentile(peers, PERCENTILES)
+    p25, p75 = quantiles[:, PERCENTILES.index(25)], quantiles[:, PERCENTILES.index(75)]
+    return quantiles, p75 + TRIP_OUTLIER_IQR * (p75 - p25)
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+def analytics(rollups):
+    """Cost per km by lane and vendor, and the overpriced cells and trips, from a TripCostRollup queryset.
+
+    A cell (one vendor's trips on a lane in a month) is flagged when its cost per
+    km is above the fence of the lane's cells; a trip when it is the dearest of
+    its cell and above the fence of the lane's dearest trips.
+    """
+    rows = list(
+        rollups.filter(kilometers__gt=0).order_by()
+        .values('vendor_id', 'vendor__vendor_name', 'from_location', 'destination', 'vehicle_type', 'month',
+                'trips', 'kilometers', 'amount', 'max_rate', 'max_rate_trip')
+    )
+    result = {'lanes': [], 'vendors': [], 'cells': [], 'trips': []}
+    if not rows:
+        return result
+
+    trips = np.array([row['trips'] for row in rows], dtype=np.float64)
+    km = np.array([row['kilometers'] for row in rows], dtype=np.float64)
+    amount = np.array([row['amount'] for row in rows], dtype=np.float64)
+    max_rate = np.array([np.nan if row['max_rate'] is None else row['max_rate'] for row in rows], dtype=np.float64)
+    rate = amount / km
+
+    lane, lanes = _groups([(row['from_location'], row['destination'], row['vehicle_type']) for row in rows])
+    kind, kinds = _groups([row['vehicle_type'] for row in rows])
+    vendor, vendors = _groups([(row['vendor_id'], row['vendor__vendor_name']) for row in rows])
+    lane_kind = np.array([kinds.index(vehicle_type) for _, _, vehicle_type in lanes], dtype=np.intp)
+
+    quantiles, cell_fence = _quantiles(rate, lane, lane_kind, kind)
+    _, trip_fence = _quantiles(max_rate, lane, lane_kind, kind)
+
+    lane_km = np.bincount(lane, weights=km, minlength=len(lanes))
+    lane_amount = np.bincount(lane, weights=amount, minlength=len(lanes))
+    lane_trips = np.bincount(lane, weights=trips, minlength=len(lanes))
+    for group, (origin, destination, vehicle_type) in enumerate(lanes):
+        result['lanes'].append({
+            'from_location': origin, 'destination': destination, 'vehicle_type': vehicle_type,
+            'trips': int(lane_trips[group]), 'kilometers': _round(lane_km[group]), 'amount': _round(lane_amount[group]),
+            'cost_per_km': _round(lane_amount[group] / lane_km[group]),
+            **{f'p{p}': _round(q) for p, q in zip(PERCENTILES, quantiles[group])},
+            'fence': _round(cell_fence[group]),
+        })
+    result['lanes'].sort(key=lambda row: -row['amount'])
+
+    over = rate > cell_fence[lane]
+    # NaN never compares greater, so cells without a measurable trip are never flagged
+    dear = max_rate > trip_fence[lane]
+    vendor_km = np.bincount(vendor, weights=km, minlength=len(vendors))
+    vendor_amount = np.bincount(vendor, weights=amount, minlength=len(vendors))
+    vendor_trips = np.bincount(vendor, weights=trips, minlength=len(vendors))
+    vendor_over = np.bincount(vendor, weights=over, minlength=len(vendors))
+    vendor_dear = np.bincount(vendor, weights=dear, minlength=len(vendors))
+    vendor_cells = np.bincount(vendor, minlength=len(vendors))
+    for group, (vendor_id, name) in enumerate(vendors):
+        result['vendors'].append({
+            'vendor_id': vendor_id, 'vendor_name': name, 'trips': int(vendor_trips[group]),
+            'kilometers': _round(vendor_km[group]), 'amount': _round(vendor_amount[group]),
+            'cost_per_km': _round(vendor_amount[group] / vendor_km[group]),
+            'flagged_cells': int(vendor_over[group]), 'flagged_trips': int(vendor_dear[group]),
+            'cells': int(vendor_cells[group]),
+        })
+    result['vendors'].sort(key=lambda row: -row['amount'])
+
+    for i in np.flatnonzero(over):
+        fence = cell_fence[lane[i]]
+        result['cells'].append(dict(
+            rows[i], cost_per_km=_round(rate[i]), fence=_round(fence), excess_pct=round(100 * (rate[i] / fence - 1), 1),
+        ))
+    for i in np.flatnonzero(dear):
+        fence = trip_fence[lane[i]]
+        result['trips'].append(dict(
+            rows[i], fence=_round(fence), excess_pct=round(100 * (max_rate[i] / fence - 1), 1),
+        ))
+    result['cells'].sort(key=lambda row: -row['excess_pct'])
+    result['trips'].sort(key=lambda row: -row['excess_pct'])
+    return result
@@ -1,30 +1,59 @@
 import csv
-import io
+import os
+from datetime import timedelta
 from io import BytesIO
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, HttpResponseNotFound
-from django.urls import reverse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, HttpResponse, HttpResponseNotFound, StreamingHttpResponse, FileResponse
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_date
-from django.template.loader import get_template
-
-import pandas as pd
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A6
-from reportlab.lib.units import inch, mm
-from reportlab.graphics.barcode import code128
-from xhtml2pdf import pisa
-
-from .models import Shipment, Manifest
+from django.views.decorators.http import condition
+
+from . import caching, compliance, events, jobs, lifecycle, perf, search, stats, tracking, tripcosts
+from .documents import (
+    COPY_LABELS,
+    CONSIGNMENT_NOTE_TEMPLATE,
+    LABEL_COLUMNS,
+    PDFRenderError,
+    render_consignment_notes,
+    render_labels,
+    render_manifest_pdf,
+    stream_labels_zip,
+)
+from .exports import stream_csv, write_xlsx
 from .forms import (
     ShipmentForm,
     ShipmentUpdateForm,
     ManifestForm,
     CustomUserCreationForm,
-    PODUploadForm
+    PODUploadForm,
+    BulkStatusForm,
+    VendorMasterForm,
+    TripOutToVendorForm,
+)
+from .importers import (
+    SUMMARY_FIELDS,
+    ShipmentImportError,
+    UnsupportedFileFormat,
+    import_shipment_file,
+)
+from .models import CustomerMaster, Job, Manifest, Shipment, TripCostRollup, TripOutToVendor, VendorMaster
+from .queries import (
+    PICKER_PAGE_SIZE,
+    SHIPMENT_LIST_COLUMNS,
+    filter_shipments,
+    keyset_page,
+    pickable_shipments,
+    picker_json,
+    picker_rows,
+    shipment_filters,
+    shipment_search,
+    visible_shipments,
 )
 
 
@@ -68,7 +97,20 @@ def user_login(request):
     return render(request, 'main.html')
 
 def dashboard(request):
-    return render(request, 'dashboard.html')
+    # reads only the ShipmentDailyStat rollup, never the Shipment table
+    days = int(request.GET.get('days')) if request.GET.get('days') in map(str, stats.DASHBOARD_DAYS) else 30
+    since = timezone.now().date() - timedelta(days=days - 1)
+    summary = stats.dashboard_summary(stats.visible_stats(request.user).filter(date__gte=since))
+    names = dict(CustomerMaster.objects.filter(
+        customer_id__in=[row['customer'] for row in summary['customers']]
+    ).values_list('customer_id', 'company_name'))
+    for row in summary['customers']:
+        row['name'] = names.get(row['customer']) or row['customer'] or 'Not billed'
+    return render(request, 'dashboard.html', {
+        **summary,
+        'days': days,
+        'day_choices': stats.DASHBOARD_DAYS,
+    })
 
 
 # ---------------------------
@@ -93,94 +135,75 @@ def shipment_create(request):
         form = ShipmentForm()
     return render(request, 'shipment_create.html', {'form': form, 'pagename': 'Create Shipment'})
 
-import csv
-from django.http import HttpResponse
-from django.contrib.auth.decorators import login_required
-from .models import Shipment
-
 
 @login_required
 def shipment_list(request):
-    if request.user.is_authenticated:
-        if request.user.usertype == "Internal":
-            # Internal staff/admin → see all shipments
-            shipments = Shipment.objects.all().order_by('-date')
-        else:
-            # External staff/users → only see shipments for their company
-            shipments = Shipment.objects.filter(
-                billto_customer=request.user.company_name
-            ).order_by('-date')
-    else:
-        shipments = Shipment.objects.none()  # no access for anonymous users
+    filters = shipment_filters(request.GET, request.user)
+    shipments = filter_shipments(visible_shipments(request.user), filters).only(*SHIPMENT_LIST_COLUMNS)
+    shipments, next_cursor, prev_cursor = keyset_page(
+        shipments, after=request.GET.get('after'), before=request.GET.get('before')
+    )
+
+    # Pagination links keep the current filters and swap only the cursor.
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    next_query = prev_query = None
+    if next_cursor:
+        next_query = query.copy()
+        next_query['after'] = next_cursor
+        next_query = next_query.urlencode()
+    if prev_cursor:
+        prev_query = query.copy()
+        prev_query['before'] = prev_cursor
+        prev_query = prev_query.urlencode()
 
     return render(request, 'shipment_list.html', {
         'shipments': shipments,
+        'start_date': filters['start_date'] or '',
+        'end_date': filters['end_date'] or '',
+        'status': filters['status'],
+        'customer': filters['customer'],
+        'status_choices': Shipment.STATUS_CHOICES,
+        'customers': CustomerMaster.objects.values_list('customer_id', 'company_name').order_by('company_name')
+        if request.user.usertype == "Internal" else [],
+        'filter_query': query.urlencode(),
+        'next_query': next_query,
+        'prev_query': prev_query,
         'pagename': 'Shipment List'
     })
 
 @login_required
 def download_shipment_report(request):
-    user = request.user
-
-    if user.is_superuser or user.is_staff:
-        shipments = Shipment.objects.all().order_by('-date')
-    else:
-        shipments = Shipment.objects.filter(
-            billto_customer=user.customer
-        ).order_by('-date') if user.customer else Shipment.objects.none()
-
-    response = HttpResponse(content_type='text/csv')
+    filters = shipment_filters(request.GET, request.user)
+    shipments = filter_shipments(visible_shipments(request.user), filters)
+
+    if request.GET.get('format') == 'xlsx':
+        return FileResponse(
+            write_xlsx(shipments),
+            as_attachment=True,
+            filename='shipment_report.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    response = StreamingHttpResponse(stream_csv(shipments), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="shipment_report.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'Consignment No', 'Date', 'Freight', 'Shipment Type', 'Payment Mode',
-        'Origin', 'Origin Pin', 'Destination', 'Destination Pin',
-        'Vehicle No', 'Driver Details',
-        'Consignor Name', 'Consignor Address', 'Consignor GST', 'Consignor Contact',
-        'Consignee Name', 'Consignee Address', 'Consignee GST', 'Consignee Contact',
-        'Invoice Ref No', 'E-waybill No', 'Value',
-        'No. of Articles', 'Actual Weight', 'Charged Weight', 'Pack Type', 'Status',
-        'Estimated Delivery Date', 'Delivery Date', 'POD Scan URL'
-    ])
-
-    for s in shipments:
-        writer.writerow([
-            s.consignment_no,
-            s.date,
-            s.freight,
-            s.shipment_type,
-            s.payment_mode,
-            s.origin,
-            s.origin_pin,
-            s.destination,
-            s.destination_pin,
-            s.vehicle_no,
-            s.driver_details,
-            s.consignor_name,
-            s.consignor_address,
-            s.consignor_gst or '',
-            s.consignor_contact,
-            s.consignee_name,
-            s.consignee_address,
-            s.consignee_gst or '',
-            s.consignee_contact,
-            s.invoice_ref_number,
-            s.ewaybill_number or '',
-            s.value,
-            s.no_article,
-            s.actual_weight,
-            s.charged_weight,
-            s.pack_type,
-            s.status,
-            s.estimated_delivery_date or '',
-            s.delivery_date or '',
-            s.pod_scan.url if getattr(s, 'pod_scan', None) else ''
-        ])
-
     return response
 
 
+@login_required
+def shipment_text_search(request):
+    """JSON search over consignment no, vehicle, driver, consignor, consignee and invoice ref (?q=, ?after=)."""
+    term = (request.GET.get('q') or '').strip()
+    if not term:
+        return JsonResponse({'results': [], 'next': None})
+    shipments = search.search(visible_shipments(request.user), term).values('id', *SHIPMENT_LIST_COLUMNS)
+    rows, next_cursor, _ = keyset_page(shipments, after=request.GET.get('after'))
+    return JsonResponse({
+        'results': [dict(row, url=reverse('shipment_detail', args=[row['id']])) for row in rows],
+        'next': next_cursor,
+    })
+
 def shipment_detail(request, pk):
     shipment = get_object_or_404(Shipment, pk=pk)
     return render(request, 'shipment_detail.html', {'shipment': shipment, 'pagename': f'Shipment Detail of {shipment.consignment_no}'})
@@ -196,92 +219,28 @@ def shipment_update(request, pk):
         form = ShipmentUpdateForm(instance=shipment)
     return render(request, 'shipment_update.html', {'form': form, 'shipment': shipment})
 
-from django.utils import timezone
-from django.utils.dateparse import parse_date
-from django.http import HttpResponse
-import pandas as pd
-import csv
-
-from .models import Shipment, CustomerMaster  # make sure CustomerMaster is imported
 
+@login_required
 def shipment_bulk_upload(request):
     if request.method == 'POST' and request.FILES.get('file'):
         file = request.FILES['file']
-        ext = file.name.split('.')[-1].lower()
-        try:
-            if ext == 'csv':
-                df = pd.read_csv(file)
-            elif ext in ['xls', 'xlsx']:
-                df = pd.read_excel(file)
-            else:
+        if request.POST.get('background') == 'yes':
+            if file.name.split('.')[-1].lower() not in ['csv', 'xls', 'xlsx']:
                 return HttpResponse("Unsupported file format", status=400)
-        except Exception as e:
-            return HttpResponse(f"Error reading file: {str(e)}", status=400)
-
-        generated_data = []
-        for index, row in df.iterrows():
-            try:
-                # --- Handle billto_customer (ForeignKey) ---
-                customer_id = str(row['billto_customer']).strip() if pd.notnull(row.get('billto_customer')) else None
-                billto_customer = None
-                if customer_id:
-                    try:
-                        billto_customer = CustomerMaster.objects.get(customer_id=customer_id)
-                    except CustomerMaster.DoesNotExist:
-                        return HttpResponse(f"Row {index+1} failed: Customer with ID '{customer_id}' not found", status=400)
-
-                # --- Create Shipment ---
-                shipment = Shipment(
-                    date=parse_date(str(row['date'])) if pd.notnull(row['date']) else timezone.now().date(),
-                    freight=float(row['freight']),
-                    payment_mode=row['payment_mode'],
-                    shipment_type=row['shipment_type'],
-                    billto_customer=billto_customer,   # ✅ fixed
-                    origin=row['origin'],
-                    origin_pin=str(row['origin_pin']),
-                    destination=row['destination'],
-                    destination_pin=str(row['destination_pin']),
-                    vehicle_no=row['vehicle_no'],
-                    driver_details=row['driver_details'],
-                    consignor_name=row['consignor_name'],
-                    consignor_address=row['consignor_address'],
-                    consignor_gst=row.get('consignor_gst', ''),
-                    consignor_contact=str(row['consignor_contact']),
-                    consignee_name=row['consignee_name'],
-                    consignee_address=row['consignee_address'],
-                    consignee_gst=row.get('consignee_gst', ''),
-                    consignee_contact=str(row['consignee_contact']),
-                    invoice_ref_number=row['invoice_ref_number'],
-                    ewaybill_number=row.get('ewaybill_number', ''),
-                    value=float(row['value']),
-                    no_article=int(row.get('no_article', 0)),
-                    actual_weight=float(row.get('actual_weight', 0)),
-                    charged_weight=float(row.get('charged_weight', 0)),
-                    pack_type=row.get('pack_type', 'NA'),
-                    status=row.get('status', 'Booked'),
-                    estimated_delivery_date=parse_date(str(row.get('estimated_delivery_date'))) if pd.notnull(row.get('estimated_delivery_date')) else None,
-                    delivery_date=parse_date(str(row.get('delivery_date'))) if pd.notnull(row.get('delivery_date')) else None
-                )
-                shipment.save()
-
-                # --- Collect summary for download ---
-                generated_data.append({
-                    'invoice_ref_number': shipment.invoice_ref_number,
-                    'consignment_no': shipment.consignment_no,
-                    'date': shipment.date,
-                    'origin': shipment.origin,
-                    'destination': shipment.destination,
-                    'freight': shipment.freight
-                })
-            except Exception as e:
-                return HttpResponse(f"Row {index+1} failed: {str(e)}", status=500)
-
-        # --- Return summary as CSV ---
+            return redirect('job_detail', token=jobs.submit('bulk_upload', request.user, input_file=file).token)
+        # the summary is written straight into the response as each chunk is imported
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="uploaded_shipments.csv"'
-        writer = csv.DictWriter(response, fieldnames=['invoice_ref_number', 'consignment_no', 'date', 'origin', 'destination', 'freight'])
+        writer = csv.DictWriter(response, fieldnames=SUMMARY_FIELDS)
         writer.writeheader()
-        writer.writerows(generated_data)
+        try:
+            import_shipment_file(file, summary=writer)
+        except UnsupportedFileFormat:
+            return HttpResponse("Unsupported file format", status=400)
+        except ShipmentImportError as e:
+            return HttpResponse(str(e), status=400)
+        except Exception as e:
+            return HttpResponse(f"Import failed: {str(e)}", status=500)
         return response
 
     return render(request, 'shipment_bulk_upload.html', {'pagename': 'Bulk Upload'})
@@ -294,48 +253,24 @@ def shipment_bulk_upload(request):
 def print_label(request):
     return render(request, 'shipment_print_label.html', {'pagename': 'Print Labels'})
 
+@login_required
 def download_labels(request):
     if request.method == 'POST':
         consignment_input = request.POST.get('consignments')
         consignment_numbers = consignment_input.strip().split()
-        shipments = Shipment.objects.filter(consignment_no__in=consignment_numbers)
+        shipments = Shipment.objects.filter(consignment_no__in=consignment_numbers).only(*LABEL_COLUMNS)
+
+        if request.POST.get('background') == 'yes':
+            job = jobs.submit('labels', request.user, {'consignments': consignment_numbers})
+            return redirect('job_detail', token=job.token)
+
+        if request.POST.get('stream') == 'yes':
+            response = StreamingHttpResponse(stream_labels_zip(shipments.iterator()), content_type='application/zip')
+            response['Content-Disposition'] = 'attachment; filename="shipment_labels.zip"'
+            return response
+
         buffer = BytesIO()
-        width, height = 5 * inch, 4 * inch
-        p = canvas.Canvas(buffer, pagesize=(width, height))
-
-        for shipment in shipments:
-            for i in range(shipment.no_article):
-                y = height - 15 * mm
-                p.setFont("Helvetica-Bold", 10)
-                p.drawString(10 * mm, y, "FROM:")
-                y -= 5 * mm
-                p.setFont("Helvetica", 9)
-                p.drawString(10 * mm, y, shipment.consignor_name)
-                y -= 5 * mm
-                p.drawString(10 * mm, y, shipment.consignor_address[:60])
-                y -= 5 * mm
-                p.drawString(10 * mm, y, f"Ph: {shipment.consignor_contact}")
-                y -= 10 * mm
-                p.setFont("Helvetica-Bold", 10)
-                p.drawString(10 * mm, y, "TO:")
-                y -= 5 * mm
-                p.setFont("Helvetica", 9)
-                p.drawString(10 * mm, y, shipment.consignee_name)
-                y -= 5 * mm
-                p.drawString(10 * mm, y, shipment.consignee_address[:60])
-                y -= 5 * mm
-                p.drawString(10 * mm, y, f"Ph: {shipment.consignee_contact}")
-                y -= 10 * mm
-                p.setFont("Helvetica", 9)
-                p.drawString(10 * mm, y, f"Consignment No: {shipment.consignment_no}")
-                y -= 5 * mm
-                p.drawString(10 * mm, y, f"Package: {i+1} of {shipment.no_article}")
-                y -= 20 * mm
-                barcode = code128.Code128(shipment.consignment_no, barHeight=15 * mm, barWidth=0.5)
-                barcode.drawOn(p, 10 * mm, y)
-                p.showPage()
-
-        p.save()
+        render_labels(shipments, buffer)
         buffer.seek(0)
         return HttpResponse(buffer, content_type='application/pdf', headers={'Content-Disposition': 'attachment; filename="shipment_labels.pdf"'})
 
@@ -344,25 +279,28 @@ def download_labels(request):
 def consignment_note(request):
     return render(request, 'consignment_notes.html', {'pagename': 'Download Consignment Notes'})
 
+@login_required
 def generate_consignment_notes(request):
     consignment_nos = request.GET.get('consignments')
     if not consignment_nos:
         return HttpResponse("No consignment numbers provided.")
     consignment_nos = consignment_nos.strip().split()
+    if request.GET.get('background') == 'yes':
+        job = jobs.submit('consignment_notes', request.user, {'consignments': consignment_nos})
+        return redirect('job_detail', token=job.token)
     shipments = Shipment.objects.filter(consignment_no__in=consignment_nos)
-    context = {'shipments': shipments, 'copy_labels': ['Consignor Copy', 'Consignee Copy']}
-    template_path = 'consignment_notes_pdf.html'
     if request.GET.get('pdf') == 'yes':
-        template = get_template(template_path)
-        html = template.render(context)
-        result = io.BytesIO()
-        pdf = pisa.CreatePDF(io.BytesIO(html.encode("UTF-8")), dest=result)
-        if pdf.err:
+        order = {no: i for i, no in enumerate(consignment_nos)}
+        shipments = sorted(shipments, key=lambda s: order[s.consignment_no])
+        try:
+            pdf = render_consignment_notes(shipments)
+        except PDFRenderError:
             return HttpResponse('PDF generation failed', status=500)
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
+        response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename="consignment_notes.pdf"'
         return response
-    return render(request, template_path, context)
+    context = {'shipments': shipments, 'copy_labels': COPY_LABELS}
+    return render(request, CONSIGNMENT_NOTE_TEMPLATE, context)
 
 # POD Upload
 def pod_upload_search(request):
@@ -397,16 +335,85 @@ def consignment_tracking(request):
 
 def bulk_tracking(request):
     consignment_nos = request.GET.get('consignments')
-    shipments = Shipment.objects.filter(consignment_no__in=consignment_nos.strip().split()) if consignment_nos else []
+    shipments = list(Shipment.objects.filter(consignment_no__in=consignment_nos.strip().split())) if consignment_nos else []
+    history = events.timelines([shipment.pk for shipment in shipments])
+    for shipment in shipments:
+        shipment.timeline = history.get(shipment.pk, [])
     return render(request, 'bulk_tracking.html', {'shipments': shipments,'pagename':'Bulk Consignment Tracking'})
 
 def public_tracking(request):
     return render(request, 'public_tracking.html')
 
 def public_tracking_status(request):
-    consignment_nos = request.GET.get('consignments')
-    shipments = Shipment.objects.filter(consignment_no__in=consignment_nos.strip().split()) if consignment_nos else []
-    return render(request, 'public_tracking.html', {'shipments': shipments})
+    error = None
+    try:
+        shipments = tracking.track(tracking.parse_consignment_numbers(request.GET.get('consignments')))
+    except tracking.TooManyConsignments as e:
+        shipments, error = [], str(e)
+    return render(request, 'public_tracking.html', {'shipments': shipments, 'error': error})
+
+def public_tracking_api(request):
+    try:
+        numbers = tracking.parse_consignment_numbers(request.GET.get('consignments'))
+    except tracking.TooManyConsignments as e:
+        return JsonResponse({'error': str(e), 'limit': tracking.TRACKING_BATCH_LIMIT}, status=400)
+    results = tracking.track(numbers)
+    found = {r['consignment_no'] for r in results}
+    return JsonResponse({
+        'results': results,
+        'not_found': [no for no in numbers if no not in found],
+    })
+
+
+# ---------------------------
+# Background jobs
+# ---------------------------
+
+def _user_job(request, token, **filters):
+    """The job behind ``token`` if the requesting user submitted it; staff see every job."""
+    queryset = Job.objects.filter(token=token, **filters)
+    if not request.user.is_staff:
+        queryset = queryset.filter(created_by=request.user)
+    return get_object_or_404(queryset)
+
+@login_required
+def job_detail(request, token):
+    job = _user_job(request, token)
+    return render(request, 'job_status.html', {'job': job, 'pagename': f'{job.get_kind_display()} Job'})
+
+@login_required
+def job_status(request, token):
+    job = _user_job(request, token)
+    return JsonResponse({
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.live_progress,
+        'message': job.message,
+        'download_url': reverse('job_download', args=[job.token]) if job.status == 'Done' else None,
+    })
+
+@login_required
+def job_download(request, token):
+    job = _user_job(request, token, status='Done')
+    return FileResponse(job.result_file.open('rb'), as_attachment=True,
+                        filename=os.path.basename(job.result_file.name))
+
+
+# ---------------------------
+# Internal: request performance
+# ---------------------------
+
+@staff_member_required
+def perf_dashboard(request):
+    if request.method == 'POST' and request.POST.get('reset') == 'yes':
+        perf.reset()
+        return redirect('perf_dashboard')
+    return render(request, 'perf_dashboard.html', {
+        'rows': perf.summary(),
+        'enabled': perf.PERF_ENABLED,
+        'window': perf.PERF_WINDOW,
+        'pagename': 'Request Performance',
+    })
 
 
 # ---------------------------
@@ -414,49 +421,94 @@ def public_tracking_status(request):
 # ---------------------------
 
 def create_manifest(request):
+    selected = []
     if request.method == 'POST':
         form = ManifestForm(request.POST)
         if form.is_valid():
             form.save()
             return redirect('manifest_list')
+        # show the picks again without listing every Booked shipment
+        ids = [value for value in request.POST.getlist('shipments') if value.isdigit()]
+        selected = [picker_json(row) for row in picker_rows(Shipment.objects.filter(id__in=ids))]
     else:
         form = ManifestForm()
-    return render(request, 'manifest_create.html', {'form': form,'pagename':'Create Manifest'})
+    return render(request, 'manifest_create.html', {
+        'form': form,
+        'pagename': 'Create Manifest',
+        'selected_shipments': selected,
+    })
+
+@login_required
+@condition(*caching.conditional(Shipment))
+def manifest_shipment_search(request):
+    """JSON page of Booked shipments matching ?q=, newest first, continued with ?after=."""
+    shipments = shipment_search(pickable_shipments(), request.GET.get('q'))
+    rows, next_cursor, _ = keyset_page(picker_rows(shipments), after=request.GET.get('after'),
+                                       page_size=PICKER_PAGE_SIZE)
+    return JsonResponse({'results': [picker_json(row) for row in rows], 'next': next_cursor})
 
 def manifest_detail(request, pk):
     manifest = get_object_or_404(Manifest, pk=pk)
-    shipments = manifest.shipments.all()
-    total_articles = sum(s.no_article for s in shipments)
-    total_freight = sum(s.freight for s in shipments)
     return render(request, 'manifest_detail.html', {
         'manifest': manifest,
-        'total_articles': total_articles,
-        'total_freight': total_freight
+        'total_articles': manifest.total_articles,
+        'total_freight': manifest.total_freight
     })
 
+@login_required
+def shipment_status_update(request):
+    """Dispatch, send out for delivery or deliver a manifest or a pasted consignment list in one UPDATE."""
+    if request.method == 'POST':
+        form = BulkStatusForm(request.POST)
+        if form.is_valid():
+            operation = form.cleaned_data['operation']
+            manifest = form.cleaned_data['manifest']
+            if manifest:
+                moved, skipped = lifecycle.transition_manifest(manifest, operation, user=request.user)
+            else:
+                moved, skipped = lifecycle.transition_consignments(form.cleaned_data['consignments'], operation,
+                                                                   user=request.user)
+            to_status = lifecycle.OPERATIONS[operation].to_status
+            messages.success(request, f"{moved} shipment(s) moved to {to_status}.")
+            if skipped:
+                messages.warning(request, f"{skipped} shipment(s) were skipped because of their current status.")
+            return redirect('shipment_status_update')
+    else:
+        form = BulkStatusForm(initial={'manifest': request.GET.get('manifest', '')})
+    return render(request, 'shipment_status_update.html', {'form': form, 'pagename': 'Update Shipment Status'})
+
+@login_required
 def manifest_pdf(request, pk):
-    manifest = Manifest.objects.get(pk=pk)
-    template_path = 'manifest/manifest_pdf_template.html'
-    context = {'manifest': manifest, 'shipments': manifest.shipments.all()}
-    template = get_template(template_path)
-    html = template.render(context)
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="manifest_{manifest.manifest_id}.pdf"'
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
+    manifest = get_object_or_404(Manifest, pk=pk)
+    if request.GET.get('background') == 'yes':
+        return redirect('job_detail', token=jobs.submit('manifest_pdf', request.user, {'manifest': manifest.pk}).token)
+    try:
+        pdf = render_manifest_pdf(manifest)
+    except PDFRenderError:
         return HttpResponse('PDF generation failed.')
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="manifest_{manifest.manifest_id}.pdf"'
     return response
 
+@condition(*caching.conditional(Manifest))
 def manifest_list(request):
     manifests = Manifest.objects.all().order_by('-created_at')
-    return render(request, 'manifest_list.html', {'manifests': manifests})
+    return render(request, 'manifest_list.html', {
+        'manifests': manifests,
+        'manifests_version': caching.versions(Manifest),
+        'fragment_timeout': caching.FRAGMENT_CACHE_TIMEOUT,
+    })
 
+@condition(*caching.conditional(Manifest))
 def print_manifest_list(request):
     manifests = Manifest.objects.all()
-    return render(request, 'print_manifest_list.html', {'manifests': manifests})
+    return render(request, 'print_manifest_list.html', {
+        'manifests': manifests,
+        'manifests_version': caching.versions(Manifest),
+        'fragment_timeout': caching.FRAGMENT_CACHE_TIMEOUT,
+    })
 
 # users/views.py
-from django.shortcuts import render
 
 def user_add(request):
     return render(request, 'users/user_add.html')
@@ -478,7 +530,15 @@ def fleet_add(request):
 def fleet_manage(request):
     return render(request, 'main/fleet_manage.html')
 
-from .forms import VendorMasterForm, TripOutToVendorForm
+
+@login_required
+def fleet_compliance(request):
+    try:
+        days = min(max(int(request.GET.get('days', compliance.COMPLIANCE_DAYS)), 0), 365)
+    except ValueError:
+        days = compliance.COMPLIANCE_DAYS
+    return render(request, 'fleet_compliance.html', {'report': compliance.report(days)})
+
 
 def create_vendor(request):
     if request.method == "POST":
@@ -492,8 +552,6 @@ def create_vendor(request):
     return render(request, "vendor_form.html", {"form": form})
 
 
-from .forms import TripOutToVendorForm
-
 def create_trip(request):
     if request.method == "POST":
         form = TripOutToVendorForm(request.POST)
@@ -515,10 +573,12 @@ def create_trip(request):
     return render(request, "trip_form.html", {"form": form,'pagename':'Create Trip'})
 
 
-from .models import TripOutToVendor
+TRIP_LIST_COLUMNS = ('id', 'trip_id', 'vendor__vendor_name', 'vehicle_type', 'vehicle_capacity', 'from_location',
+                     'destination', 'kilometer', 'total_bill_amount', 'status', 'created_at')
 
+@condition(*caching.conditional(TripOutToVendor, VendorMaster))
 def trip_list(request):
-    trips = TripOutToVendor.objects.all()
+    trips = TripOutToVendor.objects.select_related('vendor')
 
     # Filter by status
     status = request.GET.get("status")
@@ -530,7 +590,51 @@ def trip_list(request):
     if trip_id:
         trips = trips.filter(trip_id__icontains=trip_id)
 
-    return render(request, "trip_list.html", {"trips": trips,'pagename':'Trip List'})
+    # the rows are cached as data; the status forms around them carry this user's CSRF token
+    rows = caching.get_or_set(
+        'trip-list-rows', (TripOutToVendor, VendorMaster),
+        lambda: list(trips.values(*TRIP_LIST_COLUMNS)), status, trip_id,
+    )
+    return render(request, "trip_list.html", {
+        "trips": rows,
+        'pagename': 'Trip List',
+    })
+
+
+def _month_param(request, name):
+    """First day of the YYYY-MM month in GET[name], or None."""
+    try:
+        return parse_date(f"{request.GET.get(name, '')}-01")
+    except ValueError:
+        return None
+
+@login_required
+@condition(*caching.conditional(TripOutToVendor, VendorMaster, TripCostRollup))
+def trip_cost_analytics(request):
+    """Cost per km by lane and vendor, with overpriced trips, read from the TripCostRollup table only."""
+    rollups = TripCostRollup.objects.all()
+    start, end = _month_param(request, 'start'), _month_param(request, 'end')
+    if not start and not end:
+        start = (timezone.localdate() - timedelta(days=365)).replace(day=1)
+    if start:
+        rollups = rollups.filter(month__gte=start)
+    if end:
+        rollups = rollups.filter(month__lte=end)
+    vehicle_type = request.GET.get('vehicle_type')
+    if vehicle_type:
+        rollups = rollups.filter(vehicle_type=vehicle_type)
+    vendor = request.GET.get('vendor')
+    if vendor:
+        rollups = rollups.filter(vendor__vendor_code=vendor)
+
+    return render(request, "trip_cost_analytics.html", {
+        'pagename': 'Trip Cost Analytics',
+        'report': tripcosts.analytics(rollups),
+        'start': start, 'end': end, 'vehicle_type': vehicle_type or '', 'vendor': vendor or '',
+        'vendors': VendorMaster.objects.order_by('vendor_name').values_list('vendor_code', 'vendor_name'),
+        'vehicle_types': TripCostRollup.objects.order_by('vehicle_type').values_list('vehicle_type', flat=True).distinct(),
+        'fence_iqr': tripcosts.TRIP_OUTLIER_IQR,
+    })
 
 def update_trip_status(request, pk):
     trip = get_object_or_404(TripOutToVendor, pk=pk)
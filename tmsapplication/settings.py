@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os.path
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 import pymysql
 pymysql.install_as_MySQLdb()
 
@@ -43,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 AUTH_USER_MODEL = 'main.CustomUser'
+LOGIN_URL = 'login'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -52,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.perf.PerfMiddleware',
 ]
 
 ROOT_URLCONF = 'tmsapplication.urls'
@@ -77,28 +81,66 @@ WSGI_APPLICATION = 'tmsapplication.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# TMS_DB_PROFILE selects the database:
+#   sqlite          (default) db.sqlite3 tuned for concurrent bookings (PRAGMAs in main.db); switch the
+#                   file to WAL once with `python manage.py sqlite_journal_mode wal`
+#   sqlite-default  the same file with SQLite's stock settings and rollback journal, to compare against
+#   mysql           MySQL through PyMySQL, with persistent health-checked connections (TMS_DB_* variables)
+
+DB_PROFILE = os.environ.get('TMS_DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.environ.get('TMS_DB_NAME', 'saarigec_app'),
+            'USER': os.environ.get('TMS_DB_USER', 'saarigec_admin'),
+            'PASSWORD': os.environ.get('TMS_DB_PASSWORD', ''),
+            'HOST': os.environ.get('TMS_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('TMS_DB_PORT', '3306'),
+            # keep connections across requests; each is pinged before reuse so a server-side timeout is survivable
+            'CONN_MAX_AGE': int(os.environ.get('TMS_DB_CONN_MAX_AGE', 300)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'charset': 'utf8mb4',
+            },
+        }
     }
-}
-
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.mysql',
-#         'NAME': 'saarigec_app',         # Your DB name
-#         'USER': 'saarigec_admin',       # Your DB username
-#         'PASSWORD': 'admin@2025',       # Your DB password
-#         'HOST': 'localhost',            # Usually localhost on cPanel
-#         'PORT': '3306',                 # Default MySQL port
-#         'OPTIONS': {
-#             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-#         },
-#     }
-# }
-
+elif DB_PROFILE in ('sqlite', 'sqlite-default'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    if DB_PROFILE == 'sqlite':
+        DATABASES['default'].update({
+            'CONN_MAX_AGE': int(os.environ.get('TMS_DB_CONN_MAX_AGE', 600)),  # PRAGMAs run once per connection
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # writers queue on the lock up front instead of failing when a read lock can't be upgraded
+                'transaction_mode': 'IMMEDIATE',
+            },
+        })
+else:
+    raise ImproperlyConfigured(f"Unknown TMS_DB_PROFILE {DB_PROFILE!r}; use sqlite, sqlite-default or mysql.")
+
+# The journal mode each SQLite profile runs with. It is stored in the database file, not per
+# connection, so it is set once by `manage.py sqlite_journal_mode` (and by load_test_bookings on
+# its scratch database) instead of by every connection. WAL lets readers proceed while one writes.
+SQLITE_JOURNAL_MODE = {'sqlite': 'WAL', 'sqlite-default': 'DELETE'}.get(DB_PROFILE)
+
+# Applied to every new SQLite connection by main.db; per-connection settings only.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 20000,          # ms to wait for the write lock before "database is locked"
+    'synchronous': 'NORMAL',        # fsync at checkpoints instead of every commit; only applied in WAL mode
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,           # negative is KiB: a 64 MB page cache
+} if DB_PROFILE == 'sqlite' else {
+    'journal_mode': 'DELETE',       # undo a WAL switch, so this stays the stock baseline
+} if DB_PROFILE == 'sqlite-default' else {}
 
 
 # Password validation
@@ -161,3 +203,31 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Enable static files handling in development
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Per-view timing, query counts and Server-Timing headers (see /internal/perf/).
+# Off by default; when False the middleware unloads itself at startup.
+PERF_MONITORING = os.environ.get('TMS_PERF_MONITORING') == '1'
+
+# The model version keys behind page/fragment caching must be seen by every
+# server process, or a save in one worker leaves the others serving stale pages,
+# so the default is a file cache rather than per-process local memory. Point
+# TMS_CACHE_DIR at a directory all workers share.
+CACHE_DIR = os.environ.get('TMS_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+CACHES = {
+    # note PDFs, tracking rows, page data: sized for them, culling a tenth when full
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('TMS_CACHE_MAX_ENTRIES', 20000)),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # one key per model (main.caching); kept apart so culling the default cache never resets a
+    # version, which would bring old ETags and cached pages back
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'versions'),
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
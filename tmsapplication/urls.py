@@ -36,12 +36,15 @@ urlpatterns = [
     path('shipment/bulk-upload/', views.shipment_bulk_upload, name='shipment_bulk_upload'),
     path('shipment/bulk-labels/', views.download_labels, name='download_labels'),
     path('shipments/report/download/', views.download_shipment_report, name='shipment_report_download'),
+    path('api/shipments/search/', views.shipment_text_search, name='shipment_text_search'),
 
     # Manifest URLs
     path('manifest/create/', views.create_manifest, name='create_manifest'),
+    path('manifest/shipments/search/', views.manifest_shipment_search, name='manifest_shipment_search'),
     path('manifests/', views.manifest_list, name='manifest_list'),
     path('manifest/<int:pk>/', views.manifest_detail, name='manifest_detail'),
     path('manifest/<int:pk>/pdf/', views.manifest_pdf, name='manifest_pdf'),
+    path('manifests/status/', views.shipment_status_update, name='shipment_status_update'),
     path('manifests/print/', views.print_manifest_list, name='print_manifest_list'),
 
     # Label, Notes, POD
@@ -58,19 +61,29 @@ urlpatterns = [
     path('track/bulk/', views.bulk_tracking, name='bulk_tracking'),
     path('public_tracking/', views.public_tracking, name='public_tracking'),
     path('public_tracking_status/', views.public_tracking_status, name='public_tracking_status'),
+    path('api/tracking/', views.public_tracking_api, name='public_tracking_api'),
+
+    # Background jobs
+    path('jobs/<uuid:token>/', views.job_detail, name='job_detail'),
+    path('jobs/<uuid:token>/status/', views.job_status, name='job_status'),
+    path('jobs/<uuid:token>/download/', views.job_download, name='job_download'),
+
     path('add/', views.user_add, name='user_add'),
     path('manage/', views.user_manage, name='user_manage'),
     path('add/', views.branch_add, name='branch_add'),
     path('manage/', views.branch_manage, name='branch_manage'),
     path('add/', views.fleet_add, name='fleet_add'),
     path('manage/', views.fleet_manage, name='fleet_manage'),
+    path('fleet/compliance/', views.fleet_compliance, name='fleet_compliance'),
     path("vendors/create/", views.create_vendor, name="vendor-create"),
     path("trips/", views.trip_list, name="trip-list"),
     path("trips/create/", views.create_trip, name="trip-create"),
     path("trips/", views.trip_list, name="trip-list"),
+    path("trips/analytics/", views.trip_cost_analytics, name="trip-cost-analytics"),
     path("trips/<int:pk>/status/", views.update_trip_status, name="trip-status-update"),
     path("trips/<int:pk>/", views.trip_detail, name="trip-detail"),
     path("trips/<int:pk>/edit/", views.trip_update, name="trip-update"),
+    path('internal/perf/', views.perf_dashboard, name='perf_dashboard'),
 
 ]
 